@@ -177,7 +177,7 @@ const AISpeaking = () => {
                     const parsed = JSON.parse(dataStr);
                     if (eventName === 'quick_score') {
                         setResult(parsed);
-                    } else if (eventName === 'deep_analysis') {
+                    } else if (eventName === 'final_score' || eventName === 'deep_analysis' || eventName === 'pitch_overlay') {
                         setResult(prev => ({ ...prev, ...parsed }));
                     } else if (eventName === 'database_done') {
                         setResult(prev => ({ ...prev, coinResult: parsed.coinResult, petState: parsed.petState, quotaRemaining: parsed.quotaRemaining }));
@@ -1,5 +1,4 @@
 import os
-import tempfile
 import random
 import time
 import json
@@ -13,15 +12,31 @@ from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor
-import joblib
-import pandas as pd
 
 # --- IMPORT MODULAR SERVICES ---
 import services.gemini_service as gemini_service
 from services.audio_service import (
-    whisper_model, transcribe_audio, extract_pitch, 
-    get_audio_duration, extract_audio_features_pro, transcribe_audio_detailed
+    transcribe_audio, extract_pitch,
+    get_audio_duration, extract_audio_features_pro, transcribe_audio_detailed,
+    get_asr_batch_stats, get_asr_engine_status, get_asr_replica_stats, get_sidecar_stats,
+    transcribe_samples
 )
+from services.audio_buffer import AudioBuffer
+from services.audio_decoder import get_decoder_stats, merge_mp3_files
+from services.audio_quality_gate import check_audio_quality, get_quality_gate_stats, record_scored
+from services.upload_io import get_upload_io_stats, receive_upload
+from services.live_transcription import LIVE_SR, LiveSessionManager
+from services.artifact_cache import analysis_cache
+from services.asr_policy import get_asr_policy_stats
+from services.model_registry import get_model, get_model_registry_stats
+from services.audio_process_pool import get_process_pool_stats, start_process_pool
+from services.pitch_dtw import (
+    PITCH_DTW_BAND, PITCH_OVERLAY_POINTS, dtw_distance, dtw_distances, resample_curve, warm_up as pitch_dtw_warm_up
+)
+from services.pitch_service import get_pitch_stats
+from services.reference_pitch import REFERENCE_VOICES, get_reference_pitch_stats, reference_pitch_store
+from services.speaking_model_runner import SpeakingModelRunner
+from services.speaking_pipeline import Pipeline, Stage
 from services.tts_service import run_tts_sync, generate_audio_edge
 from services.nlp_service import (
     analyze_deep_tech, check_grammar, _offline_writing_score, 
@@ -37,7 +52,7 @@ from services.speaking_hybrid_service import (
     evaluate_speaking_hybrid, format_speaking_response
 )
 
-from utils.helpers import clean_temp_file, parse_json_safely
+from utils.helpers import parse_json_safely
 load_dotenv()
 app = Flask(__name__)
 CORS(app)
@@ -132,6 +147,12 @@ def semantic_match_lessons():
 
 # --- THREAD POOL FOR PARALLEL TASKS ---
 executor = ThreadPoolExecutor(max_workers=8)  # Tăng lên 8 workers để xử lý song song tốt hơn
+# Phiên nói trực tiếp (chunked POST): các đoạn đã commit được transcribe trên executor này
+live_sessions = LiveSessionManager(transcribe_samples, executor)
+# Process pool cho pitch/spectral (bật bằng AUDIO_PROCESS_POOL_WORKERS) - warm-up nền lúc boot
+start_process_pool()
+# JIT kernel DTW (numba) nền → request đầu tiên không chờ compile
+executor.submit(pitch_dtw_warm_up)
 
 # --- GLOBAL CACHE FOR QUOTA SAVING ---
 GREETING_CACHE = {} 
@@ -155,13 +176,18 @@ FALLBACK_QUESTIONS = [
 import random
 
 # --- LOAD HYBRID BRAIN (XGBOOST) ---
-SPEAKING_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'Random_forest', 'alex_speaking_brain_pro.joblib')
 try:
-    speaking_model = joblib.load(SPEAKING_MODEL_PATH)
-    print("🎤 [SUCCESS] Hybrid Speaking Brain (XGBoost) loaded!")
+    # Registry: load 1 lần / process (preload trong master gunicorn → worker dùng chung page)
+    speaking_model = get_model("speaking")
+    if speaking_model is None:
+        raise FileNotFoundError("alex_speaking_brain_pro.joblib")
+    # Thứ tự feature lấy 1 lần từ model, mỗi request chỉ dựng vector float32 + inplace_predict
+    speaking_runner = SpeakingModelRunner(speaking_model)
+    print(f"🎤 [SUCCESS] Hybrid Speaking Brain (XGBoost) loaded! ({speaking_runner.mode})")
 except Exception as e:
     print(f"⚠️ [WARNING] Failed to load Speaking Brain: {e}")
     speaking_model = None
+    speaking_runner = None
 
 print("🚀 HỆ THỐNG AI ĐÃ ĐƯỢC MODULAR HÓA & TỐI ƯU TỐC ĐỘ!")
 
@@ -299,9 +325,20 @@ def _feedback_from_policy(local_hybrid, policy):
     return "Tiếp tục luyện tập để cải thiện đều các tiêu chí speaking."
 
 
-def _gemini_assist_language_quality(transcript, question, local_hybrid, lang_quality, policy):
+def _content_baseline(lang_quality):
+    """Điểm nội dung local (giống local_hybrid) - chỉ cần transcript, không cần pitch/features"""
+    return {
+        "lexical": _round_half(lang_quality.get("lexical_score", 5.0)),
+        "semantic": _round_half(lang_quality.get("semantic_score", 5.0)),
+        "word_usage": _round_half(lang_quality.get("usage_score", 5.0)),
+        "grammar": _round_half(lang_quality.get("grammar_score", 5.0))
+    }
+
+
+def _gemini_assist_fetch(transcript, question, local_hybrid):
+    """Gọi Gemini chấm lại phần ngôn ngữ → dict điểm thô (None nếu câu quá ngắn / Gemini lỗi)"""
     if not transcript or len(_extract_words(transcript)) < 4:
-        return local_hybrid, None
+        return None
 
     prompt = f"""
     Role: Senior IELTS Speaking Examiner (Professional, Strict, and Unbiased).
@@ -337,7 +374,11 @@ def _gemini_assist_language_quality(transcript, question, local_hybrid, lang_qua
     }}
     """
 
-    ai = gemini_service.call_gemini_json(prompt)
+    return gemini_service.call_gemini_json(prompt) or None
+
+
+def _gemini_assist_blend(local_hybrid, ai, lang_quality, policy):
+    """Trộn điểm Gemini assist vào local_hybrid theo gemini_assist_weight → (blended, meta)"""
     if not ai:
         return local_hybrid, None
 
@@ -601,42 +642,8 @@ def _build_word_heatmap(transcript, audio_duration, local_hybrid, lang_quality,
     return heatmap
 
 
-def _resample_curve(values, target_len=40):
-    vals = [float(v) for v in (values or []) if v is not None]
-    if not vals:
-        return []
-    if len(vals) == 1:
-        return [vals[0]] * target_len
-
-    out = []
-    for i in range(target_len):
-        pos = i * (len(vals) - 1) / max(target_len - 1, 1)
-        left = int(math.floor(pos))
-        right = min(left + 1, len(vals) - 1)
-        alpha = pos - left
-        out.append(vals[left] * (1 - alpha) + vals[right] * alpha)
-    return out
-
-
-def _dtw_distance(series_a, series_b):
-    if not series_a or not series_b:
-        return 0.0
-
-    n, m = len(series_a), len(series_b)
-    inf = float("inf")
-    dp = [[inf] * (m + 1) for _ in range(n + 1)]
-    dp[0][0] = 0.0
-
-    for i in range(1, n + 1):
-        for j in range(1, m + 1):
-            cost = abs(series_a[i - 1] - series_b[j - 1])
-            dp[i][j] = cost + min(dp[i - 1][j], dp[i][j - 1], dp[i - 1][j - 1])
-
-    return dp[n][m] / max(n + m, 1)
-
-
 def _build_pitch_overlay(user_pitch, question="", voice="en-GB-SoniaNeural", use_tts_reference=True):
-    user_curve = _resample_curve(user_pitch, target_len=40)
+    user_curve = resample_curve(user_pitch, target_len=PITCH_OVERLAY_POINTS)
     if not user_curve:
         return {
             "user_curve": [],
@@ -648,45 +655,55 @@ def _build_pitch_overlay(user_pitch, question="", voice="en-GB-SoniaNeural", use
 
     reference_source = "synthetic"
     ref_curve = []
+    references = {}
 
     if use_tts_reference and question and question.strip():
-        tts_temp = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_tts:
-                tts_temp = tmp_tts.name
-            run_tts_sync(question, tts_temp, voice=voice)
-            tts_pitch = extract_pitch(tts_temp)
+            # Curve TTS theo (câu hỏi, voice, engine) đã precompute / cache → không TTS + pYIN inline
+            tts_pitch = reference_pitch_store.get(question, voice=voice)
             if tts_pitch:
-                ref_curve = _resample_curve(tts_pitch, target_len=len(user_curve))
-                reference_source = "tts"
+                references[voice] = resample_curve(tts_pitch, target_len=len(user_curve))
+            # Voice / accent bản ngữ khác: chỉ dùng curve đã precompute (không bao giờ TTS thêm)
+            for other in REFERENCE_VOICES:
+                if other not in references and other != voice:
+                    other_pitch = reference_pitch_store.lookup(question, voice=other)
+                    if other_pitch:
+                        references[other] = resample_curve(other_pitch, target_len=len(user_curve))
         except Exception as e:
             print(f"⚠️ [PITCH_OVERLAY] TTS reference failed: {e}")
-        finally:
-            if tts_temp and os.path.exists(tts_temp):
-                try:
-                    os.remove(tts_temp)
-                except Exception:
-                    pass
 
-    if not ref_curve:
+    reference_matches = {}
+    if references:
+        # 1 lần gọi DTW cho mọi curve mẫu → chọn voice khớp nhất
+        distances = dtw_distances(user_curve, list(references.values()), band=PITCH_DTW_BAND)
+        reference_matches = {v: round(float(d), 3) for v, d in zip(references, distances)}
+        best_voice = min(reference_matches, key=reference_matches.get)
+        ref_curve = references[best_voice]
+        dist = float(distances[list(references).index(best_voice)])
+        reference_source = "tts"
+    else:
         avg = sum(user_curve) / len(user_curve)
         q_factor = min(len(_extract_words(question or "")) / 15.0, 1.0)
         amp = 8.0 + (q_factor * 5.0)
         for i in range(len(user_curve)):
             t = i / max(len(user_curve) - 1, 1)
             ref_curve.append(avg + amp * math.sin(2 * math.pi * t) + (amp * 0.4) * math.cos(4 * math.pi * t))
+        dist = dtw_distance(user_curve, ref_curve, band=PITCH_DTW_BAND)
 
-    dist = _dtw_distance(user_curve, ref_curve)
     # Dist nhỏ thì điểm match cao
     match = max(0.0, 100.0 - (dist * 3.5))
 
-    return {
+    overlay = {
         "user_curve": [round(x, 2) for x in user_curve],
         "reference_curve": [round(x, 2) for x in ref_curve],
         "dtw_distance": round(dist, 3),
         "pitch_match_score": round(match, 2),
         "reference_source": reference_source
     }
+    if len(reference_matches) > 1:
+        overlay["reference_voice"] = best_voice
+        overlay["reference_matches"] = reference_matches
+    return overlay
 
 
 def _build_bkt_update(overall_score, skill="speaking_overall", p_prior=0.5, p_transit=0.12, p_guess=0.2, p_slip=0.1):
@@ -706,10 +723,240 @@ def _build_bkt_update(overall_score, skill="speaking_overall", p_prior=0.5, p_tr
     }
 
 
+def _unscorable_payload(gate):
+    """Response chuẩn khi quality gate chặn bản ghi (không chạy STT / pitch / XGBoost / Gemini)"""
+    return {
+        "success": True,
+        "unscorable": True,
+        "reason_code": gate.reason,
+        "message": gate.message,
+        "quality": gate.to_dict(),
+        "transcript": "",
+        "overall_score": 0.0,
+        "source": "quality-gate"
+    }
+
+
 def _sse(event_name, data):
     return f"event: {event_name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
+def _form_flag(form, key, default="1"):
+    return str(form.get(key, default)).lower() in ("1", "true", "yes", "on")
+
+
+def _policy_summary(form, policy):
+    return {
+        "profile": form.get("scoring_profile", "balanced"),
+        "pron_weight": round(policy["pron_weight"], 3),
+        "content_weight": round(policy["content_weight"], 3)
+    }
+
+
+# ==========================================
+# 🧩 SPEAKING PIPELINE (DAG các stage chấm điểm, dùng chung mọi endpoint)
+# ==========================================
+def _speaking_inputs(form, audio, process_path=None, question=None, fields=None):
+    """Input của pipeline từ form request (đọc hết ở đây - stage chạy ngoài request context)"""
+    # Chọn field mà không xin gemini_assist (và không bật tường minh) → bỏ qua lần gọi Gemini assist
+    use_gemini_assist = _form_flag(form, "gemini_assist") and (
+        fields is None or "gemini_assist" in fields or "gemini_assist" in form
+    )
+    return {
+        "audio": audio,
+        "process_path": process_path,
+        "question": form.get("question", "") if question is None else question,
+        "policy": _resolve_speaking_policy(form),
+        "pitch_engine": form.get("pitch_engine"),
+        "asr_tier": form.get("asr_tier"),
+        "voice": form.get("voice", "en-GB-SoniaNeural"),
+        "use_tts_reference": _form_flag(form, "use_tts_reference"),
+        "use_gemini_assist": use_gemini_assist,
+        "skill": form.get("skill", "speaking_overall"),
+        "p_prior": form.get("p_prior", 0.5)
+    }
+
+
+def _stage_stt(ctx):
+    return transcribe_audio_detailed(ctx["process_path"], audio=ctx["audio"], tier=ctx["asr_tier"])
+
+
+def _stage_pitch(ctx):
+    return extract_pitch(ctx["process_path"], audio=ctx["audio"], engine=ctx["pitch_engine"])
+
+
+def _stage_features(ctx):
+    return extract_audio_features_pro(ctx["process_path"], audio=ctx["audio"], pitch_engine=ctx["pitch_engine"])
+
+
+def _stage_duration(ctx):
+    return get_audio_duration(ctx["process_path"], audio=ctx["audio"])
+
+
+def _stage_physical_score(ctx):
+    if speaking_runner and ctx["features"]:
+        return speaking_runner.predict(ctx["features"])
+    return 0.0
+
+
+def _stage_lang_quality(ctx):
+    return _analyze_speaking_language_quality(ctx["stt"].get("text", ""), ctx["question"], policy=ctx["policy"])
+
+
+def _stage_gemini_assist(ctx):
+    """Transcript + lang_quality → gọi Gemini song song với pYIN; không có model / features thì bỏ (kết quả không dùng)"""
+    if not ctx["use_gemini_assist"] or time.time() - LAST_QUOTA_ERROR_TIME <= OFFLINE_COOLDOWN:
+        return None
+    if not speaking_runner or not ctx["features"]:
+        return None
+    try:
+        return _gemini_assist_fetch(ctx["stt"].get("text", ""), ctx["question"], _content_baseline(ctx["lang_quality"]))
+    except Exception as e:
+        print(f"⚠️ Gemini assist scoring failed: {e}")
+        return None
+
+
+def _stage_base_scores(ctx):
+    """Điểm hybrid local (XGBoost + language quality), không chờ Gemini assist"""
+    policy = ctx["policy"]
+    acoustic_fluency = _score_acoustic_fluency(ctx["features"])
+    if ctx.get("neutral_fallback") and not (speaking_runner and ctx["features"]):
+        acoustic_fluency = 5.0  # practice: không có model → fluency trung tính 5.0 như trước
+    return _build_hybrid_speaking_scores(
+        pronunciation_score=ctx["physical_score"],
+        lang_quality=ctx["lang_quality"],
+        acoustic_fluency=acoustic_fluency,
+        pron_weight=policy["pron_weight"],
+        content_weight=policy["content_weight"],
+        policy=policy
+    )
+
+
+def _stage_scores(ctx):
+    """base_scores + blend Gemini assist (nếu có)"""
+    base = ctx["base_scores"]
+    local_hybrid, assist_meta = _gemini_assist_blend(base, ctx["gemini_assist"], ctx["lang_quality"], ctx["policy"])
+    return {"base": base, "local_hybrid": local_hybrid, "gemini_assist": assist_meta}
+
+
+def _stage_heatmap(ctx):
+    stt = ctx["stt"]
+    return _build_word_heatmap(
+        stt.get("text", ""), ctx["duration"], ctx["scores"]["local_hybrid"], ctx["lang_quality"],
+        asr_words=stt.get("words", [])
+    )
+
+
+def _stage_pitch_overlay(ctx):
+    return _build_pitch_overlay(
+        ctx["pitch"], ctx["question"], voice=ctx["voice"], use_tts_reference=ctx["use_tts_reference"]
+    )
+
+
+def _stage_bkt(ctx):
+    return _build_bkt_update(ctx["scores"]["local_hybrid"]["overall_score"], skill=ctx["skill"], p_prior=ctx["p_prior"])
+
+
+def _stage_hybrid_eval(ctx):
+    """/api/speaking/evaluate-hybrid: XGBoost + issues + Gemini feedback trên features dùng chung"""
+    return evaluate_speaking_hybrid(
+        audio_path=ctx["process_path"],
+        transcript=ctx["transcript"],
+        target_question=ctx["question"],
+        gemini_service=gemini_service,
+        audio=ctx["audio"],
+        pitch_engine=ctx["pitch_engine"],
+        features=ctx["features"]
+    )
+
+
+speaking_pipeline = Pipeline([
+    Stage("stt", _stage_stt, deps=("audio", "process_path", "asr_tier")),
+    Stage("pitch", _stage_pitch, deps=("audio", "process_path", "pitch_engine")),
+    Stage("features", _stage_features, deps=("audio", "process_path", "pitch_engine")),
+    Stage("duration", _stage_duration, deps=("audio", "process_path"), inline=True),
+    Stage("physical_score", _stage_physical_score, deps=("features",), inline=True),
+    Stage("lang_quality", _stage_lang_quality, deps=("stt", "question", "policy")),
+    Stage("gemini_assist", _stage_gemini_assist, deps=("stt", "lang_quality", "features", "use_gemini_assist")),
+    Stage("base_scores", _stage_base_scores, deps=("physical_score", "features", "lang_quality", "policy"), inline=True),
+    Stage("scores", _stage_scores, deps=("base_scores", "gemini_assist", "lang_quality", "policy"), inline=True),
+    Stage("heatmap", _stage_heatmap, deps=("stt", "duration", "scores", "lang_quality"), inline=True),
+    Stage("pitch_overlay", _stage_pitch_overlay, deps=("pitch", "question", "voice", "use_tts_reference")),
+    Stage("bkt", _stage_bkt, deps=("scores", "skill", "p_prior"), inline=True),
+    Stage("hybrid_eval", _stage_hybrid_eval, deps=("features", "transcript", "question"))
+], executor=executor, name="speaking")
+
+# Đủ dữ liệu cho báo cáo chấm điểm đầy đủ (check / check-stream / practice / live)
+SPEAKING_REPORT_STAGES = ("stt", "pitch", "features", "duration", "scores", "heatmap", "pitch_overlay", "bkt")
+
+# outputs= / fields=: field response → stage cần (stage phụ thuộc do pipeline tự kéo theo).
+# "scores" luôn chạy (overall_score + nhánh xử lý của endpoint dựa trên nó)
+SPEAKING_FIELD_STAGES = {
+    "transcript": ("stt",),
+    "asr_words": ("stt",),
+    "asr_segments": ("stt",),
+    "asr_tier": ("stt",),
+    "pitch_data": ("pitch",),
+    "overall_score": (),
+    "scores": (),
+    "radar_chart": (),
+    "detailed_feedback": (),
+    "feedback": (),
+    "content_diagnostics": (),
+    "gemini_assist": (),
+    "scoring_policy": (),
+    "word_heatmap": ("heatmap",),
+    "pitch_overlay": ("pitch_overlay",),
+    "bkt_update": ("bkt",),
+    "live": ("duration",),
+    # Field của bản nhận xét Gemini/Ollama đầy đủ (use_gemini_full) / practice
+    "local_hybrid": (),
+    "mistakes_timeline": (),
+    "vocab_upgrade": (),
+    "better_version": (),
+    "encouragement": ()
+}
+SPEAKING_CORE_STAGES = ("scores",)
+# Luôn giữ trong response dù không được xin
+SPEAKING_ALWAYS_FIELDS = ("source", "stage", "session_id", "unscorable", "error")
+
+
+# check-stream: event tiến trình → field tương ứng (lọc theo outputs= / fields=)
+STREAM_EVENT_FIELDS = {
+    "transcript": "transcript",
+    "asr_words": "asr_words",
+    "pitch": "pitch_data",
+    "acoustic_score": "scores",
+    "language_quality": "content_diagnostics",
+    "pitch_overlay": "pitch_overlay"
+}
+# quick_score: điểm local ngay khi có base_scores (không chờ Gemini assist);
+# final_score: bản đã blend Gemini assist + heatmap + BKT khi các stage này (nếu có chạy) đều xong
+STREAM_FINAL_STAGES = ("scores", "heatmap", "bkt")
+
+
+def _resolve_speaking_outputs(form):
+    """outputs= / fields= (danh sách cách nhau bởi dấu phẩy) → (tập field | None, targets pipeline)"""
+    raw = form.get("outputs") or form.get("fields") or ""
+    fields = {f.strip() for f in str(raw).split(",") if f.strip()}
+    if not fields:
+        return None, SPEAKING_REPORT_STAGES
+    unknown = fields - set(SPEAKING_FIELD_STAGES)
+    if unknown:
+        print(f"⚠️ [SPEAKING] Bỏ qua field không hỗ trợ: {sorted(unknown)}")
+    targets = set(SPEAKING_CORE_STAGES)
+    for field in fields - unknown:
+        targets.update(SPEAKING_FIELD_STAGES[field])
+    return fields, tuple(sorted(targets))
+
+
+def _select_fields(payload, fields):
+    """Chỉ trả các field được xin (fields=None → nguyên payload)"""
+    if fields is None:
+        return payload
+    return {k: v for k, v in payload.items() if k in fields or k in SPEAKING_ALWAYS_FIELDS}
+
+
 # ==========================================
 # 🎛️ API: SPEAKING SCORING POLICY (ADMIN/FE)
 # ==========================================
@@ -759,6 +1006,32 @@ def resolve_speaking_scoring_policy():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/api/speaking/perf-stats', methods=['GET'])
+def get_speaking_perf_stats():
+    """Thống kê hiệu năng pipeline speaking (pitch dùng chung, thời gian pYIN, cache...)."""
+    try:
+        return jsonify({
+            "success": True,
+            "pitch": get_pitch_stats(),
+            "cache": analysis_cache.stats(),
+            "asr_batching": get_asr_batch_stats(),
+            "asr_engines": get_asr_engine_status(),
+            "asr_policy": get_asr_policy_stats(),
+            "asr_replicas": get_asr_replica_stats(),
+            "sidecar": get_sidecar_stats(),
+            "model_registry": get_model_registry_stats(),
+            "pipeline": speaking_pipeline.stats(),
+            "reference_pitch": get_reference_pitch_stats(),
+            "process_pool": get_process_pool_stats(),
+            "live": live_sessions.stats(),
+            "upload_io": get_upload_io_stats(),
+            "decoder": get_decoder_stats(),
+            "quality_gate": get_quality_gate_stats()
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 
 
 # ==========================================
@@ -803,48 +1076,46 @@ def check_writing():
 @app.route('/api/speaking/check', methods=['POST'])
 def evaluate_speaking():
     global LAST_QUOTA_ERROR_TIME
+    upload = None
+    pipeline_started = None
     try:
         if 'audio' not in request.files: return jsonify({"error": "No file"}), 400
         audio_file = request.files['audio']
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-            audio_file.save(tmp.name)
-            tmp_path = tmp.name
-
-        # --- SAFELY CONVERT WEBM/OPUS TO 16kHz MONO WAV FOR LIBROSA ---
-        wav_path = tmp_path + ".wav"
-        try:
-            from pydub import AudioSegment
-            AudioSegment.from_file(tmp_path).set_frame_rate(16000).set_channels(1).export(wav_path, format="wav")
-            process_path = wav_path
-        except Exception as e:
-            print(f"⚠️ [WARNING] Pydub Conversion failed: {e}")
-            process_path = tmp_path
-
-        # 1. Chạy song song STT, Pitch và Đặc trưng âm học sâu (Pro Features)
-        future_stt = executor.submit(transcribe_audio_detailed, process_path)
-        future_pitch = executor.submit(extract_pitch, process_path)
-        future_feats = executor.submit(extract_audio_features_pro, process_path)
-        
-        # 2. Đợi kết quả (Parallel Execution)
-        stt_res = future_stt.result()
+        # --- DECODE WEBM/OPUS 1 LẦN TRONG RAM → 16kHz MONO BUFFER DÙNG CHUNG ---
+        upload = receive_upload(audio_file, suffix=".webm")
+        process_path, audio = upload.path, upload.audio
+
+        # 🚦 Bản ghi im lặng / quá ngắn / vỡ tiếng → trả "unscorable" ngay, không chạy pipeline
+        gate = check_audio_quality(audio)
+        if not gate.ok:
+            return jsonify(_unscorable_payload(gate)), 200
+        pipeline_started = time.perf_counter()
+
+        # 1. Pipeline DAG: STT / Pitch / Features song song, LanguageTool + Gemini assist chạy ngay khi có transcript
+        #    outputs= / fields= → chỉ chạy các stage cần cho field được xin
+        fields, targets = _resolve_speaking_outputs(request.form)
+        inputs = _speaking_inputs(request.form, audio, process_path, fields=fields)
+        run = speaking_pipeline.run(inputs, targets=targets)
+        stt_res = run["stt"]
         transcript = stt_res.get("text", "")
-        asr_words = stt_res.get("words", []) if isinstance(stt_res, dict) else []
-        asr_segments = stt_res.get("segments", []) if isinstance(stt_res, dict) else []
-        pitch_data = future_pitch.result()
-        acoustic_feats = future_feats.result()
-        audio_duration = get_audio_duration(process_path)
-        
-        # 3. XGBoost Physical Scoring
-        physical_score = 0
+        asr_words = stt_res.get("words", [])
+        asr_segments = stt_res.get("segments", [])
+        pitch_data = run.get("pitch")
+        acoustic_feats = run["features"]
+        physical_score = run["physical_score"]
+        target_question = inputs["question"]
+        policy = inputs["policy"]
+        lang_quality = run["lang_quality"]
+        local_hybrid = run["scores"]["local_hybrid"]
+        gemini_assist_meta = run["scores"]["gemini_assist"]
+        word_heatmap = run.get("heatmap")
+        pitch_overlay = run.get("pitch_overlay")
+        bkt_update = run.get("bkt")
+
+        # 2. Bằng chứng kỹ thuật cực kỳ chi tiết cho Gemini (XGBoost Physical Scoring)
         tech_evidence = "No technical evidence available."
-        target_question = request.form.get("question", "") # Lấy câu hỏi mục tiêu nếu có
-        policy = _resolve_speaking_policy(request.form)
-        
-        if speaking_model and acoustic_feats:
-            df_feats = pd.DataFrame([acoustic_feats])
-            physical_score = float(speaking_model.predict(df_feats)[0])
-            # Tạo chuỗi bằng chứng kỹ thuật cực kỳ chi tiết cho Gemini
+        if speaking_runner and acoustic_feats:
             tech_evidence = f"""
             - Predicted Accuracy (XGBoost): {physical_score:.2f}/9.0
             - Target Question: "{target_question}"
@@ -855,51 +1126,13 @@ def evaluate_speaking():
             - Key Spectral Feature (MFCC_8): {acoustic_feats['mfcc_8']:.2f}
             """
 
-        # 4) Local Hybrid Score (Tai + Não text-level): chống bias chỉ dựa vào lưu loát
-        lang_quality = _analyze_speaking_language_quality(transcript, target_question, policy=policy)
-        acoustic_fluency = _score_acoustic_fluency(acoustic_feats)
-        local_hybrid = _build_hybrid_speaking_scores(
-            pronunciation_score=physical_score,
-            lang_quality=lang_quality,
-            acoustic_fluency=acoustic_fluency,
-            pron_weight=policy["pron_weight"],
-            content_weight=policy["content_weight"],
-            policy=policy
-        )
-
-        gemini_assist = str(request.form.get("gemini_assist", "1")).lower() in ("1", "true", "yes", "on")
-        gemini_assist_meta = None
-        if gemini_assist and time.time() - LAST_QUOTA_ERROR_TIME > OFFLINE_COOLDOWN:
-            try:
-                local_hybrid, gemini_assist_meta = _gemini_assist_language_quality(
-                    transcript,
-                    target_question,
-                    local_hybrid,
-                    lang_quality,
-                    policy
-                )
-            except Exception as e:
-                print(f"⚠️ Gemini assist scoring failed: {e}")
-        word_heatmap = _build_word_heatmap(transcript, audio_duration, local_hybrid, lang_quality, asr_words=asr_words)
-        pitch_overlay = _build_pitch_overlay(
-            pitch_data,
-            target_question,
-            voice=request.form.get("voice", "en-GB-SoniaNeural"),
-            use_tts_reference=str(request.form.get("use_tts_reference", "1")).lower() in ("1", "true", "yes", "on")
-        )
-        bkt_update = _build_bkt_update(
-            local_hybrid["overall_score"],
-            skill=request.form.get("skill", "speaking_overall"),
-            p_prior=request.form.get("p_prior", 0.5)
-        )
-
-        # 5) Full Gemini narrative là optional, nhưng Gemini-assist score có thể chạy trước (linh hoạt)
+        # 3) Full Gemini narrative là optional, nhưng Gemini-assist score có thể chạy trước (linh hoạt)
         use_gemini = str(request.form.get("use_gemini", "0")).lower() in ("1", "true", "yes", "on")
         use_gemini_full = use_gemini or str(request.form.get("use_gemini_full", "0")).lower() in ("1", "true", "yes", "on")
         if physical_score > 0 and not use_gemini_full:
             final_score = local_hybrid["overall_score"]
-            clean_temp_file(tmp_path, wav_path)
-            return jsonify({
+            upload.close()
+            return jsonify(_select_fields({
                 "transcript": transcript,
                 "pitch_data": pitch_data,
                 "overall_score": final_score,
@@ -920,18 +1153,15 @@ def evaluate_speaking():
                 "word_heatmap": word_heatmap,
                 "asr_words": asr_words,
                 "asr_segments": asr_segments,
+                "asr_tier": stt_res.get("asr_tier"),
                 "pitch_overlay": pitch_overlay,
                 "bkt_update": bkt_update,
-                "scoring_policy": {
-                    "profile": request.form.get("scoring_profile", "balanced"),
-                    "pron_weight": round(policy["pron_weight"], 3),
-                    "content_weight": round(policy["content_weight"], 3)
-                },
+                "scoring_policy": _policy_summary(request.form, policy),
                 "gemini_assist": gemini_assist_meta,
                 "source": "xgboost-hybrid-local"
-            }), 200
+            }, fields)), 200
 
-        # 6. Gemini/Ollama full narrative (với đầy đủ bằng chứng kỹ thuật)
+        # 4. Gemini/Ollama full narrative (với đầy đủ bằng chứng kỹ thuật)
         prompt = f"""
         Role: Senior IELTS Speaking Examiner (Hybrid AI Tutor).
         Transcript: "{transcript[:2000]}"
@@ -972,7 +1202,7 @@ def evaluate_speaking():
         if not ai_result and check_ollama_status():
             ai_result = call_ollama(prompt)
 
-        clean_temp_file(tmp_path, wav_path)
+        upload.close()
 
         if ai_result:
             ai_score = ai_result.get("overall_score", local_hybrid["overall_score"])
@@ -994,20 +1224,17 @@ def evaluate_speaking():
             ai_result["word_heatmap"] = word_heatmap
             ai_result["asr_words"] = asr_words
             ai_result["asr_segments"] = asr_segments
+            ai_result["asr_tier"] = stt_res.get("asr_tier")
             ai_result["pitch_overlay"] = pitch_overlay
             ai_result["bkt_update"] = bkt_update
             ai_result["gemini_assist"] = gemini_assist_meta
-            ai_result["scoring_policy"] = {
-                "profile": request.form.get("scoring_profile", "balanced"),
-                "pron_weight": round(policy["pron_weight"], 3),
-                "content_weight": round(policy["content_weight"], 3)
-            }
+            ai_result["scoring_policy"] = _policy_summary(request.form, policy)
             ai_result["source"] = "hybrid-fused"
-            return jsonify(ai_result), 200
+            return jsonify(_select_fields(ai_result, fields)), 200
         
         # Fallback cuối cùng nếu cả 2 đều lỗi
         final_score = local_hybrid["overall_score"] if physical_score > 0 else 5.0
-        return jsonify({
+        return jsonify(_select_fields({
             "transcript": transcript, 
             "pitch_data": pitch_data,
             "overall_score": final_score,
@@ -1031,271 +1258,234 @@ def evaluate_speaking():
             "word_heatmap": word_heatmap,
             "asr_words": asr_words,
             "asr_segments": asr_segments,
+            "asr_tier": stt_res.get("asr_tier"),
             "pitch_overlay": pitch_overlay,
             "bkt_update": bkt_update,
             "gemini_assist": gemini_assist_meta,
-            "scoring_policy": {
-                "profile": request.form.get("scoring_profile", "balanced"),
-                "pron_weight": round(policy["pron_weight"], 3),
-                "content_weight": round(policy["content_weight"], 3)
-            },
+            "scoring_policy": _policy_summary(request.form, policy),
             "source": "xgboost-fallback"
-        }), 200
+        }, fields)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        if upload is not None:
+            upload.close()
+        if pipeline_started is not None:
+            record_scored(time.perf_counter() - pipeline_started)
+
+
+def _stream_score_fields(hybrid):
+    """overall_score / scores / radar_chart của check-stream từ 1 bộ điểm hybrid"""
+    return {
+        "overall_score": hybrid["overall_score"],
+        "scores": hybrid,
+        "radar_chart": {
+            "Fluency": hybrid.get("fluency", 5.0),
+            "Pronunciation": hybrid.get("pronunciation", 5.0),
+            "Lexical": hybrid.get("lexical", 5.0),
+            "Grammar": hybrid.get("grammar", 5.0)
+        }
+    }
+
+
+def _stream_deep_analysis(transcript, target_question, local_hybrid):
+    """Nhận xét sâu Gemini/Ollama cho check-stream, điểm fuse 0.55 AI / 0.45 local"""
+    global LAST_QUOTA_ERROR_TIME
+    prompt = f"""
+    Role: Senior IELTS Speaking Examiner (Hybrid AI Tutor).
+    Transcript: "{transcript}"
+    Target Question: "{target_question}"
+    Local Hybrid Score: {local_hybrid['overall_score']}/9
+    Give deep feedback in Vietnamese with JSON keys:
+    overall_score (0.0-9.0),
+    detailed_feedback (object with keys: overall_assessment, strengths, areas_for_improvement, coach_tips),
+    radar_chart (object with keys: Fluency, Lexical, Grammar, Pronunciation - values must be numbers 0-9),
+    vocab_upgrade (list),
+    better_version (string).
+    """
+
+    ai_result = None
+    if time.time() - LAST_QUOTA_ERROR_TIME > OFFLINE_COOLDOWN:
+        ai_result = gemini_service.call_gemini_json(prompt)
+        if not ai_result:
+            LAST_QUOTA_ERROR_TIME = time.time()
+
+    if not ai_result and check_ollama_status():
+        ai_result = call_ollama(prompt)
+
+    if not ai_result:
+        return {
+            "overall_score": local_hybrid["overall_score"],
+            "detailed_feedback": "Không lấy được Gemini/Ollama, giữ kết quả local.",
+            "source": "xgboost-hybrid-local"
+        }
+
+    try:
+        ai_score = float(ai_result.get("overall_score", local_hybrid["overall_score"]))
+    except Exception:
+        ai_score = float(local_hybrid["overall_score"])
+
+    ai_result["overall_score"] = _round_half((ai_score * 0.55) + (local_hybrid["overall_score"] * 0.45))
+    ai_result["source"] = "hybrid-fused-stream"
+    return ai_result
 
 
 @app.route('/api/speaking/check-stream', methods=['POST'])
 def evaluate_speaking_stream():
-    global LAST_QUOTA_ERROR_TIME
     if 'audio' not in request.files:
         return jsonify({"error": "No file"}), 400
 
     audio_file = request.files['audio']
-    target_question = request.form.get("question", "")
-    force_gemini = str(request.form.get("use_gemini", "1")).lower() in ("1", "true", "yes", "on")
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-        audio_file.save(tmp.name)
-        tmp_path = tmp.name
-
-    wav_path = tmp_path + ".wav"
-    process_path = tmp_path
-    try:
-        AudioSegment.from_file(tmp_path).set_frame_rate(16000).set_channels(1).export(wav_path, format="wav")
-        process_path = wav_path
-    except Exception as e:
-        print(f"⚠️ [STREAM] Convert failed: {e}")
+    force_gemini = _form_flag(request.form, "use_gemini")
 
     def generate_events():
-        global LAST_QUOTA_ERROR_TIME
+        upload = None
+        pipeline_started = None
+        stages = None
+        deep_future = None
         try:
-            # Stage 1: local analysis (nhanh)
-            stt_res = transcribe_audio_detailed(process_path)
-            transcript = stt_res.get("text", "")
-            asr_words = stt_res.get("words", []) if isinstance(stt_res, dict) else []
-            asr_segments = stt_res.get("segments", []) if isinstance(stt_res, dict) else []
-            pitch_data = extract_pitch(process_path)
-            acoustic_feats = extract_audio_features_pro(process_path)
-            audio_duration = get_audio_duration(process_path)
-            policy = _resolve_speaking_policy(request.form)
-
-            physical_score = 0.0
-            if speaking_model and acoustic_feats:
-                physical_score = float(speaking_model.predict(pd.DataFrame([acoustic_feats]))[0])
-
-            lang_quality = _analyze_speaking_language_quality(transcript, target_question, policy=policy)
-            local_hybrid = _build_hybrid_speaking_scores(
-                pronunciation_score=physical_score,
-                lang_quality=lang_quality,
-                acoustic_fluency=_score_acoustic_fluency(acoustic_feats),
-                pron_weight=policy["pron_weight"],
-                content_weight=policy["content_weight"],
-                policy=policy
-            )
-
-            gemini_assist_meta = None
-            gemini_assist = str(request.form.get("gemini_assist", "1")).lower() in ("1", "true", "yes", "on")
-            if gemini_assist and time.time() - LAST_QUOTA_ERROR_TIME > OFFLINE_COOLDOWN:
-                local_hybrid, gemini_assist_meta = _gemini_assist_language_quality(
-                    transcript,
-                    target_question,
-                    local_hybrid,
-                    lang_quality,
-                    policy
-                )
-
-            quick_payload = {
-                "stage": "quick",
-                "transcript": transcript,
-                "overall_score": local_hybrid["overall_score"],
-                "scores": local_hybrid,
-                "radar_chart": {
-                    "Fluency": local_hybrid.get("fluency", 5.0),
-                    "Pronunciation": local_hybrid.get("pronunciation", 5.0),
-                    "Lexical": local_hybrid.get("lexical", 5.0),
-                    "Grammar": local_hybrid.get("grammar", 5.0)
-                },
-                "scoring_policy": {
-                    "profile": request.form.get("scoring_profile", "balanced"),
-                    "pron_weight": round(policy["pron_weight"], 3),
-                    "content_weight": round(policy["content_weight"], 3)
-                },
-                "gemini_assist": gemini_assist_meta,
-                "content_diagnostics": {
-                    "word_count": lang_quality["word_count"],
-                    "relevance_ratio": lang_quality["relevance_ratio"],
-                    "short_answer_penalty": lang_quality["short_answer_penalty"]
-                },
-                "word_heatmap": _build_word_heatmap(transcript, audio_duration, local_hybrid, lang_quality, asr_words=asr_words),
-                "asr_words": asr_words,
-                "asr_segments": asr_segments,
-                "pitch_overlay": _build_pitch_overlay(
-                    pitch_data,
-                    target_question,
-                    voice=request.form.get("voice", "en-GB-SoniaNeural"),
-                    use_tts_reference=str(request.form.get("use_tts_reference", "1")).lower() in ("1", "true", "yes", "on")
-                ),
-                "bkt_update": _build_bkt_update(
-                    local_hybrid["overall_score"],
-                    skill=request.form.get("skill", "speaking_overall"),
-                    p_prior=request.form.get("p_prior", 0.5)
-                )
-            }
-            yield _sse("quick_score", quick_payload)
+            # Decode / gate / đọc policy nằm trong try → lỗi nào cũng thành event "error" và upload luôn được giải phóng
+            upload = receive_upload(audio_file, suffix=".webm")
+            gate = check_audio_quality(upload.audio)
+            if not gate.ok:
+                yield _sse("unscorable", _unscorable_payload(gate))
+                yield _sse("done", {"ok": False, "reason_code": gate.reason})
+                return
 
-            # Stage 2: deep analysis (Gemini/Ollama)
-            if not force_gemini:
+            fields, targets = _resolve_speaking_outputs(request.form)
+            inputs = _speaking_inputs(request.form, upload.audio, upload.path, fields=fields)
+            target_question = inputs["question"]
+            scoring_policy = _policy_summary(request.form, inputs["policy"])
+            # Stage đứng sau final_score (chỉ những stage thực sự được chạy với targets này)
+            final_stages = [name for name in STREAM_FINAL_STAGES if name in speaking_pipeline.required(targets)]
+
+            def _wants(event_name):
+                return fields is None or STREAM_EVENT_FIELDS[event_name] in fields
+
+            # Stage 1: local analysis - pipeline DAG chạy song song, mỗi artifact xong là đẩy event ngay
+            pipeline_started = time.perf_counter()
+            stages = speaking_pipeline.stream(inputs, targets=targets)
+            local_hybrid = None
+            for name, value, ctx in stages:
+                if name == "stt":
+                    if _wants("transcript"):
+                        yield _sse("transcript", {"transcript": value.get("text", ""), "asr_tier": value.get("asr_tier")})
+                    if _wants("asr_words"):
+                        yield _sse("asr_words", {"asr_words": value.get("words", []), "asr_segments": value.get("segments", [])})
+                elif name == "pitch" and _wants("pitch"):
+                    yield _sse("pitch", {"pitch_data": value})
+                elif name == "physical_score" and _wants("acoustic_score"):
+                    yield _sse("acoustic_score", {
+                        "pronunciation": round(float(value), 2),
+                        "acoustic_fluency": round(_score_acoustic_fluency(ctx["features"]), 2)
+                    })
+                elif name == "lang_quality" and _wants("language_quality"):
+                    yield _sse("language_quality", {"content_diagnostics": value})
+                elif name == "pitch_overlay" and _wants("pitch_overlay"):
+                    yield _sse("pitch_overlay", {"pitch_overlay": value})
+
+                if name == "base_scores":
+                    stt_res = ctx["stt"]
+                    lang_quality = ctx["lang_quality"]
+                    quick_payload = {
+                        "stage": "quick",
+                        "transcript": stt_res.get("text", ""),
+                        **_stream_score_fields(value),
+                        "scoring_policy": scoring_policy,
+                        "content_diagnostics": {
+                            "word_count": lang_quality["word_count"],
+                            "relevance_ratio": lang_quality["relevance_ratio"],
+                            "short_answer_penalty": lang_quality["short_answer_penalty"]
+                        },
+                        "asr_words": stt_res.get("words", []),
+                        "asr_segments": stt_res.get("segments", []),
+                        "asr_tier": stt_res.get("asr_tier"),
+                        # Overlay (TTS mẫu) thường xong sau → có event pitch_overlay riêng
+                        "pitch_overlay": ctx.get("pitch_overlay")
+                    }
+                    yield _sse("quick_score", _select_fields(quick_payload, fields))
+
+                if local_hybrid is None and name in final_stages and all(stage in ctx for stage in final_stages):
+                    local_hybrid = ctx["scores"]["local_hybrid"]
+                    yield _sse("final_score", _select_fields({
+                        "stage": "final",
+                        **_stream_score_fields(local_hybrid),
+                        "gemini_assist": ctx["scores"]["gemini_assist"],
+                        "word_heatmap": ctx.get("heatmap"),
+                        "bkt_update": ctx.get("bkt")
+                    }, fields))
+
+                    # Stage 2: deep analysis (Gemini/Ollama) chạy song song với các stage còn lại (overlay)
+                    if force_gemini:
+                        deep_future = executor.submit(
+                            _stream_deep_analysis, ctx["stt"].get("text", ""), target_question, local_hybrid
+                        )
+
+            if deep_future is None:
                 yield _sse("done", {"source": "xgboost-hybrid-local", "overall_score": local_hybrid["overall_score"]})
                 return
 
-            prompt = f"""
-            Role: Senior IELTS Speaking Examiner (Hybrid AI Tutor).
-            Transcript: "{transcript}"
-            Target Question: "{target_question}"
-            Local Hybrid Score: {local_hybrid['overall_score']}/9
-            Give deep feedback in Vietnamese with JSON keys:
-            overall_score (0.0-9.0),
-            detailed_feedback (object with keys: overall_assessment, strengths, areas_for_improvement, coach_tips),
-            radar_chart (object with keys: Fluency, Lexical, Grammar, Pronunciation - values must be numbers 0-9),
-            vocab_upgrade (list),
-            better_version (string).
-            """
-
-            ai_result = None
-            if time.time() - LAST_QUOTA_ERROR_TIME > OFFLINE_COOLDOWN:
-                ai_result = gemini_service.call_gemini_json(prompt)
-                if not ai_result:
-                    LAST_QUOTA_ERROR_TIME = time.time()
-
-            if not ai_result and check_ollama_status():
-                ai_result = call_ollama(prompt)
-
-            if ai_result:
-                try:
-                    ai_score = float(ai_result.get("overall_score", local_hybrid["overall_score"]))
-                except Exception:
-                    ai_score = float(local_hybrid["overall_score"])
-
-                fused_score = _round_half((ai_score * 0.55) + (local_hybrid["overall_score"] * 0.45))
-                ai_result["overall_score"] = fused_score
-                ai_result["source"] = "hybrid-fused-stream"
-                yield _sse("deep_analysis", ai_result)
-            else:
-                yield _sse("deep_analysis", {
-                    "overall_score": local_hybrid["overall_score"],
-                    "detailed_feedback": "Không lấy được Gemini/Ollama, giữ kết quả local.",
-                    "source": "xgboost-hybrid-local"
-                })
-
+            yield _sse("deep_analysis", deep_future.result())
             yield _sse("done", {"ok": True})
         except Exception as e:
             yield _sse("error", {"error": str(e)})
         finally:
-            clean_temp_file(tmp_path, wav_path)
+            if stages is not None:
+                stages.close()  # client ngắt giữa chừng → huỷ stage chưa chạy
+            if deep_future is not None:
+                deep_future.cancel()
+            if upload is not None:
+                upload.close()
+            if pipeline_started is not None:
+                record_scored(time.perf_counter() - pipeline_started)
 
     return Response(stream_with_context(generate_events()), mimetype='text/event-stream')
 
 # Endpoint mới đồng bộ với Node Controller SpeakingPractice.js (Luyện tập theo Topic - CHỈ DÙNG XGBOOST)
 @app.route('/api/speaking-practice/evaluate', methods=['POST'])
 def evaluate_speaking_practice():
+    upload = None
+    pipeline_started = None
     try:
         if 'audio' not in request.files: return jsonify({"error": "No audio file provided"}), 400
         audio_file = request.files['audio']
         question = request.form.get('question', 'General Speaking')
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-            audio_file.save(tmp.name)
-            tmp_path = tmp.name
-
-        # --- SAFELY CONVERT WEBM/OPUS TO 16kHz MONO WAV FOR LIBROSA ---
-        wav_path = tmp_path + ".wav"
-        try:
-            from pydub import AudioSegment
-            AudioSegment.from_file(tmp_path).set_frame_rate(16000).set_channels(1).export(wav_path, format="wav")
-            process_path = wav_path
-        except Exception as e:
-            print(f"⚠️ [WARNING] Pydub Conversion failed: {e}")
-            process_path = tmp_path
-
-        # 1. Chạy song song STT, Pitch và Acoustic Features
-        future_stt = executor.submit(transcribe_audio_detailed, process_path)
-        future_pitch = executor.submit(extract_pitch, process_path)
-        future_feats = executor.submit(extract_audio_features_pro, process_path)
-        
-        stt_res = future_stt.result()
+        # --- DECODE WEBM/OPUS 1 LẦN TRONG RAM → 16kHz MONO BUFFER DÙNG CHUNG ---
+        upload = receive_upload(audio_file, suffix=".webm")
+        process_path, audio = upload.path, upload.audio
+
+        # 🚦 Bản ghi im lặng / quá ngắn / vỡ tiếng → trả "unscorable" ngay, không chạy pipeline
+        gate = check_audio_quality(audio)
+        if not gate.ok:
+            return jsonify(_unscorable_payload(gate)), 200
+        pipeline_started = time.perf_counter()
+
+        # 1. Pipeline DAG: STT, Pitch và Acoustic Features song song → XGBoost + Language Scoring (Offline Hybrid)
+        fields, targets = _resolve_speaking_outputs(request.form)
+        inputs = _speaking_inputs(request.form, audio, process_path, question=question, fields=fields)
+        run = speaking_pipeline.run({**inputs, "neutral_fallback": True}, targets=targets)
+        stt_res = run["stt"]
         transcript = stt_res.get("text", "")
-        asr_words = stt_res.get("words", []) if isinstance(stt_res, dict) else []
-        asr_segments = stt_res.get("segments", []) if isinstance(stt_res, dict) else []
-        pitch_data = future_pitch.result()
-        acoustic_feats = future_feats.result()
-        audio_duration = get_audio_duration(process_path)
-        policy = _resolve_speaking_policy(request.form)
-        
-        # 2. XGBoost + Language Scoring (Offline Hybrid)
-        overall_score = 5.0
-        pron_score = 5.0
-        feedback_msg = "Không thể chấm điểm vật lý, trả về điểm mặc định."
-        gemini_assist_meta = None
-        
-        if speaking_model and acoustic_feats:
-            df_feats = pd.DataFrame([acoustic_feats])
-            pron_score = float(speaking_model.predict(df_feats)[0])
-            lang_quality = _analyze_speaking_language_quality(transcript, question, policy=policy)
-            acoustic_fluency = _score_acoustic_fluency(acoustic_feats)
-            local_hybrid = _build_hybrid_speaking_scores(
-                pron_score,
-                lang_quality,
-                acoustic_fluency,
-                pron_weight=policy["pron_weight"],
-                content_weight=policy["content_weight"],
-                policy=policy
-            )
-
-            gemini_assist = str(request.form.get("gemini_assist", "1")).lower() in ("1", "true", "yes", "on")
-            if gemini_assist and time.time() - LAST_QUOTA_ERROR_TIME > OFFLINE_COOLDOWN:
-                try:
-                    local_hybrid, gemini_assist_meta = _gemini_assist_language_quality(
-                        transcript,
-                        question,
-                        local_hybrid,
-                        lang_quality,
-                        policy
-                    )
-                except Exception as e:
-                    print(f"⚠️ SpeakingPractice gemini-assist failed: {e}")
+        pitch_data = run.get("pitch")
+        policy = inputs["policy"]
+        lang_quality = run["lang_quality"]
 
+        if speaking_runner and run["features"]:
+            local_hybrid = run["scores"]["local_hybrid"]
+            gemini_assist_meta = run["scores"]["gemini_assist"]
             overall_score = local_hybrid["overall_score"]
-            feedback_msg = _feedback_from_policy(local_hybrid, policy)
         else:
-            lang_quality = _analyze_speaking_language_quality(transcript, question, policy=policy)
-            local_hybrid = _build_hybrid_speaking_scores(
-                5.0,
-                lang_quality,
-                5.0,
-                pron_weight=policy["pron_weight"],
-                content_weight=policy["content_weight"],
-                policy=policy
-            )
-            feedback_msg = _feedback_from_policy(local_hybrid, policy)
-
-        word_heatmap = _build_word_heatmap(transcript, audio_duration, local_hybrid, lang_quality, asr_words=asr_words)
-        pitch_overlay = _build_pitch_overlay(
-            pitch_data,
-            question,
-            voice=request.form.get("voice", "en-GB-SoniaNeural"),
-            use_tts_reference=str(request.form.get("use_tts_reference", "1")).lower() in ("1", "true", "yes", "on")
-        )
-        bkt_update = _build_bkt_update(
-            local_hybrid["overall_score"],
-            skill=request.form.get("skill", "speaking_overall"),
-            p_prior=request.form.get("p_prior", 0.5)
-        )
+            # Không chấm được điểm vật lý: pronunciation / fluency trung tính 5.0 (stage scores), không Gemini assist
+            local_hybrid = run["scores"]["base"]
+            gemini_assist_meta = None
+            overall_score = 5.0
+        feedback_msg = _feedback_from_policy(local_hybrid, policy)
 
-        clean_temp_file(tmp_path, wav_path)
+        upload.close()
 
         # Trả về format đồng bộ với Frontend SpeakingPractice.jsx
-        return jsonify({
+        return jsonify(_select_fields({
             "scores": {
                 "overall": round(overall_score, 1),
                 "fluency": round(local_hybrid["fluency"], 1),
@@ -1321,39 +1511,136 @@ def evaluate_speaking_practice():
                 "relevance_ratio": lang_quality.get("relevance_ratio", 0),
                 "short_answer_penalty": lang_quality.get("short_answer_penalty", 0)
             },
-            "word_heatmap": word_heatmap,
-            "asr_words": asr_words,
-            "asr_segments": asr_segments,
-            "pitch_overlay": pitch_overlay,
-            "bkt_update": bkt_update,
+            "word_heatmap": run.get("heatmap"),
+            "asr_words": stt_res.get("words", []),
+            "asr_segments": stt_res.get("segments", []),
+            "asr_tier": stt_res.get("asr_tier"),
+            "pitch_overlay": run.get("pitch_overlay"),
+            "bkt_update": run.get("bkt"),
             "gemini_assist": gemini_assist_meta,
-            "scoring_policy": {
-                "profile": request.form.get("scoring_profile", "balanced"),
-                "pron_weight": round(policy["pron_weight"], 3),
-                "content_weight": round(policy["content_weight"], 3)
-            },
+            "scoring_policy": _policy_summary(request.form, policy),
             "encouragement": "Tiếp tục luyện tập nhé! Bạn đang tiến bộ mỗi ngày. 🔥",
             "source": "xgboost-hybrid-local"
-        }), 200
+        }, fields)), 200
         
     except Exception as e:
         print(f"❌ Speaking Practice Evaluate Error: {e}")
         return jsonify({"error": str(e)}), 500
+    finally:
+        if upload is not None:
+            upload.close()
+        if pipeline_started is not None:
+            record_scored(time.perf_counter() - pipeline_started)
+
+# ==========================================
+# 🎙️ LIVE SPEAKING (chunked POST, PCM16 mono 16kHz)
+# ==========================================
+@app.route('/api/speaking/live/start', methods=['POST'])
+def live_speaking_start():
+    """Mở phiên nói trực tiếp. Form/JSON giống /api/speaking/check (question, voice, scoring_profile...)."""
+    try:
+        meta = dict(request.form.items()) if request.form else dict(request.get_json(silent=True) or {})
+        session = live_sessions.create(meta=meta)
+        return jsonify({
+            "success": True,
+            "session_id": session.session_id,
+            "sample_rate": LIVE_SR,
+            "format": "pcm16le-mono"
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/speaking/live/<session_id>/chunk', methods=['POST'])
+def live_speaking_chunk(session_id):
+    """Body = bytes PCM16; trả về transcript tạm của các đoạn đã commit."""
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({"success": False, "error": "Session not found"}), 404
+    try:
+        data = request.files['audio'].read() if 'audio' in request.files else request.get_data()
+        return jsonify({"success": True, **session.append_pcm16(data)}), 200
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 413
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/speaking/live/<session_id>/end', methods=['POST'])
+def live_speaking_end(session_id):
+    """Kết thúc phiên: transcribe đoạn cuối rồi chấm điểm hybrid local từ các đoạn đã có."""
+    session = live_sessions.pop(session_id)
+    if session is None:
+        return jsonify({"success": False, "error": "Session not found"}), 404
+    try:
+        form = {**session.meta, **dict(request.form.items())}
+
+        # 1. Transcript gộp từ các đoạn (phần lớn đã xong trong lúc học viên nói)
+        stt_res, samples = session.finish()
+
+        # 2. Pitch + 44 features trên toàn bộ audio (buffer dùng chung) → hybrid local
+        #    (transcript có sẵn → pipeline bỏ qua stage STT)
+        audio = AudioBuffer(samples, LIVE_SR)
+        gate = check_audio_quality(audio)
+        if not gate.ok:
+            return jsonify({**_unscorable_payload(gate), "session_id": session_id}), 200
+        fields, targets = _resolve_speaking_outputs(form)
+        inputs = _speaking_inputs(form, audio, fields=fields)
+        run = speaking_pipeline.run({**inputs, "stt": stt_res}, targets=targets)
+        transcript = stt_res.get("text", "")
+        asr_segments = stt_res.get("segments", [])
+        policy = inputs["policy"]
+        lang_quality = run["lang_quality"]
+        local_hybrid = run["scores"]["local_hybrid"]
+        audio_duration = run.get("duration") or audio.duration
+
+        return jsonify(_select_fields({
+            "transcript": transcript,
+            "pitch_data": run.get("pitch"),
+            "overall_score": local_hybrid["overall_score"] if run["physical_score"] > 0 else 5.0,
+            "detailed_feedback": _feedback_from_policy(local_hybrid, policy),
+            "radar_chart": {
+                "Fluency": local_hybrid["fluency"],
+                "Pronunciation": local_hybrid["pronunciation"],
+                "Lexical": local_hybrid["lexical"],
+                "Grammar": local_hybrid["grammar"]
+            },
+            "content_diagnostics": {
+                "semantic": local_hybrid["semantic"],
+                "word_usage": local_hybrid["word_usage"],
+                "word_count": lang_quality["word_count"],
+                "relevance_ratio": lang_quality["relevance_ratio"],
+                "short_answer_penalty": lang_quality["short_answer_penalty"]
+            },
+            "word_heatmap": run.get("heatmap"),
+            "asr_words": stt_res.get("words", []),
+            "asr_segments": asr_segments,
+            "asr_tier": stt_res.get("asr_tier"),
+            "pitch_overlay": run.get("pitch_overlay"),
+            "bkt_update": run.get("bkt"),
+            "scoring_policy": _policy_summary(form, policy),
+            "gemini_assist": run["scores"]["gemini_assist"],
+            "live": {"duration": round(audio_duration, 2), "segments": len(asr_segments)},
+            "source": "xgboost-hybrid-live"
+        }, fields)), 200
+    except Exception as e:
+        print(f"❌ Live Speaking End Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
 
 @app.route('/api/speaking/conversation', methods=['POST'])
 def conversation():
+    upload = None
     try:
         audio_file = request.files['audio']
         history_str = request.form.get('history', '[]') 
         voice_id = request.form.get('voice', 'en-GB-SoniaNeural') # Lấy giọng nói từ FE
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            audio_file.save(tmp.name)
-            tmp_path = tmp.name
-
-        # 1. Chạy song song STT và Pitch
-        future_stt = executor.submit(transcribe_audio, tmp_path)
-        future_pitch = executor.submit(extract_pitch, tmp_path)
+        # 1. Decode 1 lần trong RAM, chạy song song STT và Pitch trên cùng buffer
+        upload = receive_upload(audio_file, suffix=".mp3")
+        process_path, audio = upload.path, upload.audio
+        future_stt = executor.submit(transcribe_audio, process_path, audio=audio, tier=request.form.get("asr_tier"))
+        future_pitch = executor.submit(extract_pitch, process_path, audio=audio, engine=request.form.get("pitch_engine"))
         
         # 2. Đợi STT xong (Nhanh với Faster-Whisper)
         stt_res = future_stt.result()
@@ -1498,15 +1785,24 @@ def conversation():
 
         if audio_paths:
             try:
-                combined = AudioSegment.empty()
+                # Các đoạn Edge-TTS cùng giọng/bitrate → nối frame mp3, không decode/encode qua ffmpeg
+                if not merge_mp3_files(audio_paths, final_path):
+                    raise ValueError("Không có đoạn TTS nào")
+            except Exception as e:
+                print(f"⚠️ Merge Audio Error: {e}")
+                try:
+                    combined = AudioSegment.empty()
+                    for p in audio_paths:
+                        if os.path.exists(p):
+                            combined += AudioSegment.from_file(p)
+                    combined.export(final_path, format="mp3")
+                except Exception as e:
+                    print(f"⚠️ Merge Audio (pydub) Error: {e}")
+                    run_tts_sync(ai_response_text, final_path, voice=voice_id)
+            finally:
                 for p in audio_paths:
                     if os.path.exists(p):
-                        combined += AudioSegment.from_file(p)
                         os.remove(p)
-                combined.export(final_path, format="mp3")
-            except Exception as e:
-                print(f"⚠️ Merge Audio Error: {e}")
-                run_tts_sync(ai_response_text, final_path, voice=voice_id)
         else:
             run_tts_sync(ai_response_text, final_path, voice=voice_id)
 
@@ -1519,11 +1815,12 @@ def conversation():
         pitch_data = future_pitch.result()
         
         # --- Feature Extraction (The "Eyes") ---
-        fluency_stats = analytic_service.extract_fluency_features(tmp_path)
+        fluency_stats = analytic_service.extract_fluency_features(process_path, audio=audio)
         lexical_stats = analytic_service.extract_lexical_features(user_text)
 
         return jsonify({
             "user_transcript": user_text,
+            "asr_tier": stt_res.get("asr_tier"),
             "ai_response_text": ai_response_text,
             "ai_audio_url": f"{request.host_url}static/{final_filename}",
             "correction": correction_tip,
@@ -1537,8 +1834,8 @@ def conversation():
         return jsonify({"error": str(e)}), 500
     finally:
         # Đảm bảo dọn dẹp file tạm dù có lỗi hay không
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
-            clean_temp_file(tmp_path)
+        if upload is not None:
+            upload.close()
 
 # ==========================================
 # 🤖 API 4: AGENTIC CONTENT ENGINE
@@ -1725,6 +2022,8 @@ def evaluate_speaking_hybrid_api():
     Enhanced Speaking Evaluation using Hybrid Model
     XGBoost Physical Scoring + Gemini AI Feedback
     """
+    upload = None
+    pipeline_started = None
     try:
         if 'audio' not in request.files:
             return jsonify({"error": "No audio file provided"}), 400
@@ -1733,33 +2032,23 @@ def evaluate_speaking_hybrid_api():
         transcript = request.form.get('transcript', '')
         question = request.form.get('question', '')
         
-        # Save temp audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-            audio_file.save(tmp.name)
-            tmp_path = tmp.name
+        # Decode 1 lần trong RAM (không file tạm, không export WAV trung gian)
+        upload = receive_upload(audio_file, suffix=".webm")
+        audio = upload.audio
+
+        gate = check_audio_quality(audio)
+        if not gate.ok:
+            return jsonify(_unscorable_payload(gate)), 200
+        pipeline_started = time.perf_counter()
         
-        # Convert to WAV if needed
-        try:
-            audio = AudioSegment.from_file(tmp_path)
-            wav_path = tmp_path.replace(".webm", ".wav")
-            audio.export(wav_path, format="wav")
-        except:
-            wav_path = tmp_path
-        
-        # 🎼 HYBRID EVALUATION
-        hybrid_result = evaluate_speaking_hybrid(
-            audio_path=wav_path,
-            transcript=transcript,
-            target_question=question,
-            gemini_service=gemini_service
-        )
+        # 🎼 HYBRID EVALUATION (features dùng chung stage với các endpoint speaking khác)
+        inputs = _speaking_inputs(request.form, audio, upload.path, question=question)
+        run = speaking_pipeline.run({**inputs, "transcript": transcript}, targets=("hybrid_eval",))
+        hybrid_result = run["hybrid_eval"]
         
         # Format for frontend
         response = format_speaking_response(hybrid_result)
         
-        # Cleanup
-        clean_temp_file(tmp_path, wav_path)
-        
         return jsonify(response), 200
         
     except Exception as e:
@@ -1767,6 +2056,11 @@ def evaluate_speaking_hybrid_api():
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e), "success": False}), 500
+    finally:
+        if upload is not None:
+            upload.close()
+        if pipeline_started is not None:
+            record_scored(time.perf_counter() - pipeline_started)
 
 @app.route('/api/ai/writing/evaluate', methods=['POST'])
 def evaluate_writing_pro():
@@ -4,7 +4,7 @@ import sys
 
 # Thêm đường dẫn để import WritingService
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from services.writing_service import WritingService
+from services.writing_service import writing_service
 
 # Cấu hình đường dẫn
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,7 +12,7 @@ INPUT_FILE = os.path.join(BASE_DIR, "Random_forest", "alex_features_ready.csv")
 OUTPUT_FILE = os.path.join(BASE_DIR, "Random_forest", "alex_features_v2.csv")
 
 print(f"🚀 Khởi tạo Alex Audit Engine v2...")
-service = WritingService()
+service = writing_service  # singleton của module → RF Brain không load lần 2
 
 print(f"📂 Đang đọc dữ liệu gốc: {INPUT_FILE}")
 df = pd.read_csv(INPUT_FILE)
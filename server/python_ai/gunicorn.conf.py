@@ -0,0 +1,39 @@
+"""
+🦄 GUNICORN CONFIG - Preload model trong master trước khi fork worker
+=====================================================================
+Cách dùng:
+    gunicorn -c gunicorn.conf.py app:app
+
+Master load các artifact joblib (services/model_registry.py) 1 lần rồi gc.freeze() →
+mọi worker fork ra dùng chung page bộ nhớ của model (copy-on-write) thay vì mỗi
+worker tự load 1 bản. Không dùng preload_app vì import app.py khởi động thread
+(process pool, ASR warm-up) - thread không sống sót qua fork.
+
+Phiên live (/api/speaking/live/*) nằm trong RAM của worker mở nó; với workers > 1 master
+tạo thư mục socket + authkey ngẫu nhiên (LIVE_SESSION_ROUTE_DIR / LIVE_SESSION_AUTHKEY)
+trước khi fork để worker chuyển tiếp chunk / end về đúng worker sở hữu phiên
+(services/live_transcription.py). Chạy nhiều máy sau load balancer vẫn cần sticky routing.
+"""
+
+import os
+import secrets
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def on_starting(server):
+    from services.model_registry import preload_models
+    preload_models()
+
+    # Worker import app.py sau khi fork → đọc được biến môi trường đặt ở đây
+    if server.cfg.workers > 1:
+        if not os.environ.get("LIVE_SESSION_ROUTE_DIR"):
+            os.environ["LIVE_SESSION_ROUTE_DIR"] = tempfile.mkdtemp(prefix="live-sessions-")  # 0700
+        os.environ.setdefault("LIVE_SESSION_AUTHKEY", secrets.token_hex(32))
+        print(f"🎙️ [LIVE] Định tuyến phiên live giữa {server.cfg.workers} worker qua {os.environ['LIVE_SESSION_ROUTE_DIR']}")
@@ -0,0 +1,96 @@
+"""
+⏱️ BENCHMARK ASR REPLICA LAYOUT (replicas × cpu_threads)
+=======================================================
+Chạy cùng 1 lượng request đồng thời qua WhisperReplicaPool với nhiều layout
+(vd. 1×8, 2×4, 4×2 trên máy 8 core) → throughput, p50/p95 latency và utilization
+từng replica, để chọn ASR_REPLICAS / ASR_REPLICA_CPU_THREADS / ASR_REPLICA_CORES.
+
+Cách dùng:
+    python scripts/benchmark_asr_replicas.py data/sample.webm --layouts 1x8,2x4,4x2 --jobs 16
+    python scripts/benchmark_asr_replicas.py --pin          # ghim mỗi replica vào 1 dải core liên tiếp
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Đảm bảo import được các thư mục trong project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.asr_replicas import WhisperReplicaPool
+
+SR = 16000
+
+
+def load_input(path, seconds):
+    if path:
+        from services.audio_decoder import decode_audio
+        return decode_audio(path, sr=SR)[0]
+    # Không có file: tone điều biến (encoder vẫn chạy đủ, transcript có thể rỗng)
+    t = np.arange(int(SR * seconds)) / SR
+    return (0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+
+
+def parse_layouts(spec):
+    layouts = []
+    for item in spec.split(","):
+        replicas, threads = item.lower().split("x")
+        layouts.append((int(replicas), int(threads)))
+    return layouts
+
+
+def run_layout(model, samples, replicas, threads, jobs, beam_size, pin):
+    core_sets = []
+    if pin:
+        cores = sorted(os.sched_getaffinity(0))
+        core_sets = [set(cores[i * threads:(i + 1) * threads]) for i in range(replicas)]
+        core_sets = [c for c in core_sets if c]
+    pool = WhisperReplicaPool(model, replicas=replicas, cpu_threads=threads, core_sets=core_sets)
+    pool.transcribe(samples[:SR], language="en", beam_size=beam_size)  # warm-up
+
+    def _one(_):
+        t0 = time.perf_counter()
+        pool.transcribe(samples, language="en", beam_size=beam_size)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=replicas * 2) as executor:
+        latencies = sorted(executor.map(_one, range(jobs)))
+    wall = time.perf_counter() - t0
+    utilization = [r["utilization"] for r in pool.stats()["replicas"]]
+    return wall, latencies, utilization
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark layout replicas × cpu_threads của faster-whisper")
+    parser.add_argument("input", nargs="?", help="File audio (bỏ trống → tự tạo 10s)")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--layouts", default="1x4,2x2,4x1", help="Danh sách replicas x cpu_threads")
+    parser.add_argument("--jobs", type=int, default=16, help="Số request mỗi layout")
+    parser.add_argument("--beam", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--pin", action="store_true", help="Ghim core cho từng replica")
+    args = parser.parse_args()
+
+    samples = load_input(args.input, args.seconds)
+    audio_seconds = len(samples) / SR
+    print(f"🎙️ {args.model} | {audio_seconds:.1f}s audio × {args.jobs} request | beam {args.beam}"
+          + (" | ghim core" if args.pin else ""))
+    print(f"{'layout':<10}{'wall s':>9}{'req/s':>8}{'RTF':>8}{'p50 s':>8}{'p95 s':>8}  utilization")
+    for replicas, threads in parse_layouts(args.layouts):
+        wall, latencies, utilization = run_layout(
+            args.model, samples, replicas, threads, args.jobs, args.beam, args.pin
+        )
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+        rtf = wall / (audio_seconds * args.jobs)
+        print(f"{f'{replicas}x{threads}':<10}{wall:>9.2f}{args.jobs / wall:>8.2f}{rtf:>8.3f}{p50:>8.2f}{p95:>8.2f}  "
+              + " ".join(f"{u:.0%}" for u in utilization))
+
+
+if __name__ == "__main__":
+    main()
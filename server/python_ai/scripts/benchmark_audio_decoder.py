@@ -0,0 +1,125 @@
+"""
+⏱️ BENCHMARK AUDIO DECODER (in-process vs ffmpeg subprocess)
+============================================================
+So sánh thời gian decode 1 bản ghi → float32 mono 16kHz giữa:
+- soundfile / pyav : decode ngay trong process (services.audio_decoder)
+- ffmpeg           : spawn ffmpeg qua pipe (như pydub.AudioSegment.from_file)
+Đo cả tuần tự và khi nhiều thread decode cùng lúc (mô phỏng nhiều request đồng thời).
+
+Cách dùng:
+    python scripts/benchmark_audio_decoder.py                          # tự tạo wav / mp3 / webm(Opus) 10s
+    python scripts/benchmark_audio_decoder.py data/a.webm data/b.mp3 --repeat 20 --threads 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Đảm bảo import được các thư mục trong project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audio_decoder import decode_audio
+
+BACKENDS = ["soundfile", "pyav", "ffmpeg"]
+SR = 16000
+
+
+def make_samples(out_dir, seconds=10.0, sr=48000):
+    """Tạo wav / mp3 / webm(Opus) giống bản ghi từ trình duyệt"""
+    import soundfile as sf
+    t = np.arange(int(sr * seconds)) / sr
+    y = (0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+    files = []
+
+    wav = os.path.join(out_dir, "sample.wav")
+    sf.write(wav, y, sr)
+    files.append(wav)
+
+    try:
+        mp3 = os.path.join(out_dir, "sample.mp3")
+        sf.write(mp3, y, sr, format="MP3")
+        files.append(mp3)
+    except Exception as e:
+        print(f"⚠️ Không tạo được mp3 (libsndfile < 1.1?): {e}")
+
+    try:
+        import av
+        webm = os.path.join(out_dir, "sample.webm")
+        with av.open(webm, "w", format="webm") as out:
+            stream = out.add_stream("libopus", rate=48000)
+            stream.layout = "mono"
+            frame = av.AudioFrame.from_ndarray(y.reshape(1, -1), format="flt", layout="mono")
+            frame.sample_rate = sr
+            for packet in stream.encode(frame):
+                out.mux(packet)
+            for packet in stream.encode(None):
+                out.mux(packet)
+        files.append(webm)
+    except Exception as e:
+        print(f"⚠️ Không tạo được webm/Opus: {e}")
+    return files
+
+
+def time_backend(path, backend, repeat):
+    """Thời gian tốt nhất (s) của 1 backend, None nếu backend không decode được file"""
+    best = None
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        try:
+            decode_audio(path, sr=SR, backends=[backend])
+        except Exception:
+            return None
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def time_concurrent(path, backend, threads, jobs):
+    """Tổng thời gian decode `jobs` lần với `threads` thread song song"""
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        try:
+            list(pool.map(lambda _: decode_audio(path, sr=SR, backends=[backend]), range(jobs)))
+        except Exception:
+            return None
+    return time.perf_counter() - t0
+
+
+def fmt(value, unit_ms=True):
+    if value is None:
+        return "n/a"
+    return f"{value * 1000:.1f}" if unit_ms else f"{value:.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decode in-process vs ffmpeg subprocess")
+    parser.add_argument("inputs", nargs="*", help="File audio (bỏ trống → tự tạo wav/mp3/webm)")
+    parser.add_argument("--repeat", type=int, default=10, help="Số lần decode tuần tự (lấy thời gian tốt nhất)")
+    parser.add_argument("--threads", type=int, default=8, help="Số thread decode đồng thời")
+    parser.add_argument("--jobs", type=int, default=32, help="Số lần decode trong phép đo đồng thời")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.inputs or make_samples(tmp)
+        # Warm-up import librosa / av để không tính vào lần đo đầu
+        for path in files:
+            for backend in BACKENDS:
+                time_backend(path, backend, 1)
+
+        print(f"🎬 Decode → float32 mono {SR}Hz | tuần tự: best of {args.repeat} (ms) | "
+              f"đồng thời: {args.jobs} job / {args.threads} thread (s)")
+        print(f"{'file':<16}" + "".join(f"{b:>12}" for b in BACKENDS) + "".join(f"{b + '‖':>14}" for b in BACKENDS))
+        for path in files:
+            seq = [time_backend(path, b, args.repeat) for b in BACKENDS]
+            par = [time_concurrent(path, b, args.threads, args.jobs) for b in BACKENDS]
+            print(f"{os.path.basename(path)[:15]:<16}" + "".join(f"{fmt(v):>12}" for v in seq)
+                  + "".join(f"{fmt(v, unit_ms=False):>14}" for v in par))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+⏱️ BENCHMARK PITCH ENGINES (pyin vs yin vs autocorr)
+====================================================
+Chạy từng engine trên 1 tập file ghi âm, báo cáo:
+- Wall time trung bình / file và tốc độ so với pYIN
+- Độ lệch F0 (cents) trên các frame cả 2 engine đều voiced + tỉ lệ đồng thuận voicing
+- Độ lệch pitch_mean / jitter
+- Độ lệch điểm XGBoost speaking_model (nếu load được model) so với tolerance
+
+Cách dùng:
+    python scripts/benchmark_pitch_engines.py path/to/recordings/ [file2.webm ...]
+    python scripts/benchmark_pitch_engines.py data/ --engines pyin,autocorr --tolerance 0.25
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Đảm bảo import được các thư mục trong project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audio_buffer import AudioBuffer
+from services.pitch_service import PITCH_ENGINES, PITCH_SR, compute_pitch_track
+
+AUDIO_EXTS = (".wav", ".mp3", ".webm", ".ogg", ".m4a", ".flac")
+
+
+def collect_files(inputs):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(AUDIO_EXTS))
+        elif os.path.isfile(item):
+            files.append(item)
+    return files
+
+
+def f0_deviation_cents(ref, other):
+    both = ~np.isnan(ref) & ~np.isnan(other)
+    n = min(len(ref), len(other))
+    both = both[:n]
+    if not np.any(both):
+        return None
+    cents = 1200.0 * np.abs(np.log2(other[:n][both] / ref[:n][both]))
+    return float(np.mean(cents))
+
+
+def voicing_agreement(ref, other):
+    n = min(len(ref), len(other))
+    if n == 0:
+        return None
+    return float(np.mean(np.isnan(ref[:n]) == np.isnan(other[:n])))
+
+
+def load_scorer():
+    """XGBoost speaking_model + extractor 44 features (không cần load Whisper)"""
+    try:
+        import pandas as pd
+        from services.speaking_hybrid_service import extract_acoustic_features, speaking_model
+        if speaking_model is None:
+            return None
+
+        def score(audio, engine):
+            feats = extract_acoustic_features(None, audio=audio, pitch_engine=engine)
+            if not feats:
+                return None
+            return float(speaking_model.predict(pd.DataFrame([feats]))[0])
+        return score
+    except Exception as e:
+        print(f"⚠️ Không load được speaking_model, bỏ qua so sánh điểm: {e}")
+        return None
+
+
+def run_benchmark(files, engines, repeat=1, with_model=True):
+    scorer = load_scorer() if with_model else None
+    rows = {e: {"time": [], "cents": [], "voicing": [], "d_mean": [], "d_jitter": [], "d_score": []} for e in engines}
+
+    # Warm-up numba/JIT để không tính thời gian compile vào engine đầu tiên
+    warm = np.random.randn(PITCH_SR // 2).astype(np.float32) * 0.1
+    for e in engines:
+        compute_pitch_track(warm, PITCH_SR, engine=e)
+
+    for path in files:
+        try:
+            audio = AudioBuffer.from_file(path)
+        except Exception as e:
+            print(f"⚠️ Bỏ qua {path}: {e}")
+            continue
+        y = audio.resampled(PITCH_SR)
+
+        tracks = {}
+        for e in engines:
+            best = None
+            for _ in range(max(repeat, 1)):
+                track = compute_pitch_track(y, PITCH_SR, engine=e)
+                elapsed = track.timings[e]
+                best = elapsed if best is None else min(best, elapsed)
+            tracks[e] = track
+            rows[e]["time"].append(best)
+
+        ref = tracks.get("pyin") or compute_pitch_track(y, PITCH_SR, engine="pyin")
+        ref_score = scorer(AudioBuffer(y, PITCH_SR), "pyin") if scorer else None
+
+        for e in engines:
+            track = tracks[e]
+            cents = f0_deviation_cents(ref.f0, track.f0)
+            if cents is not None:
+                rows[e]["cents"].append(cents)
+            agree = voicing_agreement(ref.f0, track.f0)
+            if agree is not None:
+                rows[e]["voicing"].append(agree)
+            rows[e]["d_mean"].append(abs(track.pitch_mean - ref.pitch_mean))
+            rows[e]["d_jitter"].append(abs(track.jitter - ref.jitter))
+            if ref_score is not None:
+                score = scorer(AudioBuffer(y, PITCH_SR), e)
+                if score is not None:
+                    rows[e]["d_score"].append(abs(score - ref_score))
+
+        print(f"✅ {os.path.basename(path)} ({audio.duration:.1f}s): " + ", ".join(
+            f"{e}={tracks[e].timings[e]:.3f}s" for e in engines
+        ))
+
+    return rows
+
+
+def print_report(rows, tolerance):
+    def avg(values):
+        return float(np.mean(values)) if values else float("nan")
+
+    base_time = avg(rows["pyin"]["time"]) if "pyin" in rows else float("nan")
+    print("\n📊 KẾT QUẢ (trung bình / file, so với pYIN)")
+    print(f"{'engine':<10}{'time(s)':>10}{'speedup':>10}{'F0 cents':>10}{'voicing':>10}"
+          f"{'Δmean Hz':>10}{'Δjitter':>10}{'Δscore max':>12}{'ok':>5}")
+    for e, r in rows.items():
+        t = avg(r["time"])
+        speedup = base_time / t if t and t > 0 else float("nan")
+        d_score_max = max(r["d_score"]) if r["d_score"] else float("nan")
+        ok = "-" if not r["d_score"] else ("✅" if d_score_max <= tolerance else "❌")
+        print(f"{e:<10}{t:>10.3f}{speedup:>10.1f}{avg(r['cents']):>10.1f}{avg(r['voicing']):>10.2f}"
+              f"{avg(r['d_mean']):>10.2f}{avg(r['d_jitter']):>10.4f}{d_score_max:>12.3f}{ok:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pitch engines (pyin / yin / autocorr)")
+    parser.add_argument("inputs", nargs="+", help="File hoặc thư mục chứa bản ghi")
+    parser.add_argument("--engines", default=",".join(PITCH_ENGINES))
+    parser.add_argument("--repeat", type=int, default=1, help="Số lần chạy / file (lấy thời gian tốt nhất)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Độ lệch điểm XGBoost tối đa chấp nhận")
+    parser.add_argument("--no-model", action="store_true", help="Không so sánh điểm XGBoost")
+    args = parser.parse_args()
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip() in PITCH_ENGINES]
+    if "pyin" not in engines:
+        engines.insert(0, "pyin")
+
+    files = collect_files(args.inputs)
+    if not files:
+        print("❌ Không tìm thấy file audio nào!")
+        return
+
+    print(f"🎬 Benchmark {len(files)} file với engines: {', '.join(engines)}")
+    rows = run_benchmark(files, engines, repeat=args.repeat, with_model=not args.no_model)
+    print_report(rows, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
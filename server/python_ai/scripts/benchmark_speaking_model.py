@@ -0,0 +1,90 @@
+"""
+⏱️ BENCHMARK SPEAKING MODEL INFERENCE (DataFrame vs inplace_predict)
+====================================================================
+Đo độ trễ mỗi lần chấm 1 bản ghi (44 feature) của:
+- dataframe : speaking_model.predict(pd.DataFrame([features]))  (cách cũ)
+- runner    : SpeakingModelRunner.predict(features)             (vector float32 + inplace_predict)
+- batch     : SpeakingModelRunner.predict_batch(rows) / số bản ghi
+Kiểm tra luôn 2 cách cho cùng điểm.
+
+Cách dùng:
+    python scripts/benchmark_speaking_model.py                      # model Random_forest/alex_speaking_brain_pro.joblib
+    python scripts/benchmark_speaking_model.py --synthetic --n 2000 # không có model → train XGBoost giả 44 feature
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Đảm bảo import được các thư mục trong project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.speaking_model_runner import SpeakingModelRunner, default_feature_order
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "Random_forest", "alex_speaking_brain_pro.joblib")
+
+
+def synthetic_model(rows=2000, seed=0):
+    """XGBRegressor train trên dữ liệu ngẫu nhiên cùng 44 cột (chỉ để đo tốc độ)"""
+    from xgboost import XGBRegressor
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.standard_normal((rows, 44)), columns=default_feature_order())
+    y = 5 + X["pitch_mean"] * 0.3 - X["silence_ratio"] * 0.5 + rng.standard_normal(rows) * 0.1
+    return XGBRegressor(n_estimators=300, max_depth=6).fit(X, y)
+
+
+def sample_features(model_names, n, seed=1):
+    rng = np.random.default_rng(seed)
+    return [dict(zip(model_names, rng.standard_normal(len(model_names)))) for _ in range(n)]
+
+
+def best_per_call(fn, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for row in rows:
+            fn(row)
+        elapsed = (time.perf_counter() - t0) / len(rows)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suy luận speaking model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--synthetic", action="store_true", help="Dùng XGBoost giả thay vì file model")
+    parser.add_argument("--n", type=int, default=500, help="Số bản ghi mỗi lượt đo")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic or not os.path.exists(args.model):
+        print("🧪 Dùng XGBoost giả (44 feature, 300 cây)")
+        model = synthetic_model()
+    else:
+        import joblib
+        model = joblib.load(args.model)
+    runner = SpeakingModelRunner(model)
+    rows = sample_features(runner.feature_names, args.n)
+
+    old = np.array([float(model.predict(pd.DataFrame([r]))[0]) for r in rows[:50]])
+    new = np.array([runner.predict(r) for r in rows[:50]])
+    print(f"✅ Sai lệch tối đa dataframe vs runner ({runner.mode}): {np.max(np.abs(old - new)):.2e}")
+
+    df_ms = best_per_call(lambda r: model.predict(pd.DataFrame([r])), rows, args.repeat) * 1000
+    runner_ms = best_per_call(runner.predict, rows, args.repeat) * 1000
+    t0 = time.perf_counter()
+    runner.predict_batch(rows)
+    batch_ms = (time.perf_counter() - t0) / len(rows) * 1000
+
+    print(f"{'cách':<12}{'ms / bản ghi':>14}{'nhanh hơn':>12}")
+    for name, ms in (("dataframe", df_ms), ("runner", runner_ms), ("batch", batch_ms)):
+        print(f"{name:<12}{ms:>14.4f}{df_ms / ms:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
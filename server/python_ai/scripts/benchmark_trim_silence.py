@@ -0,0 +1,102 @@
+"""
+⏱️ BENCHMARK TRIM SILENCE (pydub detect_nonsilent vs numpy)
+===========================================================
+So sánh thời gian cắt im lặng trước ASR trên bản ghi 10s / 60s / 120s:
+- pydub : trim_silence cũ (AudioSegment → detect_nonsilent, lát 1ms bằng Python)
+- numpy : services.silence_trim.trim_offsets_ms trên mảng float32 của AudioBuffer
+Đồng thời kiểm tra 2 cách cho cùng offset cắt.
+
+Cách dùng:
+    python scripts/benchmark_trim_silence.py                        # audio tổng hợp 10/60/120s
+    python scripts/benchmark_trim_silence.py --durations 10,60,120 --repeat 3
+    python scripts/benchmark_trim_silence.py --file data/answer.webm  # cắt/lặp file thật theo các độ dài
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
+
+# Đảm bảo import được các thư mục trong project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audio_buffer import AudioBuffer
+from services.silence_trim import trim_offsets_ms
+
+SR = 16000
+SILENCE_THRESH = -40
+MIN_SILENCE_LEN = 500
+
+
+def synthetic_answer(seconds, seed=0):
+    """Giả lập bài nói: câu nói xen kẽ ngắt nghỉ, có im lặng đầu/cuối"""
+    rng = np.random.default_rng(seed)
+    parts = [rng.normal(0, 0.002, int(SR * 1.5))]
+    total = len(parts[0])
+    target = int(SR * seconds)
+    while total < target - SR:
+        n_voice = int(SR * rng.uniform(0.8, 3.0))
+        t = np.arange(n_voice) / SR
+        f0 = rng.uniform(110, 220)
+        voice = 0.25 * np.sin(2 * np.pi * f0 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+        pause = rng.normal(0, 0.002, int(SR * rng.uniform(0.1, 0.8)))
+        parts.extend([voice + rng.normal(0, 0.01, n_voice), pause])
+        total += n_voice + len(pause)
+    parts.append(rng.normal(0, 0.002, max(target - total, 0)))
+    return np.clip(np.concatenate(parts)[:target], -1, 1).astype(np.float32)
+
+
+def from_file(path, seconds):
+    """Lặp/cắt file thật cho đủ độ dài cần đo"""
+    y = AudioBuffer.from_file(path, sr=SR).samples
+    reps = int(np.ceil(SR * seconds / max(len(y), 1)))
+    return np.tile(y, reps)[:int(SR * seconds)]
+
+
+def pydub_trim(samples):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)
+    segment = AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=SR, channels=1)
+    ranges = detect_nonsilent(segment, min_silence_len=MIN_SILENCE_LEN, silence_thresh=SILENCE_THRESH)
+    return (ranges[0][0], ranges[-1][1]) if ranges else (0, len(segment))
+
+
+def numpy_trim(samples):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)  # cùng lượng tử hoá với bản pydub
+    return trim_offsets_ms(pcm / 32768.0, SR, silence_thresh=SILENCE_THRESH, min_silence_len=MIN_SILENCE_LEN)
+
+
+def best_time(fn, samples, repeat):
+    best, result = None, None
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        result = fn(samples)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cắt im lặng pydub vs numpy")
+    parser.add_argument("--durations", default="10,60,120", help="Các độ dài (giây), cách nhau dấu phẩy")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần chạy (lấy thời gian tốt nhất)")
+    parser.add_argument("--file", help="Dùng file ghi âm thật thay cho audio tổng hợp")
+    args = parser.parse_args()
+
+    durations = [float(d) for d in args.durations.split(",") if d.strip()]
+    print(f"🎬 Trim silence (thresh={SILENCE_THRESH} dBFS, min_silence_len={MIN_SILENCE_LEN}ms)")
+    print(f"{'audio':>8}{'pydub(s)':>12}{'numpy(s)':>12}{'speedup':>10}{'offsets':>22}{'match':>7}")
+    for seconds in durations:
+        samples = from_file(args.file, seconds) if args.file else synthetic_answer(seconds)
+        t_pydub, r_pydub = best_time(pydub_trim, samples, args.repeat)
+        t_numpy, r_numpy = best_time(numpy_trim, samples, args.repeat)
+        match = "✅" if tuple(r_pydub) == tuple(r_numpy) else "❌"
+        print(f"{seconds:>7.0f}s{t_pydub:>12.3f}{t_numpy:>12.4f}{t_pydub / t_numpy:>10.0f}x"
+              f"{str(tuple(r_numpy)):>22}{match:>7}")
+
+
+if __name__ == "__main__":
+    main()
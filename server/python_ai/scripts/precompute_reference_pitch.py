@@ -0,0 +1,72 @@
+"""
+🎼 PRECOMPUTE REFERENCE PITCH CURVES
+===================================
+Duyệt ngân hàng câu hỏi speaking (collection speakingquestions: question + follow_up_questions)
+× danh sách voice → TTS + pitch 1 lần, lưu vào reference pitch store (analysis_cache
+SQLite / Mongo). /api/speaking/check sau đó chỉ tra cache thay vì TTS + pYIN inline.
+
+Cách dùng:
+    python scripts/precompute_reference_pitch.py                                 # đọc từ MONGO_URI
+    python scripts/precompute_reference_pitch.py --voices en-GB-SoniaNeural,en-US-JennyNeural
+    python scripts/precompute_reference_pitch.py --questions-file questions.txt  # 1 câu / dòng
+    python scripts/precompute_reference_pitch.py --force                         # build lại tất cả
+"""
+
+import argparse
+import os
+import sys
+
+# Đảm bảo import được các thư mục trong project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.reference_pitch import REFERENCE_VOICES, reference_pitch_store
+
+
+def load_questions_from_mongo(uri, db_name, collection):
+    import pymongo
+    client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=5000)
+    questions = []
+    for doc in client[db_name][collection].find({}, {"question": 1, "follow_up_questions": 1}):
+        questions.append(doc.get("question") or "")
+        questions.extend(doc.get("follow_up_questions") or [])
+    return questions
+
+
+def load_questions_from_file(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute đường cao độ TTS mẫu cho mọi câu hỏi × voice")
+    parser.add_argument("--questions-file", help="File text 1 câu hỏi / dòng (bỏ trống → đọc MongoDB)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    parser.add_argument("--db", default=os.getenv("MONGO_DB_NAME", "test"))
+    parser.add_argument("--collection", default="speakingquestions")
+    parser.add_argument("--voices", default=",".join(REFERENCE_VOICES), help="Danh sách voice Edge TTS")
+    parser.add_argument("--engine", default=None, help="Pitch engine (mặc định PITCH_ENGINE)")
+    parser.add_argument("--workers", type=int, default=4, help="Số câu build song song (TTS là I/O mạng)")
+    parser.add_argument("--force", action="store_true", help="Build lại kể cả curve đã có")
+    args = parser.parse_args()
+
+    if args.questions_file:
+        questions = load_questions_from_file(args.questions_file)
+    elif args.mongo_uri:
+        questions = load_questions_from_mongo(args.mongo_uri, args.db, args.collection)
+    else:
+        parser.error("Cần --questions-file hoặc MONGO_URI")
+    voices = [v.strip() for v in args.voices.split(",") if v.strip()]
+    print(f"🎼 {len(questions)} câu hỏi × {len(voices)} voice")
+
+    def _progress(done, total, summary):
+        if done % 20 == 0 or done == total:
+            print(f"  {done}/{total} | built {summary['built']} · cached {summary['cached']} · lỗi {summary['failed']}")
+
+    summary = reference_pitch_store.precompute(
+        questions, voices=voices, engine=args.engine, force=args.force, workers=args.workers, progress=_progress
+    )
+    print(f"✅ Xong: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+🛰️ CHẠY AUDIO SIDECAR
+====================
+1 process giữ model ASR / pitch / features cho mọi web worker trên cùng máy.
+
+Cách dùng (AUDIO_SIDECAR_AUTHKEY bắt buộc, cùng giá trị cho cả 2 phía - vd. trong .env):
+    export AUDIO_SIDECAR_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    AUDIO_SIDECAR_SOCKET=/run/speaking/audio.sock python scripts/run_audio_sidecar.py
+    # web worker (cùng AUDIO_SIDECAR_SOCKET + AUDIO_SIDECAR_AUTHKEY) tự chuyển sang thin client:
+    AUDIO_SIDECAR_SOCKET=/run/speaking/audio.sock gunicorn -c gunicorn.conf.py app:app
+"""
+
+import argparse
+import os
+import sys
+
+# Đảm bảo import được các thư mục trong project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audio_sidecar import AUDIO_SIDECAR_AUTHKEY, AUDIO_SIDECAR_SOCKET, serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio sidecar (ASR / pitch / features qua Unix socket)")
+    parser.add_argument("--socket", default=AUDIO_SIDECAR_SOCKET, help="Đường dẫn Unix socket (mặc định AUDIO_SIDECAR_SOCKET)")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("Cần --socket hoặc AUDIO_SIDECAR_SOCKET")
+    if not AUDIO_SIDECAR_AUTHKEY:
+        parser.error("Cần AUDIO_SIDECAR_AUTHKEY (message trên socket là pickle)")
+    os.makedirs(os.path.dirname(os.path.abspath(args.socket)), mode=0o700, exist_ok=True)
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-import librosa
 import numpy as np
 import os
 import spacy
 from collections import Counter
+from services.audio_buffer import AudioBuffer
+from services.spectral_frontend import analyze_spectrum
+from services.speech_vad import speech_regions
 
 # Tải model spacy nhỏ để xử lý ngôn ngữ nhanh
 try:
@@ -15,30 +17,15 @@ class AnalyticService:
     def __init__(self):
         print("🔍 [ANALYTIC SERVICE] Initialized")
 
-    def extract_fluency_features(self, audio_path):
+    def extract_fluency_features(self, audio_path, audio=None):
         """Phân tích độ trôi chảy từ file audio"""
         try:
-            y, sr = librosa.load(audio_path)
+            if audio is None:
+                audio = AudioBuffer.from_file(audio_path)
             
-            # 1. Tính toán độ im lặng (Silence)
-            # Dùng energy threshold để tìm các đoạn không im lặng
-            non_silent_intervals = librosa.effects.split(y, top_db=30)
-            total_duration = librosa.get_duration(y=y, sr=sr)
-            
-            speech_duration = sum([(end - start) / sr for start, end in non_silent_intervals])
-            silence_duration = total_duration - speech_duration
-            
-            # 2. Đếm số lần ngắt nghỉ (Pauses)
-            # Coi mỗi khoảng trống giữa các đoạn non_silent là 1 lần nghỉ
-            num_pauses = len(non_silent_intervals) - 1 if len(non_silent_intervals) > 0 else 0
-            
-            return {
-                "total_duration": round(total_duration, 2),
-                "speech_duration": round(speech_duration, 2),
-                "silence_duration": round(silence_duration, 2),
-                "num_pauses": num_pauses,
-                "silence_ratio": round(silence_duration / total_duration if total_duration > 0 else 0, 2)
-            }
+            # Khoảng lặng + số lần ngắt nghỉ lấy từ VAD dùng chung (cùng đoạn với pitch/silence_ratio):
+            # không load lại file, không framing lại nếu features đã tính trong request
+            return analyze_spectrum(audio).fluency_stats(regions=speech_regions(audio))
         except Exception as e:
             print(f"⚠️ Fluency Error: {e}")
             return None
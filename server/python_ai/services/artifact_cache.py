@@ -0,0 +1,302 @@
+"""
+🗄️ ARTIFACT CACHE - Cache kết quả phân tích theo nội dung audio
+===============================================================
+Key = hash nội dung audio + loại artifact + tham số engine (model, beam, hop...),
+nên retry / nộp lại cùng file sẽ không phải chạy lại Whisper, pYIN, features.
+
+2 tầng:
+- L1: LRU trong process, giới hạn theo số byte
+- L2: backend bền vững (SQLite cho test/1 node, MongoDB cho cluster)
+Ghi xuống L2 theo kiểu write-behind (thread nền) → không cộng latency vào request.
+Hàng đợi write-behind có giới hạn: backend chậm / sập thì bỏ bớt lần ghi (vẫn còn ở L1)
+thay vì giữ mọi transcript / features / pitch curve trong RAM.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- CONFIG ---
+CACHE_BACKEND = os.getenv("ANALYSIS_CACHE_BACKEND", "auto").strip().lower()  # auto | mongo | sqlite | none
+CACHE_SQLITE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(BASE_DIR, "cache", "analysis_cache.db"))
+CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_WRITE_QUEUE_MAX = int(os.getenv("ANALYSIS_CACHE_WRITE_QUEUE_MAX", "1024"))
+
+
+def make_cache_key(kind, content_hash, **params):
+    """kind:content_hash:hash(params) - params sắp xếp để key ổn định"""
+    if params:
+        raw = json.dumps(params, sort_keys=True, default=str)
+        return f"{kind}:{content_hash}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]}"
+    return f"{kind}:{content_hash}"
+
+
+# ==========================================
+# BACKENDS (L2)
+# ==========================================
+class NullBackend:
+    name = "none"
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, expires_at):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class SQLiteBackend:
+    """Backend file local (test / single node). Mỗi thread 1 connection."""
+    name = "sqlite"
+
+    def __init__(self, path=CACHE_SQLITE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM artifacts WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), expires_at)
+            )
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+
+
+class MongoBackend:
+    """Backend MongoDB dùng chung giữa các node (TTL index tự dọn entry hết hạn)"""
+    name = "mongo"
+
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            print(f"⚠️ [CACHE] Không tạo được TTL index: {e}")
+
+    def get(self, key):
+        doc = self.collection.find_one({"_id": key})
+        if not doc:
+            return None
+        expires_at = doc.get("expires_at")
+        if isinstance(expires_at, datetime):
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            expires_at = expires_at.timestamp()
+        return doc.get("value"), float(expires_at or 0)
+
+    def set(self, key, value, expires_at):
+        self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "value": value,
+                "expires_at": datetime.fromtimestamp(expires_at, tz=timezone.utc)
+            }},
+            upsert=True
+        )
+
+    def delete(self, key):
+        self.collection.delete_one({"_id": key})
+
+
+# ==========================================
+# TIERED CACHE
+# ==========================================
+class ArtifactCache:
+    def __init__(self, backend=None, max_bytes=CACHE_MAX_BYTES, default_ttl=CACHE_TTL_SECONDS,
+                 write_queue_max=CACHE_WRITE_QUEUE_MAX):
+        self.backend = backend or NullBackend()
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lru = OrderedDict()  # key -> (json, size, expires_at) - lưu dạng chuỗi để caller sửa kết quả không làm hỏng cache
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0, "backend_hits": 0, "misses": 0,
+            "writes": 0, "write_errors": 0, "dropped_writes": 0, "evictions": 0, "expired": 0
+        }
+        self._write_queue = queue.Queue(maxsize=max(0, write_queue_max))  # 0 = không giới hạn
+        self._writer = threading.Thread(target=self._write_loop, name="artifact-cache-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- L1 (LRU theo byte) ----------
+    def _remember(self, key, raw, expires_at):
+        size = len(raw)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old:
+                self._bytes -= old[1]
+            self._lru[key] = (raw, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._lru:
+                _, (_, evicted_size, _) = self._lru.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # ---------- API ----------
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry:
+                raw, size, expires_at = entry
+                if expires_at > now:
+                    self._lru.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(raw)
+                self._lru.pop(key)
+                self._bytes -= size
+                self._stats["expired"] += 1
+
+        try:
+            found = self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️ [CACHE] Backend read lỗi: {e}")
+            found = None
+        if found:
+            value, expires_at = found
+            if expires_at > now:
+                self._count("backend_hits")
+                self._remember(key, json.dumps(value, default=str), expires_at)
+                return value
+            self._count("expired")
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value, ttl=None):
+        """Ghi L1 ngay, L2 ghi nền (write-behind)"""
+        expires_at = time.time() + (ttl or self.default_ttl)
+        raw = json.dumps(value, default=str)
+        self._remember(key, raw, expires_at)
+        # Ghi bản snapshot → caller sửa value sau khi set cũng không ảnh hưởng L2
+        try:
+            self._write_queue.put_nowait((key, json.loads(raw), expires_at))
+        except queue.Full:
+            # Backend không theo kịp → bỏ lần ghi L2 này (không chặn request, không phình RAM)
+            with self._lock:
+                self._stats["dropped_writes"] += 1
+                dropped = self._stats["dropped_writes"]
+            if dropped == 1 or dropped % 100 == 0:
+                print(f"⚠️ [CACHE] Hàng đợi ghi L2 đầy ({self._write_queue.maxsize}), đã bỏ {dropped} lần ghi")
+
+    def get_or_compute(self, key, compute, ttl=None, should_cache=bool):
+        """Lấy từ cache, nếu miss thì compute() rồi lưu (bỏ qua kết quả lỗi/rỗng)"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = compute()
+        if value is not None and should_cache(value):
+            self.set(key, value, ttl=ttl)
+        return value
+
+    def flush(self, timeout=None):
+        """Đợi write-behind ghi hết (dùng cho test / lúc tắt server)"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._write_queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _write_loop(self):
+        while True:
+            key, value, expires_at = self._write_queue.get()
+            try:
+                self.backend.set(key, value, expires_at)
+                self._count("writes")
+            except Exception as e:
+                self._count("write_errors")
+                print(f"⚠️ [CACHE] Backend write lỗi: {e}")
+            finally:
+                self._write_queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._lru)
+            stats["memory_bytes"] = self._bytes
+        lookups = stats["memory_hits"] + stats["backend_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["backend_hits"]) / lookups, 3) if lookups else 0.0
+        stats["pending_writes"] = self._write_queue.qsize()
+        stats["write_queue_max"] = self._write_queue.maxsize
+        stats["backend"] = self.backend.name
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+def _build_backend():
+    """Chọn backend theo ANALYSIS_CACHE_BACKEND (auto: Mongo nếu kết nối được, không thì SQLite)"""
+    if CACHE_BACKEND == "none":
+        return NullBackend()
+
+    if CACHE_BACKEND in ("auto", "mongo"):
+        mongo_uri = os.getenv("MONGO_URI")
+        if mongo_uri:
+            try:
+                from pymongo import MongoClient
+                mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+                mongo_client.server_info()
+                print("🍃 MongoDB Cache connected!")
+                return MongoBackend(mongo_client["ai_speaking_cache"]["analysis_artifacts"])
+            except Exception as e:
+                print(f"⚠️ MongoDB Cache failed: {e}")
+        if CACHE_BACKEND == "mongo":
+            return NullBackend()
+
+    try:
+        backend = SQLiteBackend(CACHE_SQLITE_PATH)
+        print(f"🗄️ [CACHE] SQLite analysis cache: {CACHE_SQLITE_PATH}")
+        return backend
+    except Exception as e:
+        print(f"⚠️ [CACHE] SQLite cache failed: {e}")
+        return NullBackend()
+
+
+analysis_cache = ArtifactCache(_build_backend())
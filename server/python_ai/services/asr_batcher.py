@@ -0,0 +1,241 @@
+"""
+📦 ASR MICRO-BATCHER - Gộp request transcribe của nhiều user vào 1 lần decode
+=============================================================================
+Trước đây mỗi request gọi faster_model.transcribe riêng → 8 user đồng thời là
+8 lần decode tranh nhau CPU. Ở đây:
+1. Mỗi caller tự chạy VAD (Silero) trên audio của mình → các đoạn có tiếng (≤30s)
+2. Dispatcher gom request trong 1 cửa sổ ngắn (ASR_BATCH_WINDOW_MS) / tối đa ASR_BATCH_MAX_SIZE
+3. Audio các request được nối lại, chạy 1 lần BatchedInferencePipeline với clip_timestamps
+4. Segment/word trả về được tách lại theo offset → mỗi caller nhận timeline của chính mình
+Request khác cấu hình (beam, word_timestamps...) được chạy thành batch riêng.
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASR_SR = 16000
+ASR_CHUNK_SECONDS = 30.0  # Cửa sổ encoder của Whisper
+ASR_BATCHING = os.getenv("ASR_BATCHING", "1").strip().lower() not in ("0", "false", "no", "off")
+ASR_BATCH_WINDOW_MS = float(os.getenv("ASR_BATCH_WINDOW_MS", "30"))
+ASR_BATCH_MAX_SIZE = int(os.getenv("ASR_BATCH_MAX_SIZE", "8"))
+# Số chunk 30s đưa vào encoder mỗi lượt (1 request dài có thể có nhiều chunk)
+ASR_BATCH_MAX_CHUNKS = int(os.getenv("ASR_BATCH_MAX_CHUNKS", "16"))
+# Batched pipeline bỏ qua no_speech_threshold → lọc lại như transcribe tuần tự
+ASR_NO_SPEECH_THRESHOLD = 0.6
+ASR_LOG_PROB_THRESHOLD = -1.0
+
+
+def silero_speech_clips(samples, sr=ASR_SR):
+    """VAD Silero của faster-whisper → list {start, end} theo sample (mỗi đoạn ≤30s)"""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    options = VadOptions(max_speech_duration_s=ASR_CHUNK_SECONDS, min_silence_duration_ms=160)
+    return get_speech_timestamps(samples, options, sampling_rate=sr)
+
+
+def merge_clips(clips, sr=ASR_SR, max_seconds=ASR_CHUNK_SECONDS):
+    """Gộp các đoạn VAD liền nhau thành chunk ≤30s (giữ khoảng lặng ngắn ở giữa)"""
+    max_len = int(max_seconds * sr)
+    merged = []
+    for clip in clips:
+        start, end = int(clip["start"]), int(clip["end"])
+        if merged and end - merged[-1][0] <= max_len:
+            merged[-1][1] = end
+        else:
+            merged.append([start, min(end, start + max_len)])
+    return [(s, e) for s, e in merged if e > s]
+
+
+class _Request:
+    def __init__(self, samples, chunks, options):
+        self.samples = samples
+        self.chunks = chunks  # [(start_sample, end_sample)] trong audio của request
+        self.options = options
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+def _shift_segment(seg, delta):
+    """Copy segment (và words) sang timeline của request"""
+    words = getattr(seg, "words", None)
+    return SimpleNamespace(
+        text=getattr(seg, "text", ""),
+        start=round(float(seg.start) - delta, 3),
+        end=round(float(seg.end) - delta, 3),
+        avg_logprob=getattr(seg, "avg_logprob", None),
+        no_speech_prob=getattr(seg, "no_speech_prob", None),
+        words=None if words is None else [
+            SimpleNamespace(
+                word=w.word,
+                start=round(float(w.start) - delta, 3),
+                end=round(float(w.end) - delta, 3),
+                probability=getattr(w, "probability", 0.0)
+            )
+            for w in words
+        ]
+    )
+
+
+class ASRBatcher:
+    """
+    Gom request ASR qua nhiều thread rồi decode chung 1 batch.
+    pipeline: object có .transcribe(audio, clip_timestamps=..., batch_size=..., **options)
+    (faster_whisper.BatchedInferencePipeline).
+    wait_observer(seconds): nhận thời gian chờ của từng request (vd. ASRPolicy hạ tier).
+    """
+
+    def __init__(self, pipeline, window_ms=ASR_BATCH_WINDOW_MS, max_batch=ASR_BATCH_MAX_SIZE,
+                 max_chunks=ASR_BATCH_MAX_CHUNKS, vad_fn=silero_speech_clips, sr=ASR_SR, wait_observer=None):
+        self.pipeline = pipeline
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.max_chunks = max(1, int(max_chunks))
+        self.vad_fn = vad_fn
+        self.sr = sr
+        self.wait_observer = wait_observer
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._waits = deque(maxlen=1000)
+        self._stats = {"requests": 0, "batches": 0, "chunks": 0, "empty": 0, "errors": 0, "decode_seconds": 0.0}
+
+        self._thread = threading.Thread(target=self._loop, name="asr-batcher", daemon=True)
+        self._thread.start()
+
+    # ---------- Caller side ----------
+    def transcribe(self, samples, timeout=None, **options):
+        """Chặn tới khi batch chứa request này decode xong → list segment (timeline của request)"""
+        samples = np.asarray(samples, dtype=np.float32)
+        chunks = merge_clips(self.vad_fn(samples, self.sr) if self.vad_fn else [{"start": 0, "end": len(samples)}],
+                             sr=self.sr)
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            if not chunks:
+                self._stats["empty"] += 1
+        if not chunks:
+            return []
+
+        req = _Request(samples, chunks, options)
+        with self._cond:
+            self._pending.append(req)
+            self._cond.notify()
+        return req.future.result(timeout=timeout)
+
+    # ---------- Dispatcher ----------
+    def _collect(self):
+        """Đợi request đầu tiên, rồi gom thêm trong cửa sổ window / tới max_batch"""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.perf_counter() + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            depth = len(self._pending)
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, depth))]
+        with self._stats_lock:
+            self._queue_depths[depth] += 1
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for req in batch:
+                key = tuple(sorted(req.options.items()))
+                groups.setdefault(key, []).append(req)
+            for reqs in groups.values():
+                self._run_group(reqs)
+
+    def _run_group(self, reqs):
+        started = time.perf_counter()
+        try:
+            results = self._decode(reqs)
+        except Exception as e:
+            print(f"⚠️ [ASR BATCH] Lỗi decode batch {len(reqs)} request: {e}")
+            with self._stats_lock:
+                self._stats["errors"] += 1
+            for req in reqs:
+                req.future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["chunks"] += sum(len(r.chunks) for r in reqs)
+            self._stats["decode_seconds"] += elapsed
+            self._batch_sizes[len(reqs)] += 1
+            for req in reqs:
+                self._waits.append(started - req.enqueued_at)
+        if self.wait_observer is not None:
+            for req in reqs:
+                self.wait_observer(started - req.enqueued_at)
+        for req, segments in zip(reqs, results):
+            req.future.set_result(segments)
+
+    def _decode(self, reqs):
+        """Nối audio các request → 1 lần pipeline.transcribe → chia segment về từng request"""
+        pieces, clips = [], []
+        chunk_offsets, chunk_owner, chunk_delta = [], [], []
+        cursor = 0
+        for idx, req in enumerate(reqs):
+            for start, end in req.chunks:
+                pieces.append(req.samples[start:end])
+                clips.append({"start": cursor / self.sr, "end": (cursor + end - start) / self.sr})
+                chunk_offsets.append(cursor / self.sr)
+                chunk_owner.append(idx)
+                # global_time - delta = thời gian trong audio gốc của request
+                chunk_delta.append((cursor - start) / self.sr)
+                cursor += end - start
+
+        audio = np.concatenate(pieces).astype(np.float32)
+        segments, _ = self.pipeline.transcribe(
+            audio, clip_timestamps=clips, batch_size=self.max_chunks, **reqs[0].options
+        )
+
+        results = [[] for _ in reqs]
+        for seg in segments:
+            no_speech = getattr(seg, "no_speech_prob", None)
+            avg_logprob = getattr(seg, "avg_logprob", None)
+            if no_speech is not None and avg_logprob is not None and \
+                    no_speech > ASR_NO_SPEECH_THRESHOLD and avg_logprob < ASR_LOG_PROB_THRESHOLD:
+                continue
+            # Segment bắt đầu ≥ offset chunk của nó (dung sai làm tròn 3 chữ số)
+            chunk = max(bisect.bisect_right(chunk_offsets, float(seg.start) + 0.01) - 1, 0)
+            results[chunk_owner[chunk]].append(_shift_segment(seg, chunk_delta[chunk]))
+        return results
+
+    # ---------- Metrics ----------
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            queue_depths = dict(sorted(self._queue_depths.items()))
+            waits = sorted(self._waits)
+        with self._cond:
+            stats["queue_depth"] = len(self._pending)
+        stats["batch_size_histogram"] = batch_sizes
+        stats["queue_depth_histogram"] = queue_depths
+        batches = max(stats["batches"], 1)
+        stats["avg_batch_size"] = round(sum(k * v for k, v in batch_sizes.items()) / batches, 2)
+        stats["avg_decode_seconds"] = round(stats["decode_seconds"] / batches, 4)
+        stats["decode_seconds"] = round(stats["decode_seconds"], 2)
+        stats["queue_wait_p50_ms"] = round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0
+        stats["queue_wait_p95_ms"] = round(waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000, 1) if waits else 0.0
+        stats["window_ms"] = round(self.window * 1000, 1)
+        stats["max_batch"] = self.max_batch
+        return stats
@@ -0,0 +1,116 @@
+"""
+🧠 ASR ENGINE REGISTRY - Load model ASR khi cần (lazy) hoặc warm-up nền
+=======================================================================
+Trước đây import audio_service là load ngay cả openai-whisper (PyTorch) lẫn
+faster-whisper → mất vài giây khởi động + vài trăm MB RSS mỗi worker, dù
+Whisper torch chỉ là fallback. Registry này:
+- Chỉ load engine ở lần dùng đầu (hoặc trong thread warm-up)
+- Ghi lại thời gian load + RSS tăng thêm của từng engine
+- Cho biết engine nào đang nằm trong RAM (/api/speaking/perf-stats)
+"""
+
+import os
+import threading
+import time
+
+
+def current_rss_mb():
+    """RSS hiện tại của process (MB) - đọc /proc, fallback ru_maxrss"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+    except Exception:
+        return None
+
+
+class ASREngineRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._engines = {}
+        self._info = {}
+        self._errors = {}
+        # Load tuần tự → RSS delta của từng engine không bị lẫn nhau
+        # (RLock: loader được phép get() engine khác mà nó phụ thuộc)
+        self._load_lock = threading.RLock()
+
+    def register(self, name, loader):
+        """loader(): trả về object engine (chỉ được gọi khi cần)"""
+        self._loaders[name] = loader
+
+    def is_registered(self, name):
+        return name in self._loaders
+
+    def is_loaded(self, name):
+        return name in self._engines
+
+    def failed(self, name):
+        return name in self._errors
+
+    def get(self, name):
+        """Lấy engine, load nếu chưa có (None nếu load lỗi)"""
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+        if name not in self._loaders:
+            return None
+
+        with self._load_lock:
+            if name in self._engines:
+                return self._engines[name]
+            if name in self._errors:
+                return None
+            rss_before = current_rss_mb()
+            t0 = time.perf_counter()
+            try:
+                print(f"🧠 [ASR] Đang load engine '{name}'...")
+                engine = self._loaders[name]()
+            except Exception as e:
+                print(f"⚠️ [ASR] Load engine '{name}' lỗi: {e}")
+                self._errors[name] = str(e)
+                return None
+            rss_after = current_rss_mb()
+            self._info[name] = {
+                "load_seconds": round(time.perf_counter() - t0, 2),
+                "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._engines[name] = engine
+            print(f"✅ [ASR] '{name}' sẵn sàng sau {self._info[name]['load_seconds']}s (+{self._info[name]['rss_delta_mb']}MB RSS)")
+            return engine
+
+    def first_available(self, names):
+        """(name, engine) của engine đầu tiên load được theo thứ tự ưu tiên"""
+        for name in names:
+            engine = self.get(name)
+            if engine is not None:
+                return name, engine
+        return None, None
+
+    def warm_up(self, names, background=True):
+        """Load trước engine đầu tiên dùng được trong names (thread nền → không chặn lúc khởi động worker)"""
+        def _run():
+            self.first_available(names)
+
+        if not background:
+            _run()
+            return None
+        thread = threading.Thread(target=_run, name="asr-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        engines = {}
+        for name in self._loaders:
+            entry = {"resident": name in self._engines}
+            entry.update(self._info.get(name, {}))
+            if name in self._errors:
+                entry["error"] = self._errors[name]
+            engines[name] = entry
+        return {"engines": engines, "process_rss_mb": current_rss_mb(), "pid": os.getpid()}
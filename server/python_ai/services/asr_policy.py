@@ -0,0 +1,156 @@
+"""
+🎚️ ASR POLICY - Tier ASR theo độ trễ + tự hạ tier khi hàng đợi ASR dài
+=======================================================================
+Trước đây transcribe_audio cố định base/beam 2, transcribe_audio_detailed base/beam 5.
+Ở đây endpoint xin 1 tier có tên (rẻ → đắt):
+- fast     : tiny  / int8 / greedy
+- balanced : base  / int8 / beam 2   (transcribe_audio)
+- precise  : base  / int8 / beam 5   (transcribe_audio_detailed)
+- accurate : small / int8 / beam 5
+Policy đo thời gian chờ hàng đợi ASR của từng model (EWMA, giảm dần theo thời gian
+khi không có request). Chờ quá ASR_DEGRADE_WAIT_MS → hạ 1 tier, mỗi bội số ngưỡng
+hạ thêm 1 tier. Response ghi lại tier thực sự dùng (asr_tier).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from services.asr_replicas import ASR_REPLICA_NUM_WORKERS, ASR_REPLICAS
+
+load_dotenv()
+
+# Thứ tự = từ rẻ nhất tới đắt nhất
+ASR_TIERS = {
+    "fast": {"model": "tiny", "beam_size": 1},
+    "balanced": {"model": "base", "beam_size": 2},
+    "precise": {"model": "base", "beam_size": 5},
+    "accurate": {"model": "small", "beam_size": 5}
+}
+# Deploy ít RAM có thể bỏ tier (vd. "fast,balanced,precise" → không bao giờ load small)
+ASR_TIERS_ENABLED = [
+    t.strip() for t in os.getenv("ASR_TIERS_ENABLED", ",".join(ASR_TIERS)).split(",") if t.strip() in ASR_TIERS
+] or ["balanced", "precise"]
+ASR_COMPUTE_TYPE = "int8"
+ASR_DEGRADE = os.getenv("ASR_DEGRADE", "1").strip().lower() not in ("0", "false", "no", "off")
+ASR_DEGRADE_WAIT_MS = float(os.getenv("ASR_DEGRADE_WAIT_MS", "1500"))
+ASR_WAIT_EWMA_ALPHA = float(os.getenv("ASR_WAIT_EWMA_ALPHA", "0.3"))
+# Không có request nào vào model đã bị hạ → EWMA giảm 1 nửa sau mỗi half-life → tự hồi tier
+ASR_WAIT_HALF_LIFE_SECONDS = float(os.getenv("ASR_WAIT_HALF_LIFE_SECONDS", "10"))
+# Mỗi worker CTranslate2 chỉ decode 1 request / lần → hàng đợi thật nằm ở đây
+ASR_MAX_CONCURRENCY = int(os.getenv("ASR_MAX_CONCURRENCY", str(ASR_REPLICAS * ASR_REPLICA_NUM_WORKERS)))
+
+
+def resolve_tier(tier=None, default="balanced"):
+    """Chuẩn hoá tên tier (request → default), tier tắt → tier bật gần nhất"""
+    name = (tier or default or "balanced").strip().lower()
+    if name not in ASR_TIERS:
+        print(f"⚠️ [ASR POLICY] Tier '{name}' không hợp lệ, dùng {default}")
+        name = default
+    if name in ASR_TIERS_ENABLED:
+        return name
+    order = list(ASR_TIERS)
+    return min(ASR_TIERS_ENABLED, key=lambda t: abs(order.index(t) - order.index(name)))
+
+
+def tier_models(tiers=None):
+    """Các model size cần cho các tier đang bật (không trùng, giữ thứ tự)"""
+    models = []
+    for tier in tiers or ASR_TIERS_ENABLED:
+        model = ASR_TIERS[tier]["model"]
+        if model not in models:
+            models.append(model)
+    return models
+
+
+class ASRPolicy:
+    def __init__(self, tiers=None, threshold_ms=ASR_DEGRADE_WAIT_MS, alpha=ASR_WAIT_EWMA_ALPHA,
+                 half_life=ASR_WAIT_HALF_LIFE_SECONDS, max_concurrency=ASR_MAX_CONCURRENCY, degrade=ASR_DEGRADE):
+        self.tiers = list(tiers or ASR_TIERS_ENABLED)
+        self.threshold = threshold_ms / 1000.0
+        self.alpha = alpha
+        self.half_life = half_life
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.degrade = degrade
+
+        self._lock = threading.Lock()
+        self._waits = {}  # model → (ewma giây, thời điểm cập nhật)
+        self._slots = {}
+        self._stats = {"requested": {}, "used": {}, "degraded": 0}
+
+    # ---------- Queue wait ----------
+    def _decayed(self, model, now):
+        ewma, updated = self._waits.get(model, (0.0, now))
+        if self.half_life > 0:
+            ewma *= 0.5 ** ((now - updated) / self.half_life)
+        return ewma
+
+    def observe_wait(self, model, seconds):
+        """Ghi nhận 1 lần chờ hàng đợi của model (batcher hoặc slot tuần tự)"""
+        now = time.monotonic()
+        with self._lock:
+            ewma = self._decayed(model, now)
+            self._waits[model] = (ewma + self.alpha * (seconds - ewma), now)
+
+    def queue_wait(self, model):
+        with self._lock:
+            return self._decayed(model, time.monotonic())
+
+    @contextmanager
+    def slot(self, model):
+        """Giữ 1 chỗ decode của model (đo thời gian chờ) - dùng cho engine không batch"""
+        with self._lock:
+            sem = self._slots.setdefault(model, threading.BoundedSemaphore(self.max_concurrency))
+        t0 = time.perf_counter()
+        sem.acquire()
+        self.observe_wait(model, time.perf_counter() - t0)
+        try:
+            yield
+        finally:
+            sem.release()
+
+    # ---------- Tier selection ----------
+    def select(self, tier=None, default="balanced"):
+        """(tier xin, tier dùng): hạ 1 tier cho mỗi bội số ngưỡng chờ của model tier xin"""
+        requested = resolve_tier(tier, default)
+        used = requested
+        if self.degrade and self.threshold > 0 and requested in self.tiers:
+            wait = self.queue_wait(ASR_TIERS[requested]["model"])
+            idx = self.tiers.index(requested)
+            steps = min(int(wait / self.threshold), idx)
+            used = self.tiers[idx - steps]
+            if steps:
+                print(f"🎚️ [ASR POLICY] Hàng đợi {ASR_TIERS[requested]['model']} chờ ~{wait * 1000:.0f}ms → hạ {requested} → {used}")
+        with self._lock:
+            for key, name in (("requested", requested), ("used", used)):
+                self._stats[key][name] = self._stats[key].get(name, 0) + 1
+            if used != requested:
+                self._stats["degraded"] += 1
+        return requested, used
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            waits = {m: round(self._decayed(m, now) * 1000, 1) for m in self._waits}
+            stats = {
+                "requested": dict(self._stats["requested"]),
+                "used": dict(self._stats["used"]),
+                "degraded": self._stats["degraded"]
+            }
+        return {
+            "enabled": self.degrade,
+            "tiers": {t: ASR_TIERS[t] for t in self.tiers},
+            "degrade_wait_ms": round(self.threshold * 1000, 1),
+            "queue_wait_ewma_ms": waits,
+            **stats
+        }
+
+
+asr_policy = ASRPolicy()
+
+
+def get_asr_policy_stats():
+    return asr_policy.stats()
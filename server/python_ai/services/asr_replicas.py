@@ -0,0 +1,160 @@
+"""
+🧩 ASR REPLICA POOL - N bản faster-whisper, gửi request vào replica rảnh nhất
+============================================================================
+Trước đây chỉ có 1 WhisperModel dùng chung cho mọi thread → các lời gọi transcribe
+đồng thời tranh nhau cùng 1 nhóm intra-op thread của CTranslate2. Pool này:
+- Tạo ASR_REPLICAS replica, mỗi replica có cpu_threads / num_workers riêng
+- Tuỳ chọn ghim core (ASR_REPLICA_CORES="0-3;4-7"): replica được load trong 1 thread
+  đã sched_setaffinity → các worker thread CTranslate2 tạo lúc load thừa hưởng mask
+- Dispatch: replica ít request đang chạy nhất (hoà → ít thời gian bận nhất)
+- Thống kê utilization từng replica để chọn layout replicas × threads cho số core
+So sánh layout: scripts/benchmark_asr_replicas.py
+"""
+
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASR_REPLICAS = max(1, int(os.getenv("ASR_REPLICAS", "1")))
+# 0 = mặc định của CTranslate2 (hoặc số core được ghim nếu có ASR_REPLICA_CORES)
+ASR_REPLICA_CPU_THREADS = int(os.getenv("ASR_REPLICA_CPU_THREADS", "0"))
+ASR_REPLICA_NUM_WORKERS = max(1, int(os.getenv("ASR_REPLICA_NUM_WORKERS", "1")))
+ASR_REPLICA_CORES = os.getenv("ASR_REPLICA_CORES", "").strip()
+
+
+def parse_core_sets(spec):
+    """"0-3;4-7,12" → [{0,1,2,3}, {4,5,6,7,12}] (1 nhóm / replica, phân cách bằng ;)"""
+    core_sets = []
+    for group in (spec or "").split(";"):
+        cores = set()
+        for part in group.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                lo, hi = part.split("-", 1)
+                cores.update(range(int(lo), int(hi) + 1))
+            else:
+                cores.add(int(part))
+        if cores:
+            core_sets.append(cores)
+    return core_sets
+
+
+def _load_pinned(loader, cores, name):
+    """Chạy loader() trong 1 thread riêng đã ghim vào cores (None = không ghim)"""
+    result = {}
+
+    def _run():
+        try:
+            if cores:
+                if hasattr(os, "sched_setaffinity"):
+                    os.sched_setaffinity(0, cores)  # 0 = thread hiện tại
+                else:
+                    print(f"⚠️ [ASR REPLICA] Hệ điều hành không hỗ trợ sched_setaffinity, {name} không ghim core")
+            result["model"] = loader()
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=_run, name=f"asr-load-{name}", daemon=True)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["model"]
+
+
+class _Replica:
+    def __init__(self, index, model, cpu_threads, num_workers, cores):
+        self.index = index
+        self.model = model
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.cores = sorted(cores) if cores else None
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+
+class WhisperReplicaPool:
+    """
+    Cùng interface transcribe(audio, **options) → (segments, info) như WhisperModel,
+    nhưng segments đã được decode xong (list) trước khi trả replica về pool.
+    """
+
+    def __init__(self, model_size="base", replicas=ASR_REPLICAS, compute_type="int8",
+                 cpu_threads=ASR_REPLICA_CPU_THREADS, num_workers=ASR_REPLICA_NUM_WORKERS,
+                 core_sets=None, model_factory=None):
+        if model_factory is None:
+            from faster_whisper import WhisperModel
+            model_factory = WhisperModel
+        core_sets = parse_core_sets(ASR_REPLICA_CORES) if core_sets is None else core_sets
+
+        self.model_size = model_size
+        self.created_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.replicas = []
+        for i in range(max(1, int(replicas))):
+            cores = core_sets[i % len(core_sets)] if core_sets else None
+            threads = cpu_threads or (len(cores) if cores else 0)
+            model = _load_pinned(
+                lambda: model_factory(model_size, device="cpu", compute_type=compute_type,
+                                      cpu_threads=threads, num_workers=num_workers),
+                cores, f"{model_size}-{i}"
+            )
+            self.replicas.append(_Replica(i, model, threads, num_workers, cores))
+        print(f"🧩 [ASR REPLICA] {model_size}: {len(self.replicas)} replica × {cpu_threads or 'auto'} thread"
+              + (f", ghim core {[r.cores for r in self.replicas]}" if core_sets else ""))
+
+    @property
+    def primary(self):
+        """WhisperModel của replica đầu (cho BatchedInferencePipeline)"""
+        return self.replicas[0].model
+
+    def _acquire(self):
+        with self._lock:
+            replica = min(self.replicas, key=lambda r: (r.in_flight / r.num_workers, r.busy_seconds))
+            replica.in_flight += 1
+            return replica
+
+    def transcribe(self, audio, **options):
+        replica = self._acquire()
+        t0 = time.perf_counter()
+        error = False
+        try:
+            segments, info = replica.model.transcribe(audio, **options)
+            return list(segments), info  # generator: decode thật sự chạy khi duyệt → duyệt khi còn giữ replica
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                replica.in_flight -= 1
+                replica.requests += 1
+                replica.busy_seconds += elapsed
+                replica.errors += int(error)
+
+    def stats(self):
+        uptime = max(time.monotonic() - self.created_at, 1e-9)
+        with self._lock:
+            replicas = [
+                {
+                    "index": r.index,
+                    "cpu_threads": r.cpu_threads or "auto",
+                    "num_workers": r.num_workers,
+                    "cores": r.cores,
+                    "in_flight": r.in_flight,
+                    "requests": r.requests,
+                    "errors": r.errors,
+                    "avg_seconds": round(r.busy_seconds / r.requests, 3) if r.requests else 0.0,
+                    "utilization": round(r.busy_seconds / (uptime * r.num_workers), 3)
+                }
+                for r in self.replicas
+            ]
+        return {"model": self.model_size, "replicas": replicas, "uptime_seconds": round(uptime, 1)}
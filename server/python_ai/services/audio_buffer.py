@@ -0,0 +1,107 @@
+"""
+🎧 AUDIO BUFFER - Giải mã 1 lần, dùng chung cho mọi stage
+=========================================================
+Một request speaking trước đây decode cùng 1 file 5-6 lần (pydub, librosa.load,
+export wav tạm...). AudioBuffer giữ tín hiệu mono float32 trong RAM và cache
+các bản resample, để STT / Pitch / Features / Duration dùng chung.
+"""
+
+import hashlib
+import threading
+
+import numpy as np
+from pydub import AudioSegment
+
+from services.audio_decoder import decode_audio
+
+# Tần số chuẩn cho speech (Whisper + đặc trưng XGBoost đều dùng 16kHz)
+DEFAULT_SR = 16000
+
+
+class AudioBuffer:
+    """Tín hiệu mono float32 [-1, 1] + sample rate, kèm cache resample theo sr"""
+
+    def __init__(self, samples, sr, content_hash=None, source_path=None):
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.sr = int(sr)
+        self.source_path = source_path
+        self._content_hash = content_hash
+        self._views = {self.sr: self.samples}
+        self._artifacts = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    # ---------- Khởi tạo ----------
+    @classmethod
+    def from_segment(cls, segment, sr=DEFAULT_SR, content_hash=None, source_path=None):
+        """Chuyển pydub AudioSegment -> AudioBuffer (mono, sr chỉ định)"""
+        segment = segment.set_channels(1)
+        if sr:
+            segment = segment.set_frame_rate(sr)
+        scale = float(1 << (8 * segment.sample_width - 1))
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32) / scale
+        return cls(samples, segment.frame_rate, content_hash=content_hash, source_path=source_path)
+
+    @classmethod
+    def from_file(cls, path, sr=DEFAULT_SR):
+        """Decode file (webm/mp3/wav...) đúng 1 lần - in-process (soundfile / PyAV), ffmpeg là fallback"""
+        samples, out_sr = decode_audio(path, sr=sr)
+        return cls(samples, out_sr, source_path=path)
+
+    @classmethod
+    def from_bytes(cls, data, sr=DEFAULT_SR):
+        """
+        Decode upload ngay trong RAM (bytes → float32 mono), không ghi file tạm.
+        Backend giống from_file: soundfile / PyAV trong process, ffmpeg pipe là fallback.
+        """
+        content_hash = hashlib.sha256(data).hexdigest()  # = hash file → key cache giống chế độ tempfile
+        samples, out_sr = decode_audio(data, sr=sr)
+        return cls(samples, out_sr, content_hash=content_hash)
+
+    # ---------- Thuộc tính ----------
+    @property
+    def duration(self):
+        return len(self.samples) / float(self.sr) if self.sr else 0.0
+
+    @property
+    def content_hash(self):
+        """SHA-256 của file gốc (giữ key cache cũ), hoặc của samples nếu không có file"""
+        if self._content_hash is None:
+            sha256_hash = hashlib.sha256()
+            if self.source_path:
+                with open(self.source_path, "rb") as f:
+                    for byte_block in iter(lambda: f.read(65536), b""):
+                        sha256_hash.update(byte_block)
+            else:
+                sha256_hash.update(self.samples.tobytes())
+            self._content_hash = sha256_hash.hexdigest()
+        return self._content_hash
+
+    # ---------- Views ----------
+    def resampled(self, target_sr):
+        """Bản resample (cache lại, các thread dùng chung)"""
+        target_sr = int(target_sr)
+        view = self._views.get(target_sr)
+        if view is None:
+            import librosa
+            view = librosa.resample(self.samples, orig_sr=self.sr, target_sr=target_sr).astype(np.float32)
+            with self._lock:
+                view = self._views.setdefault(target_sr, view)
+        return view
+
+    def to_segment(self, sr=DEFAULT_SR):
+        """AudioSegment int16 (không cần ffmpeg) cho các hàm pydub cũ"""
+        y = self.resampled(sr)
+        pcm = (np.clip(y, -1.0, 1.0) * 32767.0).astype(np.int16)
+        return AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=sr, channels=1)
+
+    def memo(self, key, compute):
+        """Tính 1 lần / buffer. Thread khác gọi cùng key sẽ đợi kết quả thay vì tính lại"""
+        if key in self._artifacts:
+            return self._artifacts[key]
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._artifacts:
+                self._artifacts[key] = compute()
+            return self._artifacts[key]
@@ -0,0 +1,232 @@
+"""
+🎧 AUDIO DECODER - Decode webm/Opus, mp3, wav ngay trong process
+================================================================
+pydub AudioSegment.from_file / .export spawn 1 process ffmpeg cho mỗi lần gọi; dưới tải
+đồng thời, chi phí fork + pipe lấn át cả các stage nhanh. Module này decode in-process:
+- soundfile : libsndfile (wav / flac / ogg)
+- pyav      : libav bindings (webm/Opus, mp3, m4a...) - có sẵn vì faster-whisper phụ thuộc `av`
+- ffmpeg    : subprocess ffmpeg qua pipe (fallback cuối, hành vi cũ)
+Thứ tự thử cấu hình bằng AUDIO_DECODER_BACKENDS (mặc định "soundfile,pyav,ffmpeg").
+Kết quả luôn là float32 mono [-1, 1] ở sample rate yêu cầu.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AUDIO_DECODER_BACKENDS = [
+    b.strip() for b in os.getenv("AUDIO_DECODER_BACKENDS", "soundfile,pyav,ffmpeg").split(",") if b.strip()
+]
+
+# libsndfile không đọc được Matroska/WebM, còn mp3 VBR không có header Xing thì
+# libsndfile đoán sai độ dài (cắt cụt) → 2 loại này đi thẳng PyAV
+_EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _record(backend, elapsed=None, error=False):
+    with _stats_lock:
+        entry = _stats.setdefault(backend, {"count": 0, "errors": 0, "total_seconds": 0.0})
+        if error:
+            entry["errors"] += 1
+        else:
+            entry["count"] += 1
+            entry["total_seconds"] += elapsed
+
+
+def _skip_soundfile(head):
+    if head == _EBML_MAGIC or head[:3] == b"ID3":
+        return True
+    return len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0
+
+
+def _head(source, n=4):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:n])
+    try:
+        with open(source, "rb") as f:
+            return f.read(n)
+    except OSError:
+        return b""
+
+
+def _to_mono(data):
+    """(frames, channels) → mono float32"""
+    data = np.asarray(data, dtype=np.float32)
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+def _resample(samples, orig_sr, sr):
+    if not sr or orig_sr == sr:
+        return samples, orig_sr
+    import librosa
+    return librosa.resample(samples, orig_sr=orig_sr, target_sr=sr).astype(np.float32), sr
+
+
+# ==========================================
+# BACKENDS
+# ==========================================
+def _decode_soundfile(source, sr):
+    import soundfile as sf
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(bytes(source))
+    data, native_sr = sf.read(source, dtype="float32", always_2d=True)
+    return _resample(_to_mono(data), native_sr, sr)
+
+
+def _decode_pyav(source, sr):
+    import av
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(bytes(source))
+    chunks = []
+    with av.open(source, mode="r", metadata_errors="ignore") as container:
+        stream = container.streams.audio[0]
+        out_sr = sr or stream.rate
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=out_sr)
+        for frame in container.decode(stream):
+            frame.pts = None  # tránh lỗi pts không liên tục của webm ghi từ MediaRecorder
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+        for out in resampler.resample(None):
+            chunks.append(out.to_ndarray().reshape(-1))
+    samples = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    return np.ascontiguousarray(samples, dtype=np.float32), out_sr
+
+
+def _decode_ffmpeg(source, sr):
+    if shutil.which("ffmpeg") is None:
+        raise FileNotFoundError("Không tìm thấy ffmpeg CLI")
+    if not sr:
+        raise ValueError("Backend ffmpeg cần sr cụ thể")
+    from_pipe = isinstance(source, (bytes, bytearray, memoryview))
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0" if from_pipe else source,
+           "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sr), "pipe:1"]
+    try:
+        proc = subprocess.run(
+            cmd, input=bytes(source) if from_pipe else None,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"ffmpeg decode lỗi: {e.stderr.decode('utf-8', 'ignore')[:200]}")
+    return np.frombuffer(proc.stdout, dtype=np.float32).copy(), sr
+
+
+_BACKENDS = {
+    "soundfile": _decode_soundfile,
+    "pyav": _decode_pyav,
+    "ffmpeg": _decode_ffmpeg
+}
+
+
+def decode_audio(source, sr=16000, backends=None):
+    """
+    source: đường dẫn file hoặc bytes → (float32 mono, sr).
+    Thử lần lượt từng backend, backend lỗi / không cài thì chuyển sang backend sau.
+    """
+    errors = []
+    skip_soundfile = _skip_soundfile(_head(source))
+    for name in backends or AUDIO_DECODER_BACKENDS:
+        fn = _BACKENDS.get(name)
+        if fn is None or (skip_soundfile and name == "soundfile"):
+            continue
+        t0 = time.perf_counter()
+        try:
+            samples, out_sr = fn(source, sr)
+            if samples.size == 0:
+                raise ValueError("không decode được sample nào")
+        except Exception as e:
+            _record(name, error=True)
+            errors.append(f"{name}: {e}")
+            continue
+        _record(name, time.perf_counter() - t0)
+        return samples, out_sr
+    raise ValueError("Không decode được audio (" + "; ".join(errors) + ")")
+
+
+# ==========================================
+# MP3 MERGE (TTS)
+# ==========================================
+def _strip_id3(data):
+    """Bỏ tag ID3v2 ở đầu và ID3v1 ở cuối → chỉ còn các frame MPEG"""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+_MP3_BITRATES = {
+    "mpeg1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "mpeg2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _mp3_frame_length(header):
+    """Độ dài frame MPEG Layer III từ 4 byte header (None nếu không phải)"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version, layer = (header[1] >> 3) & 3, (header[1] >> 1) & 3
+    bitrate_idx, sr_idx, padding = header[2] >> 4, (header[2] >> 2) & 3, (header[2] >> 1) & 1
+    if layer != 1 or version not in _MP3_SAMPLE_RATES or sr_idx == 3 or bitrate_idx in (0, 15):
+        return None
+    bitrate = _MP3_BITRATES["mpeg1" if version == 3 else "mpeg2"][bitrate_idx] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sr_idx]
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+
+def _strip_vbr_header(data):
+    """
+    Bỏ frame Xing/Info/VBRI đầu file: frame này ghi tổng số frame của riêng đoạn đó,
+    để lại thì player dừng ở cuối đoạn đầu tiên.
+    """
+    length = _mp3_frame_length(data[:4])
+    if length and any(tag in data[4:min(length, 64)] for tag in (b"Xing", b"Info", b"VBRI")):
+        return data[length:]
+    return data
+
+
+def merge_mp3_files(paths, out_path):
+    """
+    Ghép các đoạn mp3 TTS (cùng giọng / bitrate) bằng cách nối frame MPEG,
+    không decode + encode lại. Trả về số đoạn đã ghép.
+    """
+    merged = 0
+    with open(out_path, "wb") as out:
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                frames = _strip_vbr_header(_strip_id3(f.read()))
+            if not frames:
+                continue
+            out.write(frames)
+            merged += 1
+    return merged
+
+
+def get_decoder_stats():
+    with _stats_lock:
+        backends = {
+            name: {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "avg_ms": round(entry["total_seconds"] / entry["count"] * 1000, 2) if entry["count"] else 0.0
+            }
+            for name, entry in _stats.items()
+        }
+    return {"order": AUDIO_DECODER_BACKENDS, "backends": backends}
@@ -0,0 +1,231 @@
+"""
+🧮 AUDIO PROCESS POOL - Chạy pitch / spectral front-end ở process riêng
+======================================================================
+Các stage librosa (pYIN, MFCC...) chạy trong ThreadPoolExecutor của app.py tranh GIL
+với thread Flask → mỗi stage gần như chỉ dùng được ~1 core. Bật pool này bằng
+AUDIO_PROCESS_POOL_WORKERS=N (mặc định 0 = chạy trong thread như cũ):
+- Worker khởi tạo sẵn (numba JIT của pyin/yin, mel basis) trước khi nhận việc
+- Audio 16kHz đưa qua shared_memory (1 block / AudioBuffer, dùng chung cho mọi stage),
+  không pickle mảng, không file tạm
+- Đo thời gian chờ hàng đợi + thời gian chạy theo từng stage (/api/speaking/perf-stats)
+Worker dùng start method "spawn" (an toàn với thread/model đã load trong process chính).
+Lưu ý: chạy kiểu `python app.py` thì worker sẽ import lại app.py (phần __main__ không chạy).
+"""
+
+import atexit
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AUDIO_PROCESS_POOL_WORKERS = int(os.getenv("AUDIO_PROCESS_POOL_WORKERS", "0"))
+AUDIO_PROCESS_POOL_START_METHOD = os.getenv("AUDIO_PROCESS_POOL_START_METHOD", "spawn")
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_broken = False
+
+_stats_lock = threading.Lock()
+_stage_stats = {}
+
+
+# ==========================================
+# SHARED MEMORY
+# ==========================================
+def _release_shared(shm):
+    try:
+        shm.close()
+        shm.unlink()
+    except Exception:
+        pass
+
+
+class SharedAudio:
+    """Block shared_memory chứa mảng float32 - tự unlink khi AudioBuffer được giải phóng"""
+
+    def __init__(self, samples, sr):
+        from multiprocessing import shared_memory
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.n = len(samples)
+        self.sr = sr
+        self.shm = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+        np.ndarray((self.n,), dtype=np.float32, buffer=self.shm.buf)[:] = samples
+        self.name = self.shm.name
+        self._finalizer = weakref.finalize(self, _release_shared, self.shm)
+
+
+def share_audio(audio, sr):
+    """SharedAudio của buffer (memo: pitch + spectrum dùng chung 1 block)"""
+    return audio.memo(("shared_memory", sr), lambda: SharedAudio(audio.resampled(sr), sr))
+
+
+# ==========================================
+# WORKER SIDE
+# ==========================================
+def _run_pitch(y, sr, **params):
+    from services.pitch_service import compute_pitch_track
+    return compute_pitch_track(y, sr, **params)
+
+
+def _run_spectrum(y, sr, **params):
+    from services.spectral_frontend import compute_spectral_analysis
+    return compute_spectral_analysis(y, sr, **params)
+
+
+_STAGES = {
+    "pitch": _run_pitch,
+    "spectrum": _run_spectrum
+}
+
+
+def _worker_init():
+    """Warm-up: JIT numba + cache mel basis trước khi nhận request thật"""
+    t0 = time.perf_counter()
+    try:
+        from services.pitch_service import PITCH_ENGINES, PITCH_SR
+        from services.spectral_frontend import FEATURE_SR
+        warm = (np.random.default_rng(0).standard_normal(PITCH_SR // 2) * 0.1).astype(np.float32)
+        for engine in PITCH_ENGINES:
+            _run_pitch(warm, PITCH_SR, engine=engine)
+        _run_spectrum(warm, FEATURE_SR)
+        print(f"🧮 [POOL] Worker {os.getpid()} warm-up xong sau {time.perf_counter() - t0:.2f}s")
+    except Exception as e:
+        print(f"⚠️ [POOL] Worker {os.getpid()} warm-up lỗi: {e}")
+
+
+def _worker_run(stage, shm_name, n, sr, params):
+    started = time.time()
+    from multiprocessing import shared_memory
+    # Worker (spawn) dùng chung resource tracker với process chính → chỉ close, process chính unlink
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        y = np.ndarray((n,), dtype=np.float32, buffer=shm.buf)
+        result = _STAGES[stage](y, sr, **params)
+        del y
+    finally:
+        shm.close()
+    return result, started, time.time()
+
+
+def _worker_ping(delay):
+    time.sleep(delay)
+    return os.getpid()
+
+
+# ==========================================
+# PARENT SIDE
+# ==========================================
+def process_pool_enabled():
+    return AUDIO_PROCESS_POOL_WORKERS > 0 and not _pool_broken
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                ctx = multiprocessing.get_context(AUDIO_PROCESS_POOL_START_METHOD)
+                _pool = ProcessPoolExecutor(
+                    max_workers=AUDIO_PROCESS_POOL_WORKERS, mp_context=ctx, initializer=_worker_init
+                )
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+                print(f"🧮 [POOL] Process pool {AUDIO_PROCESS_POOL_WORKERS} worker ({AUDIO_PROCESS_POOL_START_METHOD})")
+    return _pool
+
+
+def start_process_pool(background=True):
+    """Khởi động + warm-up đủ N worker ngay lúc boot (không đợi request đầu tiên)"""
+    if not process_pool_enabled():
+        return None
+
+    def _run():
+        try:
+            pool = _get_pool()
+            pids = list(pool.map(_worker_ping, [0.2] * AUDIO_PROCESS_POOL_WORKERS))
+            print(f"✅ [POOL] {len(set(pids))} worker sẵn sàng")
+        except Exception as e:
+            print(f"⚠️ [POOL] Không khởi động được process pool: {e}")
+
+    if not background:
+        _run()
+        return None
+    thread = threading.Thread(target=_run, name="audio-pool-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _record(stage, queue_wait=None, run=None, error=False):
+    with _stats_lock:
+        entry = _stage_stats.setdefault(stage, {
+            "count": 0, "errors": 0, "queue_wait": deque(maxlen=1000), "run": deque(maxlen=1000)
+        })
+        if error:
+            entry["errors"] += 1
+            return
+        entry["count"] += 1
+        entry["queue_wait"].append(max(queue_wait, 0.0))
+        entry["run"].append(run)
+
+
+def run_audio_stage(stage, audio, sr, params, fallback):
+    """
+    Chạy stage ("pitch" | "spectrum") trên process pool nếu bật, ngược lại (hoặc pool lỗi)
+    gọi fallback() ngay trong thread hiện tại.
+    """
+    global _pool_broken
+    if not process_pool_enabled():
+        return fallback()
+
+    try:
+        shared = share_audio(audio, sr)
+        submitted = time.time()
+        result, started, finished = _get_pool().submit(
+            _worker_run, stage, shared.name, shared.n, sr, params
+        ).result()
+        _record(stage, queue_wait=started - submitted, run=finished - started)
+        return result
+    except Exception as e:
+        from concurrent.futures.process import BrokenProcessPool
+        if isinstance(e, BrokenProcessPool):
+            _pool_broken = True
+        print(f"⚠️ [POOL] Stage '{stage}' lỗi trên process pool, chạy trong thread: {e}")
+        _record(stage, error=True)
+        return fallback()
+
+
+def _percentile_ms(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(int(len(ordered) * q), len(ordered) - 1)] * 1000, 1)
+
+
+def get_process_pool_stats():
+    """Queue wait / run time theo stage (ms)"""
+    stats = {
+        "enabled": process_pool_enabled(),
+        "workers": AUDIO_PROCESS_POOL_WORKERS,
+        "start_method": AUDIO_PROCESS_POOL_START_METHOD,
+        "broken": _pool_broken,
+        "stages": {}
+    }
+    with _stats_lock:
+        for stage, entry in _stage_stats.items():
+            waits, runs = list(entry["queue_wait"]), list(entry["run"])
+            stats["stages"][stage] = {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "queue_wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "queue_wait_p95_ms": _percentile_ms(waits, 0.95),
+                "run_avg_ms": round(sum(runs) / len(runs) * 1000, 1) if runs else 0.0,
+                "run_p95_ms": _percentile_ms(runs, 0.95)
+            }
+    return stats
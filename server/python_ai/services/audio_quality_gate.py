@@ -0,0 +1,163 @@
+"""
+🚦 AUDIO QUALITY GATE - Chặn sớm bản ghi không chấm được
+=========================================================
+Bản ghi im lặng / 0.5s / rè vỡ tiếng trước đây vẫn đi hết Whisper, pYIN, XGBoost,
+LanguageTool (và cả Gemini assist) chỉ để trả về điểm mặc định. Gate này chạy trên
+buffer đã decode (1 lần framing 30ms bằng numpy, vài ms cho bài 1-2 phút) và kiểm tra:
+- duration      : quá ngắn                → too_short
+- RMS tổng      : gần như không có tín hiệu → silent
+- speech ratio  : tỉ lệ frame có tiếng quá thấp → no_speech
+- clipping      : quá nhiều sample chạm trần → clipped
+Không đạt → endpoint trả response "unscorable" kèm reason code, không chạy pipeline.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUALITY_GATE = os.getenv("QUALITY_GATE", "1").strip().lower() not in ("0", "false", "no", "off")
+QUALITY_MIN_DURATION = float(os.getenv("QUALITY_MIN_DURATION", "1.0"))
+QUALITY_MIN_RMS_DBFS = float(os.getenv("QUALITY_MIN_RMS_DBFS", "-55"))
+QUALITY_SPEECH_DBFS = float(os.getenv("QUALITY_SPEECH_DBFS", "-40"))
+QUALITY_MIN_SPEECH_RATIO = float(os.getenv("QUALITY_MIN_SPEECH_RATIO", "0.05"))
+QUALITY_MAX_CLIPPING_RATIO = float(os.getenv("QUALITY_MAX_CLIPPING_RATIO", "0.05"))
+QUALITY_FRAME_MS = 30
+QUALITY_CLIP_LEVEL = 0.999
+
+REASON_MESSAGES = {
+    "too_short": "Bản ghi quá ngắn để chấm điểm. Hãy nói ít nhất vài câu.",
+    "silent": "Không nghe thấy âm thanh nào. Hãy kiểm tra micro.",
+    "no_speech": "Gần như không phát hiện giọng nói trong bản ghi.",
+    "clipped": "Âm thanh bị rè/vỡ tiếng (micro quá gần hoặc gain quá lớn). Hãy ghi âm lại."
+}
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checked": 0,
+    "passed": 0,
+    "rejected": 0,
+    "by_reason": {},
+    "gate_seconds": 0.0,
+    "rejected_audio_seconds": 0.0,
+    "scored": 0,
+    "scored_pipeline_seconds": 0.0
+}
+
+
+class QualityReport:
+    def __init__(self, ok, reason=None, metrics=None, elapsed_ms=0.0):
+        self.ok = ok
+        self.reason = reason
+        self.metrics = metrics or {}
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def message(self):
+        return REASON_MESSAGES.get(self.reason, "")
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "reason_code": self.reason,
+            "message": self.message,
+            "metrics": self.metrics,
+            "gate_ms": round(self.elapsed_ms, 3)
+        }
+
+
+def _dbfs(value):
+    return float(20.0 * np.log10(value)) if value > 0 else -120.0
+
+
+def measure_quality(samples, sr):
+    """Các chỉ số thô: duration, RMS dBFS, speech ratio (frame 30ms > QUALITY_SPEECH_DBFS), clipping ratio"""
+    samples = np.asarray(samples, dtype=np.float32)
+    duration = len(samples) / float(sr) if sr else 0.0
+    frame = max(int(sr * QUALITY_FRAME_MS / 1000), 1)
+    n_frames = len(samples) // frame
+    if n_frames:
+        frames = samples[:n_frames * frame].reshape(n_frames, frame)
+        frame_power = np.einsum("ij,ij->i", frames, frames) / frame
+        rms = float(np.sqrt(frame_power.mean()))
+        speech_ratio = float(np.mean(frame_power > 10.0 ** (QUALITY_SPEECH_DBFS / 10.0)))
+    else:
+        rms = float(np.sqrt(np.mean(samples ** 2))) if len(samples) else 0.0
+        speech_ratio = 0.0
+    clipping_ratio = float(np.count_nonzero(np.abs(samples) >= QUALITY_CLIP_LEVEL)) / len(samples) if len(samples) else 0.0
+    return {
+        "duration": round(duration, 3),
+        "rms_dbfs": round(_dbfs(rms), 2),
+        "speech_ratio": round(speech_ratio, 3),
+        "clipping_ratio": round(clipping_ratio, 4)
+    }
+
+
+def _judge(metrics):
+    if metrics["duration"] < QUALITY_MIN_DURATION:
+        return "too_short"
+    if metrics["rms_dbfs"] < QUALITY_MIN_RMS_DBFS:
+        return "silent"
+    if metrics["speech_ratio"] < QUALITY_MIN_SPEECH_RATIO:
+        return "no_speech"
+    if metrics["clipping_ratio"] > QUALITY_MAX_CLIPPING_RATIO:
+        return "clipped"
+    return None
+
+
+def check_audio_quality(audio):
+    """
+    QualityReport của AudioBuffer (memo theo buffer). audio=None (decode lỗi) hoặc gate tắt
+    → luôn ok, pipeline tự xử lý như cũ.
+    """
+    if audio is None or not QUALITY_GATE:
+        return QualityReport(True)
+
+    def _compute():
+        t0 = time.perf_counter()
+        metrics = measure_quality(audio.samples, audio.sr)
+        reason = _judge(metrics)
+        elapsed = time.perf_counter() - t0
+        with _stats_lock:
+            _stats["checked"] += 1
+            _stats["gate_seconds"] += elapsed
+            if reason:
+                _stats["rejected"] += 1
+                _stats["by_reason"][reason] = _stats["by_reason"].get(reason, 0) + 1
+                _stats["rejected_audio_seconds"] += metrics["duration"]
+            else:
+                _stats["passed"] += 1
+        if reason:
+            print(f"🚦 [GATE] Unscorable ({reason}): {metrics}")
+        return QualityReport(reason is None, reason, metrics, elapsed * 1000)
+
+    return audio.memo(("quality_gate",), _compute)
+
+
+def record_scored(pipeline_seconds):
+    """Endpoint báo thời gian pipeline đầy đủ của 1 bài đã qua gate → ước lượng compute tiết kiệm"""
+    with _stats_lock:
+        _stats["scored"] += 1
+        _stats["scored_pipeline_seconds"] += pipeline_seconds
+
+
+def get_quality_gate_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+        stats["by_reason"] = dict(_stats["by_reason"])
+    avg_pipeline = stats["scored_pipeline_seconds"] / stats["scored"] if stats["scored"] else 0.0
+    return {
+        "enabled": QUALITY_GATE,
+        "checked": stats["checked"],
+        "passed": stats["passed"],
+        "rejected": stats["rejected"],
+        "by_reason": stats["by_reason"],
+        "avg_gate_ms": round(stats["gate_seconds"] / stats["checked"] * 1000, 3) if stats["checked"] else 0.0,
+        "rejected_audio_seconds": round(stats["rejected_audio_seconds"], 2),
+        "avg_pipeline_seconds": round(avg_pipeline, 3),
+        "saved_seconds_estimate": round(stats["rejected"] * avg_pipeline, 2)
+    }
@@ -1,85 +1,261 @@
-import whisper
 try:
     from faster_whisper import WhisperModel
     HAS_FASTER_WHISPER = True
 except ImportError:
     HAS_FASTER_WHISPER = False
 
-import librosa
-import numpy as np
 import os
 import hashlib
-from pydub import AudioSegment
-from pydub.silence import detect_nonsilent
-from pymongo import MongoClient
+from functools import partial, wraps
 from dotenv import load_dotenv
+from services.artifact_cache import analysis_cache, make_cache_key
+from services.asr_batcher import ASR_BATCHING, ASRBatcher
+from services.asr_engines import ASREngineRegistry
+from services.asr_replicas import ASR_REPLICAS, WhisperReplicaPool
+from services.asr_policy import ASR_COMPUTE_TYPE, ASR_DEGRADE, ASR_TIERS, ASR_TIERS_ENABLED, asr_policy, resolve_tier, tier_models
+from services.audio_buffer import AudioBuffer
+from services.audio_sidecar import AUDIO_SIDECAR_FALLBACK, SidecarError, SidecarUnavailable, make_client
+from services.silence_trim import trim_buffer, trim_offsets_ms
+from services.pitch_service import PITCH_HOP_LENGTH, PITCH_SR, analyze_pitch, pitch_region_mode, resolve_engine
+from services.spectral_frontend import MAX_ANALYSIS_SECONDS, extract_speaking_features_cached
 
 load_dotenv()
 
-# --- MONGODB CACHE CONFIG ---
-MONGO_URI = os.getenv("MONGO_URI")
-try:
-    mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    db = mongo_client["ai_speaking_cache"]
-    pitch_cache = db["pitch_data"]
-    # Test connection
-    mongo_client.server_info()
-    print("🍃 MongoDB Cache connected!")
-except Exception as e:
-    print(f"⚠️ MongoDB Cache failed: {e}")
-    pitch_cache = None
-
-# Khởi tạo model Whisper (Động cơ cũ)
-print("🎙️ Đang tải model Whisper (base)...")
-whisper_model = whisper.load_model("base")
-
-# Khởi tạo Faster-Whisper (Động cơ mới - Cực nhanh)
+ASR_WARMUP = os.getenv("ASR_WARMUP", "1").strip().lower() not in ("0", "false", "no", "off")
+
+def _engine_names(model="base"):
+    """(tên engine batched, tên engine tuần tự) của 1 model size - 'base' giữ tên cũ"""
+    if model == "base":
+        return "faster-whisper-batched", "faster-whisper"
+    return f"faster-whisper-batched-{model}", f"faster-whisper-{model}"
+
+def _load_faster_whisper(model="base"):
+    # 'base': WER ~10% (tốt hơn 'tiny' 18% WER), vẫn nhanh gấp 2-3x 'small' - tier khác xem asr_policy
+    # ASR_REPLICAS replica (cpu_threads / ghim core riêng), request vào replica rảnh nhất
+    print(f"🚀 Đang tải Động cơ Faster-Whisper ({model}, {ASR_COMPUTE_TYPE}, {ASR_REPLICAS} replica)...")
+    return WhisperReplicaPool(model, compute_type=ASR_COMPUTE_TYPE, model_factory=WhisperModel)
+
+def _load_faster_whisper_batched(model="base"):
+    # Micro-batching: gom request đồng thời vào 1 lần decode (BatchedInferencePipeline)
+    from faster_whisper import BatchedInferencePipeline
+    pool = asr_registry.get(_engine_names(model)[1])
+    if pool is None:
+        raise RuntimeError(f"faster-whisper ({model}) chưa load được")
+    batcher = ASRBatcher(
+        BatchedInferencePipeline(model=pool.primary),
+        wait_observer=partial(asr_policy.observe_wait, model)  # thời gian chờ batch → policy hạ tier
+    )
+    print(f"📦 ASR micro-batching ({model}): cửa sổ {batcher.window * 1000:.0f}ms, tối đa {batcher.max_batch} request/batch")
+    return batcher
+
+def _load_openai_whisper():
+    # Động cơ cũ (PyTorch) - chỉ dùng khi không có faster-whisper
+    import whisper
+    print("🎙️ Đang tải model Whisper (base)...")
+    return whisper.load_model("base")
+
+# Registry: không load gì lúc import, engine nằm trong RAM từ lần dùng đầu / warm-up
+asr_registry = ASREngineRegistry()
+# Batching (1 model, gom request) và nhiều replica (song song) là 2 cách dùng core khác nhau:
+# ASR_REPLICAS > 1 → bỏ engine batched, request tuần tự chia đều cho các replica
+ASR_USE_BATCHER = ASR_BATCHING and ASR_REPLICAS == 1
 if HAS_FASTER_WHISPER:
-    print("🚀 Đang tải Động cơ Faster-Whisper (base) - Cân bằng Tốc độ/Độ chính xác...")
+    for _model in dict.fromkeys(["base"] + tier_models()):
+        _batched_name, _name = _engine_names(_model)
+        if ASR_USE_BATCHER:
+            asr_registry.register(_batched_name, partial(_load_faster_whisper_batched, _model))
+        asr_registry.register(_name, partial(_load_faster_whisper, _model))
+asr_registry.register("whisper", _load_openai_whisper)
+
+def _engine_priority(model="base"):
+    """Batched → faster-whisper của model tier → base → whisper (torch chỉ load khi các cái trên lỗi)"""
+    names = _engine_names(model) + _engine_names("base") + ("whisper",)
+    return [n for n in dict.fromkeys(names) if asr_registry.is_registered(n)]
+
+ASR_ENGINE_PRIORITY = _engine_priority("base")
+
+def _resolve_asr(model="base"):
+    """(tên, engine) ASR của model size cho request - load lazy theo thứ tự ưu tiên"""
+    name = _engine_names(model)[1]
+    if asr_registry.is_registered(name):
+        asr_registry.get(name)  # load model trước để RSS delta của batcher không gộp model
+    name, engine = asr_registry.first_available(_engine_priority(model))
+    if engine is None:
+        raise RuntimeError("Không có engine ASR nào load được")
+    return name, engine
+
+# AUDIO_SIDECAR_SOCKET: model nằm ở sidecar, web worker chỉ là thin client (không warm-up ASR)
+sidecar_client = make_client()
+
+def _via_sidecar(op, samples_arg=False):
+    """
+    Chạy hàm ở audio sidecar khi đã cấu hình (audio qua shared memory), sidecar không
+    kết nối được → chạy local nếu AUDIO_SIDECAR_FALLBACK. Sidecar gọi hàm gốc qua __wrapped__.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(source, *args, audio=None, **kwargs):
+            if sidecar_client is not None:
+                try:
+                    if samples_arg:
+                        return sidecar_client.call(op, AudioBuffer(source, 16000), *args, **kwargs)
+                    return sidecar_client.call(op, _get_buffer(source, audio), *args, **kwargs)
+                except (SidecarUnavailable, SidecarError) as e:
+                    if not AUDIO_SIDECAR_FALLBACK:
+                        raise
+                    print(f"⚠️ [SIDECAR] {op} chạy local: {e}")
+            if samples_arg:
+                return fn(source, *args, **kwargs)
+            return fn(source, *args, audio=audio, **kwargs)
+        return wrapper
+    return decorator
+
+if ASR_WARMUP and sidecar_client is None:
+    asr_registry.warm_up(ASR_ENGINE_PRIORITY)
+    # Tier rẻ nhất là đích hạ tier lúc quá tải → load sẵn, tránh load model đúng lúc cao điểm
+    _cheapest = ASR_TIERS[ASR_TIERS_ENABLED[0]]["model"]
+    if ASR_DEGRADE and HAS_FASTER_WHISPER and _cheapest != "base":
+        asr_registry.warm_up(_engine_priority(_cheapest)[:2])
+
+def get_asr_engine_status():
+    """Engine nào đang nằm trong RAM + thời gian load / RSS từng engine"""
+    return asr_registry.status()
+
+def get_sidecar_stats():
+    """Số lần gọi / RTT tới audio sidecar + thống kê model phía sidecar"""
+    if sidecar_client is None:
+        return {"enabled": False}
+    return sidecar_client.stats()
+
+def get_asr_replica_stats():
+    """Utilization từng replica của các model faster-whisper đang nằm trong RAM"""
+    stats = {}
+    for model in dict.fromkeys(["base"] + tier_models()):
+        name = _engine_names(model)[1]
+        if asr_registry.is_loaded(name):
+            stats[model] = asr_registry.get(name).stats()
+    return {"replicas_per_model": ASR_REPLICAS, "models": stats}
+
+def get_asr_batch_stats():
+    """Histogram queue depth / batch size để tune cửa sổ batching"""
+    if not asr_registry.is_loaded("faster-whisper-batched"):
+        return {"enabled": asr_registry.is_registered("faster-whisper-batched"), "resident": False}
+    return {"enabled": True, "resident": True, **asr_registry.get("faster-whisper-batched").stats()}
+
+def load_audio_buffer(audio_path):
+    """Decode file upload đúng 1 lần cho cả request (None nếu lỗi → các hàm tự đọc path)"""
     try:
-        # 'base' model: WER ~10% (tốt hơn 'tiny' 18% WER), vẫn nhanh gấp 2-3x 'small'
-        faster_model = WhisperModel("base", device="cpu", compute_type="int8")
+        return AudioBuffer.from_file(audio_path)
     except Exception as e:
-        print(f"⚠️ Lỗi Faster-Whisper: {e}")
-        HAS_FASTER_WHISPER = False
-else:
-    faster_model = None
-
-def trim_silence(audio, silence_thresh=-40, min_silence_len=500):
+        print(f"⚠️ Lỗi decode audio: {e}")
+        return None
 
-    """Cắt bỏ đoạn im lặng ở đầu và cuối để Whisper xử lý nhanh hơn"""
-    nonsilent_intervals = detect_nonsilent(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
-    if nonsilent_intervals:
-        start_trim = nonsilent_intervals[0][0]
-        end_trim = nonsilent_intervals[-1][1]
-        return audio[start_trim:end_trim]
-    return audio
+def _get_buffer(audio_path, audio=None):
+    """Dùng buffer đã decode sẵn nếu có, ngược lại decode từ path (tương thích cũ)"""
+    if audio is not None:
+        return audio
+    return AudioBuffer.from_file(audio_path)
+
+def _asr_engine_name(model="base"):
+    """Tên engine sẽ dùng (cho cache key) - không trigger load model"""
+    for name in _engine_priority(model):
+        if not asr_registry.failed(name):
+            return name
+    return "whisper"
+
+def _cache_key(kind, audio_path, audio=None, **params):
+    """Key cache = hash nội dung audio + tham số engine (None nếu không tính được hash)"""
+    try:
+        content_hash = audio.content_hash if audio is not None else get_file_hash(audio_path)
+    except Exception as e:
+        print(f"⚠️ [CACHE] Không tính được hash audio: {e}")
+        return None
+    return make_cache_key(kind, content_hash, **params)
 
-def transcribe_audio(audio_path, model_type="base"):
-    """Chuyển đổi âm thanh thành văn bản - Tối ưu tốc độ với Faster-Whisper"""
+def trim_silence(audio, silence_thresh=-40, min_silence_len=500):
+    """Cắt bỏ đoạn im lặng ở đầu và cuối (AudioSegment) - tính bằng numpy, cùng ngữ nghĩa pydub"""
+    samples = AudioBuffer.from_segment(audio, sr=None).samples
+    start_trim, end_trim = trim_offsets_ms(
+        samples, audio.frame_rate, silence_thresh=silence_thresh, min_silence_len=min_silence_len
+    )
+    return audio[start_trim:end_trim]
+
+def _prepare_asr_input(audio_path, audio=None):
+    """
+    Cắt im lặng trên buffer đã decode → (mảng float32 16kHz mono, offset giây đã cắt ở đầu).
+    Whisper nhận numpy trực tiếp, không cần file wav tạm.
+    """
+    buffer = _get_buffer(audio_path, audio)
+    return trim_buffer(buffer, sr=16000)
+
+def _shift_timestamps(result, offset):
+    """Cộng offset cắt im lặng vào segments/words → timestamp theo file gốc"""
+    if not offset:
+        return result
+    for key in ("segments", "words"):
+        for item in result.get(key, []):
+            item["start"] = round(item["start"] + offset, 3)
+            item["end"] = round(item["end"] + offset, 3)
+    return result
+
+def _tier_cache_key(kind, audio_path, audio, tier, **params):
+    """Key cache theo cấu hình của tier (balanced / precise trùng key cũ base+beam 2 / 5)"""
+    config = ASR_TIERS[tier]
+    return _cache_key(
+        kind, audio_path, audio,
+        engine=_asr_engine_name(config["model"]), model=config["model"], beam_size=config["beam_size"], **params
+    )
+
+def _cached_asr(kind, audio_path, audio, tier, default, **params):
+    """
+    Cache của tier xin trước; miss → policy chọn tier (có thể hạ vì hàng đợi dài)
+    rồi thử cache của tier đó → (tier dùng, cache key, kết quả cache | None)
+    """
+    requested = resolve_tier(tier, default)
+    cache_key = _tier_cache_key(kind, audio_path, audio, requested, **params)
+    cached = analysis_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return requested, cache_key, cached
+    _, used = asr_policy.select(requested, default)
+    if used != requested:
+        cache_key = _tier_cache_key(kind, audio_path, audio, used, **params)
+        cached = analysis_cache.get(cache_key) if cache_key else None
+    return used, cache_key, cached
+
+@_via_sidecar("transcribe")
+def transcribe_audio(audio_path, model_type="base", audio=None, tier=None):
+    """Chuyển đổi âm thanh thành văn bản - Tối ưu tốc độ với Faster-Whisper (tier mặc định: balanced)"""
     try:
-        if not os.path.exists(audio_path): return {"text": "File not found"}
-        
-        # 🟢 Tiền xử lý: Cắt im lặng
-        audio = AudioSegment.from_file(audio_path)
-        audio = trim_silence(audio)
-        audio = audio.set_frame_rate(16000).set_channels(1)
+        if audio is None and not os.path.exists(audio_path): return {"text": "File not found"}
+
+        # 🗄️ Cache theo nội dung audio + cấu hình ASR (retry / nộp lại không chạy lại Whisper)
+        tier, cache_key, cached = _cached_asr("transcript", audio_path, audio, tier, "balanced")
+        if cached is not None:
+            return {**cached, "asr_tier": tier}
+        config = ASR_TIERS[tier]
         
-        processed_path = audio_path + "_clean.wav"
-        audio.export(processed_path, format="wav")
-
-        # 🟢 Sử dụng Faster-Whisper nếu khả dụng (Nhanh gấp 5-10 lần)
-        if HAS_FASTER_WHISPER:
-            # vad_filter=True: Tự động lọc bỏ các đoạn không có tiếng người
-            # no_speech_threshold: Tăng lên 0.6 để tránh nhận diện nhầm tiếng ồn thành chữ
-            segments, info = faster_model.transcribe(
-                processed_path,
-                beam_size=2,           # beam=2: giữ ~85% accuracy của beam=5, nhanh gấp đôi
-                language="en",
-                vad_filter=True,
-                no_speech_threshold=0.6,
-                condition_on_previous_text=False  # Giảm overhead giữa các đoạn
-            )
+        # 🟢 Tiền xử lý: Cắt im lặng (trên buffer đã decode)
+        processed_audio, _ = _prepare_asr_input(audio_path, audio)
+
+        # 🟢 Sử dụng Faster-Whisper nếu khả dụng (Nhanh gấp 5-10 lần) - engine load lazy qua registry
+        engine_name, engine = _resolve_asr(config["model"])
+        if engine_name != "whisper":
+            if engine_name.startswith("faster-whisper-batched"):
+                # Decode chung batch với các request đồng thời khác (VAD Silero chạy ở thread này)
+                segments = engine.transcribe(processed_audio, language="en", beam_size=config["beam_size"])
+            else:
+                # vad_filter=True: Tự động lọc bỏ các đoạn không có tiếng người
+                # no_speech_threshold: Tăng lên 0.6 để tránh nhận diện nhầm tiếng ồn thành chữ
+                with asr_policy.slot(config["model"]):
+                    segments, info = engine.transcribe(
+                        processed_audio,
+                        beam_size=config["beam_size"],  # balanced: beam=2 giữ ~85% accuracy của beam=5, nhanh gấp đôi
+                        language="en",
+                        vad_filter=True,
+                        no_speech_threshold=0.6,
+                        condition_on_previous_text=False  # Giảm overhead giữa các đoạn
+                    )
+                    segments = list(segments)  # generator: decode thật sự chạy khi duyệt
             transcript = "".join([segment.text for segment in segments]).strip()
             
             # 🛡️ HALLUCINATION FILTER: Loại bỏ các mẫu Whisper hay bị lỗi khi im lặng
@@ -90,106 +266,122 @@ def transcribe_audio(audio_path, model_type="base"):
             if any(p.lower() in transcript.lower() for p in bad_patterns):
                 transcript = ""
                 
-            result = {"text": transcript}
+            result = {"text": transcript, "asr_tier": tier}
         else:
             # Fallback về Whisper gốc
-            result = whisper_model.transcribe(processed_path, language="en", fp16=False)
-        
-        if os.path.exists(processed_path): 
-            try: os.remove(processed_path)
-            except: pass
-            
+            with asr_policy.slot("base"):
+                result = engine.transcribe(processed_audio, language="en", fp16=False)
+            result["asr_tier"] = tier
+
+        if cache_key and (result.get("text") or "").strip():
+            analysis_cache.set(cache_key, result)
         return result
     except Exception as e:
         print(f"⚠️ Lỗi Transcribe: {e}")
         return {"text": "", "error": str(e)}
 
 
-def transcribe_audio_detailed(audio_path, model_type="base"):
-    """Transcribe + word-level timestamps (nếu engine hỗ trợ)."""
-    try:
-        if not os.path.exists(audio_path):
-            return {"text": "", "segments": [], "words": [], "error": "File not found"}
-
-        audio = AudioSegment.from_file(audio_path)
-        audio = trim_silence(audio)
-        audio = audio.set_frame_rate(16000).set_channels(1)
-
-        processed_path = audio_path + "_detail_clean.wav"
-        audio.export(processed_path, format="wav")
+def _decode_detailed(processed_audio, tier="precise"):
+    """Decode mảng float32 16kHz → {text, segments, words} (beam của tier + word timestamps)"""
+    result = {"text": "", "segments": [], "words": []}
+    config = ASR_TIERS[tier]
 
-        result = {"text": "", "segments": [], "words": []}
-
-        if HAS_FASTER_WHISPER and faster_model is not None:
-            segments, info = faster_model.transcribe(
-                processed_path,
-                beam_size=5,
-                language="en",
-                vad_filter=True,
-                no_speech_threshold=0.6,
-                word_timestamps=True
+    engine_name, engine = _resolve_asr(config["model"])
+    if engine_name != "whisper":
+        if engine_name.startswith("faster-whisper-batched"):
+            segments = engine.transcribe(
+                processed_audio, language="en", beam_size=config["beam_size"],
+                word_timestamps=True, without_timestamps=False
             )
-
-            all_text = []
+        else:
+            with asr_policy.slot(config["model"]):
+                segments, info = engine.transcribe(
+                    processed_audio,
+                    beam_size=config["beam_size"],
+                    language="en",
+                    vad_filter=True,
+                    no_speech_threshold=0.6,
+                    word_timestamps=True
+                )
+                segments = list(segments)  # generator: decode thật sự chạy khi duyệt
+
+        all_text = []
+        all_segments = []
+        all_words = []
+
+        for seg in segments:
+            seg_text = (seg.text or "").strip()
+            if seg_text:
+                all_text.append(seg_text)
+
+            all_segments.append({
+                "start": float(getattr(seg, "start", 0.0) or 0.0),
+                "end": float(getattr(seg, "end", 0.0) or 0.0),
+                "text": seg_text
+            })
+
+            for w in (getattr(seg, "words", None) or []):
+                word_text = (getattr(w, "word", "") or "").strip()
+                if word_text:
+                    all_words.append({
+                        "word": word_text,
+                        "start": float(getattr(w, "start", 0.0) or 0.0),
+                        "end": float(getattr(w, "end", 0.0) or 0.0),
+                        "confidence": float(getattr(w, "probability", 0.0) or 0.0)
+                    })
+
+        transcript = " ".join(all_text).strip()
+
+        bad_patterns = [
+            "Thank you for watching", "Subtitles by", "Please subscribe",
+            "Thanks for watching", "translated by", "Re-edited by"
+        ]
+        if any(p.lower() in transcript.lower() for p in bad_patterns):
+            transcript = ""
             all_segments = []
             all_words = []
 
-            for seg in segments:
-                seg_text = (seg.text or "").strip()
-                if seg_text:
-                    all_text.append(seg_text)
-
-                all_segments.append({
-                    "start": float(getattr(seg, "start", 0.0) or 0.0),
-                    "end": float(getattr(seg, "end", 0.0) or 0.0),
-                    "text": seg_text
-                })
-
-                for w in (getattr(seg, "words", None) or []):
-                    word_text = (getattr(w, "word", "") or "").strip()
-                    if word_text:
-                        all_words.append({
-                            "word": word_text,
-                            "start": float(getattr(w, "start", 0.0) or 0.0),
-                            "end": float(getattr(w, "end", 0.0) or 0.0),
-                            "confidence": float(getattr(w, "probability", 0.0) or 0.0)
-                        })
-
-            transcript = " ".join(all_text).strip()
+        result = {
+            "text": transcript,
+            "segments": all_segments,
+            "words": all_words
+        }
+    else:
+        with asr_policy.slot("base"):
+            base_res = engine.transcribe(processed_audio, language="en", fp16=False)
+        text = (base_res.get("text", "") or "").strip() if isinstance(base_res, dict) else ""
+        segs = base_res.get("segments", []) if isinstance(base_res, dict) else []
+        norm_segments = []
+        for s in segs:
+            norm_segments.append({
+                "start": float(s.get("start", 0.0) or 0.0),
+                "end": float(s.get("end", 0.0) or 0.0),
+                "text": (s.get("text", "") or "").strip()
+            })
+        result = {"text": text, "segments": norm_segments, "words": []}
+    result["asr_tier"] = tier
+    return result
+
+
+@_via_sidecar("transcribe_detailed")
+def transcribe_audio_detailed(audio_path, model_type="base", audio=None, tier=None):
+    """Transcribe + word-level timestamps (nếu engine hỗ trợ) - tier mặc định: precise."""
+    try:
+        if audio is None and not os.path.exists(audio_path):
+            return {"text": "", "segments": [], "words": [], "error": "File not found"}
 
-            bad_patterns = [
-                "Thank you for watching", "Subtitles by", "Please subscribe",
-                "Thanks for watching", "translated by", "Re-edited by"
-            ]
-            if any(p.lower() in transcript.lower() for p in bad_patterns):
-                transcript = ""
-                all_segments = []
-                all_words = []
-
-            result = {
-                "text": transcript,
-                "segments": all_segments,
-                "words": all_words
-            }
-        else:
-            base_res = whisper_model.transcribe(processed_path, language="en", fp16=False)
-            text = (base_res.get("text", "") or "").strip() if isinstance(base_res, dict) else ""
-            segs = base_res.get("segments", []) if isinstance(base_res, dict) else []
-            norm_segments = []
-            for s in segs:
-                norm_segments.append({
-                    "start": float(s.get("start", 0.0) or 0.0),
-                    "end": float(s.get("end", 0.0) or 0.0),
-                    "text": (s.get("text", "") or "").strip()
-                })
-            result = {"text": text, "segments": norm_segments, "words": []}
-
-        if os.path.exists(processed_path):
-            try:
-                os.remove(processed_path)
-            except Exception:
-                pass
+        tier, cache_key, cached = _cached_asr(
+            "transcript_detailed", audio_path, audio, tier, "precise", word_timestamps=True, timeline="original"
+        )
+        if cached is not None:
+            return {**cached, "asr_tier": tier}
 
+        processed_audio, trim_offset = _prepare_asr_input(audio_path, audio)
+
+        result = _shift_timestamps(_decode_detailed(processed_audio, tier), trim_offset)
+
+        if cache_key and result["text"]:
+            analysis_cache.set(cache_key, result)
         return result
     except Exception as e:
         print(f"⚠️ Lỗi Transcribe Detailed: {e}")
@@ -197,6 +389,17 @@ def transcribe_audio_detailed(audio_path, model_type="base"):
 
 
 
+@_via_sidecar("transcribe_samples", samples_arg=True)
+def transcribe_samples(samples, tier=None):
+    """Transcribe trực tiếp mảng float32 16kHz (đoạn đã được VAD commit - live session)"""
+    try:
+        _, tier = asr_policy.select(tier, "precise")
+        return _decode_detailed(samples, tier)
+    except Exception as e:
+        print(f"⚠️ Lỗi Transcribe Samples: {e}")
+        return {"text": "", "segments": [], "words": [], "error": str(e)}
+
+
 def get_file_hash(file_path):
     """Tính mã băm SHA-256 của file để làm key cache"""
     sha256_hash = hashlib.sha256()
@@ -205,61 +408,34 @@ def get_file_hash(file_path):
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
 
-def extract_pitch(audio_path):
-    """Trích xuất cao độ (Pitch) với Caching MongoDB"""
+@_via_sidecar("pitch")
+def extract_pitch(audio_path, audio=None, engine=None):
+    """Trích xuất cao độ (Pitch) với artifact cache (LRU + Mongo/SQLite)"""
     try:
-        if not os.path.exists(audio_path): return []
-        
-        # 1. Kiểm tra Cache
-        file_id = get_file_hash(audio_path)
-        if pitch_cache is not None:
-            cached = pitch_cache.find_one({"_id": file_id})
-            if cached:
-                # print("🚀 Pitch Cache Hit!")
-                return cached["pitch_data"]
-
-        # 2. Xử lý Audio (Fix MPEG header issues bằng cách dùng pydub)
-        # print("⚙️ Processing Audio for Pitch...")
-        audio = AudioSegment.from_file(audio_path)
-        # Convert to mono and 22050Hz for standard librosa processing
-        audio = audio.set_channels(1).set_frame_rate(22050)
+        if audio is None and not os.path.exists(audio_path): return []
+        engine = resolve_engine(engine)
         
-        # Chuyển sang numpy array
-        y = np.array(audio.get_array_of_samples(), dtype=np.float32) / 32768.0
-        sr = audio.frame_rate
-        
-        # 3. Trích xuất Pitch - Tối ưu: Downsample xuống 8kHz & hop_length lớn hơn → nhanh ~4x
-        y_fast = librosa.resample(y, orig_sr=sr, target_sr=8000)
-        sr_fast = 8000
-        f0, voiced_flag, voiced_probs = librosa.pyin(
-            y_fast,
-            fmin=librosa.note_to_hz('C2'),
-            fmax=librosa.note_to_hz('C7'),
-            sr=sr_fast,
-            hop_length=sr_fast // 50  # 50 điểm/giây là đủ cho visualization
+        # 1. Kiểm tra Cache (hash nội dung + engine/sr/hop + chỉ đoạn có tiếng hay cả bài)
+        cache_key = _cache_key(
+            "pitch_curve", audio_path, audio,
+            engine=engine, sr=PITCH_SR, hop_length=PITCH_HOP_LENGTH, regions=pitch_region_mode(),
+            max_seconds=MAX_ANALYSIS_SECONDS
         )
+        cached = analysis_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached
 
-        f0_clean = f0[~np.isnan(f0)]
-        if len(f0_clean) == 0: return []
-
+        # 2. Lấy buffer đã decode (pydub xử lý được MPEG header lỗi)
+        buffer = _get_buffer(audio_path, audio)
+        
+        # 3. Pitch track dùng chung với extract_audio_features_pro (chỉ 1 lần pYIN / bản ghi)
         # Giảm xuống 50 điểm (đủ cho chart Frontend, không cần 100)
-        if len(f0_clean) > 50:
-            indices = np.linspace(0, len(f0_clean) - 1, 50).astype(int)
-            f0_final = f0_clean[indices]
-        else:
-            f0_final = f0_clean
-
-        result = [float(round(p, 2)) for p in f0_final]
+        result = analyze_pitch(buffer, engine=engine).chart_curve()
+        if not result: return []
 
-        # 4. Lưu Cache
-        if pitch_cache is not None:
-            try:
-                pitch_cache.update_one(
-                    {"_id": file_id},
-                    {"$set": {"pitch_data": result, "timestamp": os.getpid()}},
-                    upsert=True
-                )
-            except: pass
+        # 4. Lưu Cache (write-behind, không chặn request)
+        if cache_key:
+            analysis_cache.set(cache_key, result)
 
         return result
         
@@ -267,64 +443,29 @@ def extract_pitch(audio_path):
         print(f"⚠️ Lỗi trích xuất Pitch: {e}")
         return []
 
-def extract_audio_features_pro(audio_path):
+@_via_sidecar("features")
+def extract_audio_features_pro(audio_path, audio=None, pitch_engine=None):
     """Trích xuất 44 đặc trưng âm học (Acoustic Features) cho mô hình XGBoost Pro"""
     try:
-        if not os.path.exists(audio_path): return None
-        
-        # Load audio (16kHz mono là chuẩn cho speech features)
-        y, sr = librosa.load(audio_path, sr=16000)
-        
-        # 1. MFCC + Delta + Delta-Delta (Đo lường sự biến thiên âm sắc)
-        # 13 mfcc + 13 delta + 13 delta2 = 39 features
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        mfcc_delta = librosa.feature.delta(mfccs)
-        mfcc_delta2 = librosa.feature.delta(mfccs, order=2)
-        
-        # 2. Pitch (pYIN) & Jitter (Độ ổn định tần số)
-        # Sử dụng fmin, fmax chuẩn cho giọng người
-        f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=65, fmax=2093, sr=sr)
-        f0_clean = f0[~np.isnan(f0)]
-        pitch_mean = np.mean(f0_clean) if len(f0_clean) > 0 else 0
-        jitter = np.std(f0_clean) / np.mean(f0_clean) if len(f0_clean) > 0 else 0
-        
-        # 3. Energy & Shimmer (Độ ổn định biên độ)
-        rms = librosa.feature.rms(y=y)[0]
-        energy_mean = np.mean(rms)
-        shimmer = np.std(rms) / np.mean(rms) if np.mean(rms) > 0 else 0
-        
-        # 4. Fluency (Tỷ lệ im lặng)
-        # top_db=30 là ngưỡng chuẩn để phân biệt tiếng nói và nhiễu nền
-        non_silent = librosa.effects.split(y, top_db=30)
-        total_dur = len(y) / sr
-        speech_dur = sum([(e - s) / sr for s, e in non_silent])
-        silence_ratio = (total_dur - speech_dur) / total_dur if total_dur > 0 else 0
-        
-        # Gộp tất cả vào dictionary logic
-        feat = {
-            "pitch_mean": pitch_mean, 
-            "jitter": jitter,
-            "energy_mean": energy_mean, 
-            "shimmer": shimmer,
-            "silence_ratio": silence_ratio
-        }
-        
-        # Thêm 13 hệ số MFCC, Delta, Delta2
-        for i in range(13):
-            feat[f"mfcc_{i}"] = np.mean(mfccs[i])
-            feat[f"delta_{i}"] = np.mean(mfcc_delta[i])
-            feat[f"delta2_{i}"] = np.mean(mfcc_delta2[i])
-            
+        if audio is None and not os.path.exists(audio_path): return None
+
+        buffer = _get_buffer(audio_path, audio)
+
+        # 1 lần framing/STFT (16kHz mono) cho cả MFCC + Delta + Delta² (39), Energy/Shimmer, Silence Ratio
+        # + pitch_mean/jitter từ pitch track dùng chung với extract_pitch
+        # (qua artifact cache: nộp lại cùng file không tính lại)
+        feat = extract_speaking_features_cached(buffer, pitch_engine=pitch_engine)
         return feat
     except Exception as e:
         print(f"⚠️ Error in extract_audio_features_pro: {e}")
         return None
 
 
-def get_audio_duration(audio_path):
-    """Lấy độ dài file audio (giây) dùng Pydub"""
+def get_audio_duration(audio_path, audio=None):
+    """Lấy độ dài file audio (giây) - dùng buffer đã decode nếu có"""
     try:
-        audio = AudioSegment.from_file(audio_path)
-        return len(audio) / 1000.0
+        if audio is not None:
+            return audio.duration
+        return AudioBuffer.from_file(audio_path).duration
     except:
         return 0
@@ -0,0 +1,260 @@
+"""
+🛰️ AUDIO SIDECAR - 1 process giữ model ASR / audio-analysis cho mọi web worker
+===============================================================================
+Mỗi gunicorn worker import app.py đều tự load faster-whisper (+ Whisper torch fallback),
+numba JIT của pYIN... → thêm worker là nhân RAM. Khi đặt AUDIO_SIDECAR_SOCKET:
+- Sidecar (scripts/run_audio_sidecar.py) là process duy nhất load model, phục vụ
+  transcribe / pitch / features qua Unix socket (multiprocessing.connection)
+- Web worker thành thin client: audio 16kHz đưa qua shared_memory (cùng block với
+  process pool), socket chỉ chở tên block + tham số + kết quả JSON-like
+- Request của mọi worker vào chung 1 ASR batcher / replica pool / ASR policy
+- Sidecar không kết nối được → tạm chạy local (AUDIO_SIDECAR_FALLBACK=1, mặc định)
+Message trên socket là pickle → bắt buộc AUDIO_SIDECAR_AUTHKEY (cùng giá trị ở sidecar và
+web worker, vd. đặt trong .env); socket được tạo với quyền 0600 ngay từ lúc bind.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AUDIO_SIDECAR_SOCKET = os.getenv("AUDIO_SIDECAR_SOCKET", "").strip()
+AUDIO_SIDECAR_AUTHKEY = os.getenv("AUDIO_SIDECAR_AUTHKEY", "").encode() or None
+AUDIO_SIDECAR_FALLBACK = os.getenv("AUDIO_SIDECAR_FALLBACK", "1").strip().lower() not in ("0", "false", "no", "off")
+AUDIO_SIDECAR_TIMEOUT = float(os.getenv("AUDIO_SIDECAR_TIMEOUT", "120"))
+# Buffer gần nhất giữ lại ở sidecar → pitch / features / transcript của cùng 1 bài dùng chung memo
+AUDIO_SIDECAR_BUFFERS = int(os.getenv("AUDIO_SIDECAR_BUFFERS", "16"))
+SIDECAR_SR = 16000
+SIDECAR_RETRY_SECONDS = 5.0
+
+# Process sidecar cũng đọc cùng .env → không được tự làm client của chính nó
+_server_mode = False
+
+
+class SidecarUnavailable(Exception):
+    """Không gửi được request tới sidecar (chưa chạy / socket lỗi)"""
+
+
+class SidecarError(Exception):
+    """Sidecar nhận request nhưng hàm xử lý báo lỗi"""
+
+
+# ==========================================
+# CLIENT (web worker)
+# ==========================================
+class SidecarClient:
+    def __init__(self, address=AUDIO_SIDECAR_SOCKET, authkey=AUDIO_SIDECAR_AUTHKEY, timeout=AUDIO_SIDECAR_TIMEOUT):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()  # 1 kết nối / thread → các request song song không chờ nhau
+        self._down_until = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": {}, "errors": 0, "unavailable": 0, "rtt_seconds": 0.0}
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            from multiprocessing.connection import Client
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _roundtrip(self, message):
+        if time.monotonic() < self._down_until:
+            raise SidecarUnavailable("sidecar vừa lỗi kết nối, đang chờ thử lại")
+        for attempt in range(2):  # kết nối cũ có thể đã đứt (sidecar restart) → thử lại 1 lần
+            try:
+                conn = self._connection()
+                conn.send(message)
+                if not conn.poll(self.timeout):
+                    self._drop_connection()
+                    raise SidecarUnavailable(f"sidecar không trả lời sau {self.timeout:.0f}s")
+                return conn.recv()
+            except (OSError, EOFError, AuthenticationError) as e:
+                self._drop_connection()
+                if attempt:
+                    self._down_until = time.monotonic() + SIDECAR_RETRY_SECONDS
+                    raise SidecarUnavailable(str(e))
+
+    def call(self, op, audio=None, *args, **kwargs):
+        """Gửi 1 op (audio: AudioBuffer hoặc None) → kết quả của hàm tương ứng ở sidecar"""
+        message = {"op": op, "args": args, "kwargs": kwargs}
+        if audio is not None:
+            from services.audio_process_pool import share_audio
+            shared = share_audio(audio, SIDECAR_SR)
+            message.update(shm=shared.name, n=shared.n, sr=SIDECAR_SR, content_hash=audio.content_hash)
+
+        t0 = time.perf_counter()
+        try:
+            reply = self._roundtrip(message)
+        except SidecarUnavailable:
+            with self._stats_lock:
+                self._stats["unavailable"] += 1
+            raise
+        elapsed = time.perf_counter() - t0
+        with self._stats_lock:
+            self._stats["calls"][op] = self._stats["calls"].get(op, 0) + 1
+            self._stats["rtt_seconds"] += elapsed
+            if not reply.get("ok"):
+                self._stats["errors"] += 1
+        if not reply.get("ok"):
+            raise SidecarError(reply.get("error", "unknown"))
+        return reply["result"]
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {**self._stats, "calls": dict(self._stats["calls"])}
+        total = sum(stats["calls"].values())
+        stats["avg_rtt_ms"] = round(stats.pop("rtt_seconds") / total * 1000, 1) if total else 0.0
+        try:
+            stats["remote"] = self.call("stats")
+        except Exception as e:
+            stats["remote"] = {"error": str(e)}
+        return {"enabled": True, "socket": self.address, **stats}
+
+
+def make_client():
+    """SidecarClient nếu AUDIO_SIDECAR_SOCKET được đặt (và đây không phải chính sidecar)"""
+    if not AUDIO_SIDECAR_SOCKET or _server_mode:
+        return None
+    if not AUDIO_SIDECAR_AUTHKEY:
+        print("⚠️ [SIDECAR] Có AUDIO_SIDECAR_SOCKET nhưng thiếu AUDIO_SIDECAR_AUTHKEY → chạy model local")
+        return None
+    print(f"🛰️ [SIDECAR] Web worker dùng audio sidecar tại {AUDIO_SIDECAR_SOCKET} (model không load ở đây)")
+    return SidecarClient()
+
+
+# ==========================================
+# SERVER (sidecar process)
+# ==========================================
+class _BufferCache:
+    """LRU AudioBuffer theo content_hash (copy từ shared memory của client)"""
+
+    def __init__(self, capacity=AUDIO_SIDECAR_BUFFERS):
+        self.capacity = max(1, capacity)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, message):
+        from multiprocessing import resource_tracker, shared_memory
+        from services.audio_buffer import AudioBuffer
+
+        key = message.get("content_hash") or message["shm"]
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+
+        shm = shared_memory.SharedMemory(name=message["shm"])
+        try:
+            # Block thuộc về client (client unlink) → bỏ đăng ký khỏi resource tracker của sidecar
+            resource_tracker.unregister(shm._name, "shared_memory")
+            samples = np.array(np.ndarray((message["n"],), dtype=np.float32, buffer=shm.buf))
+        finally:
+            shm.close()
+        audio = AudioBuffer(samples, message["sr"], content_hash=message.get("content_hash"))
+
+        with self._lock:
+            audio = self._items.setdefault(key, audio)
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+        return audio
+
+
+def _server_ops():
+    """op → hàm(audio, *args, **kwargs) chạy local trong sidecar (bỏ qua lớp client)"""
+    import services.audio_service as audio_service
+    from services.pitch_service import get_pitch_stats
+
+    def _local(fn):
+        return getattr(fn, "__wrapped__", fn)
+
+    def _stats(audio):
+        return {
+            "pid": os.getpid(),
+            "asr_engines": audio_service.get_asr_engine_status(),
+            "asr_batching": audio_service.get_asr_batch_stats(),
+            "asr_replicas": audio_service.get_asr_replica_stats(),
+            "pitch": get_pitch_stats()
+        }
+
+    return {
+        "transcribe": lambda audio, *a, **k: _local(audio_service.transcribe_audio)(None, *a, audio=audio, **k),
+        "transcribe_detailed": lambda audio, *a, **k: _local(audio_service.transcribe_audio_detailed)(None, *a, audio=audio, **k),
+        "transcribe_samples": lambda audio, *a, **k: _local(audio_service.transcribe_samples)(audio.samples, *a, **k),
+        "pitch": lambda audio, *a, **k: _local(audio_service.extract_pitch)(None, *a, audio=audio, **k),
+        "features": lambda audio, *a, **k: _local(audio_service.extract_audio_features_pro)(None, *a, audio=audio, **k),
+        "stats": _stats,
+        "ping": lambda audio: {"pid": os.getpid()}
+    }
+
+
+def _serve_connection(conn, ops, buffers):
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                audio = buffers.get(message) if message.get("shm") else None
+                result = ops[message["op"]](audio, *message.get("args", ()), **message.get("kwargs", {}))
+                reply = {"ok": True, "result": result}
+            except Exception as e:
+                print(f"⚠️ [SIDECAR] Op '{message.get('op')}' lỗi: {e}")
+                reply = {"ok": False, "error": str(e)}
+            try:
+                conn.send(reply)
+            except (EOFError, OSError):
+                return
+
+
+def serve(address=AUDIO_SIDECAR_SOCKET, authkey=AUDIO_SIDECAR_AUTHKEY, ops=None, ready=None):
+    """Chạy sidecar (chặn): load model 1 lần, mỗi kết nối client 1 thread (ops: thay bảng op, dùng cho test)"""
+    global _server_mode
+    _server_mode = True
+    if not address:
+        raise ValueError("Cần AUDIO_SIDECAR_SOCKET (đường dẫn Unix socket)")
+    if not authkey:
+        raise ValueError("Cần AUDIO_SIDECAR_AUTHKEY: sidecar unpickle mọi message nhận được")
+    from multiprocessing.connection import Listener
+
+    ops = ops or _server_ops()  # import audio_service → ASR warm-up chạy ở đây, không ở web worker
+    buffers = _BufferCache()
+    if os.path.exists(address):
+        os.unlink(address)  # socket cũ của lần chạy trước
+    old_umask = os.umask(0o177)  # socket sinh ra đã là 0600, không có khe hở giữa bind và chmod
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(old_umask)
+    print(f"🛰️ [SIDECAR] Đang phục vụ tại {address} (pid {os.getpid()})")
+    if ready is not None:
+        ready.set()
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:  # vd. client sai authkey (AuthenticationError)
+                print(f"⚠️ [SIDECAR] Lỗi accept: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, ops, buffers), name="sidecar-conn", daemon=True).start()
+    finally:
+        listener.close()
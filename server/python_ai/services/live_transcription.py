@@ -0,0 +1,383 @@
+"""
+🎙️ LIVE TRANSCRIPTION - Nhận audio trong lúc học viên đang nói
+===============================================================
+Thay vì đợi upload xong cả file webm rồi mới bắt đầu, client gửi từng khúc
+PCM16 (mono, 16kHz, little-endian) qua chunked POST:
+    POST /api/speaking/live/start           → session_id
+    POST /api/speaking/live/<id>/chunk      → body = bytes PCM16, trả transcript tạm
+    POST /api/speaking/live/<id>/end        → chấm điểm từ các đoạn đã transcribe
+Server chạy VAD năng lượng theo frame 30ms; khi gặp khoảng lặng đủ dài (hoặc đoạn
+nói quá dài) thì "commit" đoạn đó và transcribe ngay ở thread nền. Lúc "end" chỉ
+còn phải xử lý đoạn cuối cùng → bài Part 2 dài 1-2 phút gần như không phải đợi.
+
+Nhiều gunicorn worker: phiên (buffer + future transcribe) nằm trong RAM của worker đã
+mở nó, còn chunk / end có thể rơi vào worker khác. Khi đặt LIVE_SESSION_ROUTE_DIR
+(gunicorn.conf.py tự đặt khi workers > 1) mỗi worker mở 1 Unix socket trong thư mục đó,
+session_id mang tên worker sở hữu → worker nhận nhầm chuyển tiếp chunk / end sang đúng
+worker. Worker bị restart (max_requests, crash) thì các phiên của nó mất → 404.
+"""
+
+import atexit
+import os
+import threading
+import time
+import uuid
+from multiprocessing import AuthenticationError
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LIVE_SR = 16000
+LIVE_FRAME_MS = 30
+LIVE_SILENCE_DBFS = float(os.getenv("LIVE_SILENCE_DBFS", "-40"))
+LIVE_COMMIT_SILENCE_MS = int(os.getenv("LIVE_COMMIT_SILENCE_MS", "600"))
+LIVE_MAX_SEGMENT_SECONDS = float(os.getenv("LIVE_MAX_SEGMENT_SECONDS", "25"))
+LIVE_MAX_SECONDS = float(os.getenv("LIVE_MAX_SECONDS", "300"))
+LIVE_SESSION_TTL = int(os.getenv("LIVE_SESSION_TTL", "300"))
+# Định tuyến phiên giữa các worker (để trống = 1 process, như cũ)
+LIVE_SESSION_ROUTE_DIR = os.getenv("LIVE_SESSION_ROUTE_DIR", "").strip()
+LIVE_SESSION_AUTHKEY = os.getenv("LIVE_SESSION_AUTHKEY", "").encode()
+LIVE_SESSION_ROUTE_TIMEOUT = float(os.getenv("LIVE_SESSION_ROUTE_TIMEOUT", "120"))
+# Giữ thêm chút audio trước/sau đoạn nói để Whisper không mất phụ âm đầu/cuối
+LIVE_PAD_MS = 200
+
+
+def pcm16_to_float(data):
+    """bytes PCM16 little-endian (số byte chẵn) → float32 [-1, 1]"""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class LiveSession:
+    """
+    1 phiên nói trực tiếp: buffer audio tăng dần + VAD + các đoạn đã commit.
+    transcribe_fn(samples) → {"text", "segments", "words"} (thời gian tính từ đầu đoạn)
+    """
+
+    def __init__(self, session_id, transcribe_fn, executor, meta=None, sr=LIVE_SR):
+        self.session_id = session_id
+        self.transcribe_fn = transcribe_fn
+        self.executor = executor
+        self.meta = meta or {}
+        self.sr = sr
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+
+        self._lock = threading.Lock()
+        self._samples = np.zeros(sr * 10, dtype=np.float32)
+        self._length = 0
+        self._carry = b""  # byte lẻ khi khúc bị cắt giữa 1 sample
+
+        # Trạng thái VAD
+        self._frame = int(sr * LIVE_FRAME_MS / 1000)
+        self._vad_pos = 0
+        self._speech_start = None
+        self._silence_frames = 0
+        self._commit_silence_frames = max(1, LIVE_COMMIT_SILENCE_MS // LIVE_FRAME_MS)
+        self._threshold = 10.0 ** (LIVE_SILENCE_DBFS / 20.0)
+
+        self._segments = []  # [(start, end, future)]
+        self.finished = False
+
+    @property
+    def duration(self):
+        return self._length / float(self.sr)
+
+    def _append(self, samples):
+        needed = self._length + len(samples)
+        if needed > len(self._samples):
+            grown = np.zeros(max(needed, len(self._samples) * 2), dtype=np.float32)
+            grown[:self._length] = self._samples[:self._length]
+            self._samples = grown
+        self._samples[self._length:needed] = samples
+        self._length = needed
+
+    def _commit(self, start, end):
+        pad = int(self.sr * LIVE_PAD_MS / 1000)
+        start, end = max(0, start - pad), min(self._length, end + pad)
+        if end <= start:
+            return
+        clip = self._samples[start:end].copy()
+        future = self.executor.submit(self.transcribe_fn, clip)
+        self._segments.append((start, end, future))
+
+    def _run_vad(self):
+        """Duyệt các frame mới: mở đoạn khi có tiếng, commit khi lặng đủ lâu / đoạn quá dài"""
+        max_len = int(LIVE_MAX_SEGMENT_SECONDS * self.sr)
+        while self._vad_pos + self._frame <= self._length:
+            frame = self._samples[self._vad_pos:self._vad_pos + self._frame]
+            voiced = np.sqrt(np.mean(frame ** 2)) > self._threshold
+            frame_end = self._vad_pos + self._frame
+
+            if voiced:
+                if self._speech_start is None:
+                    self._speech_start = self._vad_pos
+                self._silence_frames = 0
+            elif self._speech_start is not None:
+                self._silence_frames += 1
+                if self._silence_frames >= self._commit_silence_frames:
+                    speech_end = frame_end - self._silence_frames * self._frame
+                    self._commit(self._speech_start, speech_end)
+                    self._speech_start = None
+                    self._silence_frames = 0
+
+            if self._speech_start is not None and frame_end - self._speech_start >= max_len:
+                self._commit(self._speech_start, frame_end)
+                self._speech_start = None
+                self._silence_frames = 0
+
+            self._vad_pos = frame_end
+
+    def append_pcm16(self, data):
+        """Nhận 1 khúc PCM16 → chạy VAD → trả trạng thái transcript tạm"""
+        with self._lock:
+            if self.finished:
+                raise RuntimeError("Session đã kết thúc")
+            data = self._carry + bytes(data)
+            usable = len(data) - len(data) % 2
+            self._carry = data[usable:]
+            samples = pcm16_to_float(data[:usable])
+            room = int(LIVE_MAX_SECONDS * self.sr) - self._length
+            if room <= 0:
+                raise ValueError(f"Vượt quá {LIVE_MAX_SECONDS:.0f}s cho 1 phiên")
+            self._append(samples[:room])
+            self._run_vad()
+            self.last_activity = time.time()
+        return self.partial()
+
+    def partial(self):
+        """Transcript các đoạn đã xong (theo thứ tự, dừng ở đoạn đầu tiên còn đang chạy)"""
+        with self._lock:
+            segments = list(self._segments)
+        texts, done = [], 0
+        for _, _, future in segments:
+            if not future.done():
+                break
+            try:
+                text = (future.result() or {}).get("text", "")
+            except Exception:
+                text = ""
+            if text:
+                texts.append(text)
+            done += 1
+        return {
+            "session_id": self.session_id,
+            "partial_transcript": " ".join(texts).strip(),
+            "segments_done": done,
+            "segments_pending": len(segments) - done,
+            "duration": round(self.duration, 2)
+        }
+
+    def finish(self, timeout=None):
+        """Commit đoạn cuối, đợi mọi đoạn transcribe xong → (transcript gộp, samples đầy đủ)"""
+        with self._lock:
+            if not self.finished:
+                self.finished = True
+                self._run_vad()
+                if self._speech_start is not None:
+                    self._commit(self._speech_start, self._length)
+                    self._speech_start = None
+            segments = list(self._segments)
+            samples = self._samples[:self._length].copy()
+
+        texts, all_segments, all_words, tiers = [], [], [], set()
+        for start, _, future in segments:
+            try:
+                res = future.result(timeout=timeout) or {}
+            except Exception as e:
+                print(f"⚠️ [LIVE] Lỗi transcribe 1 đoạn: {e}")
+                continue
+            offset = start / float(self.sr)
+            if res.get("text"):
+                texts.append(res["text"])
+            if res.get("asr_tier"):
+                tiers.add(res["asr_tier"])
+            for seg in res.get("segments", []):
+                all_segments.append({**seg, "start": round(seg["start"] + offset, 3), "end": round(seg["end"] + offset, 3)})
+            for w in res.get("words", []):
+                all_words.append({**w, "start": round(w["start"] + offset, 3), "end": round(w["end"] + offset, 3)})
+
+        transcript = {"text": " ".join(texts).strip(), "segments": all_segments, "words": all_words}
+        if tiers:
+            # Các đoạn có thể bị ASR policy hạ tier khác nhau lúc quá tải
+            transcript["asr_tier"] = tiers.pop() if len(tiers) == 1 else "mixed"
+        return transcript, samples
+
+
+class RemoteLiveSession:
+    """Proxy tới LiveSession nằm ở worker khác (cùng API mà endpoint live dùng)"""
+
+    def __init__(self, manager, owner, session_id, meta):
+        self.manager = manager
+        self.owner = owner
+        self.session_id = session_id
+        self.meta = meta
+
+    def _call(self, op, *args):
+        reply = self.manager._remote_call(self.owner, op, self.session_id, *args)
+        if reply is None or reply.get("missing"):
+            raise RuntimeError("Session không còn ở worker sở hữu")
+        if not reply.get("ok"):
+            # Giữ loại lỗi → endpoint vẫn trả 413 khi vượt LIVE_MAX_SECONDS
+            raise (ValueError if reply.get("kind") == "ValueError" else RuntimeError)(reply.get("error"))
+        return reply["result"]
+
+    def append_pcm16(self, data):
+        return self._call("append", bytes(data))
+
+    def partial(self):
+        return self._call("partial")
+
+    def finish(self, timeout=None):
+        return self._call("finish", timeout)
+
+
+class LiveSessionManager:
+    """Quản lý các phiên live (tự dọn phiên bị bỏ dở quá LIVE_SESSION_TTL giây)"""
+
+    def __init__(self, transcribe_fn, executor, ttl=LIVE_SESSION_TTL, route_dir=LIVE_SESSION_ROUTE_DIR,
+                 authkey=LIVE_SESSION_AUTHKEY, owner=None):
+        self.transcribe_fn = transcribe_fn
+        self.executor = executor
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+        self.owner = str(owner or os.getpid())
+        self.route_dir = route_dir or None
+        self.authkey = authkey or None
+        self._listener = None
+        self._route_stats = {"routed_in": 0, "routed_out": 0, "route_errors": 0}
+        if self.route_dir:
+            if not self.authkey:
+                raise ValueError("LIVE_SESSION_ROUTE_DIR cần LIVE_SESSION_AUTHKEY (socket nhận pickle)")
+            self._start_router()
+
+    def _expire(self):
+        now = time.time()
+        for sid in [sid for sid, s in self._sessions.items() if now - s.last_activity > self.ttl]:
+            self._sessions.pop(sid, None)
+
+    def create(self, meta=None):
+        session = LiveSession(f"{self.owner}-{uuid.uuid4().hex}", self.transcribe_fn, self.executor, meta=meta)
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+        return session
+
+    def _remote(self, session_id):
+        """Phiên của worker khác → RemoteLiveSession (None nếu không định tuyến / không còn)"""
+        owner = session_id.split("-", 1)[0] if "-" in session_id else None
+        if not self.route_dir or not owner or owner == self.owner:
+            return None
+        reply = self._remote_call(owner, "meta", session_id)
+        if not reply or not reply.get("ok"):
+            return None
+        return RemoteLiveSession(self, owner, session_id, reply["result"])
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        return session if session is not None else self._remote(session_id)
+
+    def pop(self, session_id):
+        """Lấy phiên ra để kết thúc (phiên ở worker khác bị gỡ khi finish() chạy bên đó)"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        return session if session is not None else self._remote(session_id)
+
+    # ---------- Định tuyến giữa các worker ----------
+    def _socket_path(self, owner):
+        return os.path.join(self.route_dir, f"live-{owner}.sock")
+
+    def _start_router(self):
+        from multiprocessing.connection import Listener
+
+        os.makedirs(self.route_dir, mode=0o700, exist_ok=True)
+        path = self._socket_path(self.owner)
+        if os.path.exists(path):
+            os.unlink(path)  # socket của worker cũ trùng pid
+        old_umask = os.umask(0o177)  # socket tạo ra đã là 0600, không có khe hở trước chmod
+        try:
+            self._listener = Listener(path, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        atexit.register(self.close)
+        threading.Thread(target=self._serve, name="live-session-router", daemon=True).start()
+
+    def _serve(self):
+        listener = self._listener
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError):
+                return  # listener đã đóng
+            except Exception as e:  # vd. sai authkey
+                print(f"⚠️ [LIVE] Lỗi accept định tuyến: {e}")
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), name="live-session-conn", daemon=True).start()
+
+    def _serve_connection(self, conn):
+        with conn:
+            try:
+                op, session_id, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                session = self._sessions.pop(session_id, None) if op == "finish" else self._sessions.get(session_id)
+                self._route_stats["routed_in"] += 1
+            if session is None:
+                reply = {"ok": False, "missing": True}
+            else:
+                try:
+                    if op == "meta":
+                        result = session.meta
+                    elif op == "append":
+                        result = session.append_pcm16(*args)
+                    elif op == "partial":
+                        result = session.partial()
+                    else:
+                        result = session.finish(*args)
+                    reply = {"ok": True, "result": result}
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e), "kind": type(e).__name__}
+            try:
+                conn.send(reply)
+            except (EOFError, OSError):
+                pass
+
+    def _remote_call(self, owner, op, session_id, *args):
+        """1 request / kết nối tới worker sở hữu phiên → reply dict (None nếu không kết nối được)"""
+        from multiprocessing.connection import Client
+
+        with self._lock:
+            self._route_stats["routed_out"] += 1
+        try:
+            with Client(self._socket_path(owner), family="AF_UNIX", authkey=self.authkey) as conn:
+                conn.send((op, session_id, args))
+                if not conn.poll(LIVE_SESSION_ROUTE_TIMEOUT):
+                    raise TimeoutError(f"worker {owner} không trả lời sau {LIVE_SESSION_ROUTE_TIMEOUT:.0f}s")
+                return conn.recv()
+        except (OSError, EOFError, AuthenticationError) as e:
+            # Worker sở hữu đã tắt / restart → coi như phiên không còn
+            with self._lock:
+                self._route_stats["route_errors"] += 1
+            print(f"⚠️ [LIVE] Không chuyển được '{op}' tới worker {owner}: {e}")
+            return None
+
+    def close(self):
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.close()
+            try:
+                os.unlink(self._socket_path(self.owner))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = {"active_sessions": len(self._sessions), "owner": self.owner, "routing": bool(self.route_dir)}
+            if self.route_dir:
+                stats.update(self._route_stats)
+            return stats
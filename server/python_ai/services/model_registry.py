@@ -0,0 +1,145 @@
+"""
+🗃️ MODEL REGISTRY - Mỗi artifact joblib load 1 lần / host
+==========================================================
+Trước đây alex_speaking_brain_pro.joblib được load 2 lần / process (app.py và
+speaking_hybrid_service), alex_writing_brain.joblib (RandomForest 1000 cây) load
+trong WritingService và thêm lần nữa ở audit_features.py. Registry này:
+- get_model(name): load lazy đúng 1 lần / process, mọi module dùng chung object
+- joblib.load(mmap_mode="r") (MODEL_MMAP): mảng numpy trong artifact map thẳng từ file
+- preload_models(): gọi trong master gunicorn (gunicorn.conf.py) TRƯỚC khi fork →
+  các worker dùng chung page bộ nhớ của model (copy-on-write), + gc.freeze() để GC
+  không ghi vào header object làm tách page
+- Báo kích thước từng model (nbytes ước lượng, RSS tăng lúc load) + Shared/Private
+  của process (/api/speaking/perf-stats)
+Lưu ý: cây sklearn và Booster XGBoost copy dữ liệu ra buffer riêng khi unpickle nên
+mmap không giúp được chúng - với 2 model này preload trước fork mới là cách chia sẻ RAM.
+"""
+
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from services.asr_engines import current_rss_mb
+
+load_dotenv()
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Random_forest")
+MODEL_PATHS = {
+    "speaking": os.path.join(MODEL_DIR, "alex_speaking_brain_pro.joblib"),
+    "writing": os.path.join(MODEL_DIR, "alex_writing_brain.joblib")
+}
+MODEL_MMAP = os.getenv("MODEL_MMAP", "1").strip().lower() not in ("0", "false", "no", "off")
+
+_lock = threading.RLock()
+_models = {}
+_info = {}
+_errors = {}
+_preloaded_pid = None
+
+
+def _estimate_nbytes(model):
+    """Kích thước dữ liệu chính của model: node/value của cây sklearn, raw booster XGBoost"""
+    try:
+        if hasattr(model, "get_booster"):
+            return len(model.get_booster().save_raw())
+        estimators = getattr(model, "estimators_", None)
+        if estimators is not None:
+            total = 0
+            for est in estimators:
+                for tree in (est if isinstance(est, (list, tuple)) or hasattr(est, "ravel") else [est]):
+                    tree_ = getattr(tree, "tree_", None)
+                    if tree_ is not None:
+                        total += tree_.__getstate__()["nodes"].nbytes + tree_.value.nbytes
+            return total
+    except Exception as e:
+        print(f"⚠️ [MODELS] Không ước lượng được kích thước model: {e}")
+    return None
+
+
+def get_model(name, path=None):
+    """Model theo tên (load 1 lần / process, None nếu không có file / load lỗi)"""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    path = path or MODEL_PATHS.get(name)
+    if path is None:
+        return None
+
+    with _lock:
+        if name in _models:
+            return _models[name]
+        if name in _errors:
+            return None
+        if not os.path.exists(path):
+            _errors[name] = f"không tìm thấy {path}"
+            print(f"ℹ️ [MODELS] Không có model '{name}' tại {path}")
+            return None
+        import joblib
+        rss_before = current_rss_mb()
+        t0 = time.perf_counter()
+        try:
+            model = joblib.load(path, mmap_mode="r" if MODEL_MMAP else None)
+        except Exception as e:
+            _errors[name] = str(e)
+            print(f"⚠️ [MODELS] Load model '{name}' lỗi: {e}")
+            return None
+        rss_after = current_rss_mb()
+        nbytes = _estimate_nbytes(model)
+        _info[name] = {
+            "path": os.path.basename(path),
+            "type": type(model).__name__,
+            "file_mb": round(os.path.getsize(path) / 1048576.0, 2),
+            "data_mb": round(nbytes / 1048576.0, 2) if nbytes is not None else None,
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+            "load_seconds": round(time.perf_counter() - t0, 2),
+            "loaded_pid": os.getpid()
+        }
+        _models[name] = model
+        print(f"🗃️ [MODELS] '{name}' ({_info[name]['type']}) sẵn sàng sau {_info[name]['load_seconds']}s "
+              f"(+{_info[name]['rss_delta_mb']}MB RSS)")
+        return model
+
+
+def preload_models(names=None, freeze=True):
+    """Load trước mọi model (gọi trong master gunicorn trước khi fork worker)"""
+    global _preloaded_pid
+    for name in names or MODEL_PATHS:
+        get_model(name)
+    if freeze:
+        import gc
+        gc.collect()
+        gc.freeze()  # object hiện có → permanent generation, GC ở worker không chạm tới
+    _preloaded_pid = os.getpid()
+    print(f"🗃️ [MODELS] Preload {len(_models)} model trong pid {_preloaded_pid} (worker fork ra dùng chung page)")
+
+
+def _memory_rollup():
+    """Rss / Pss / Shared / Private (MB) của process hiện tại từ /proc/self/smaps_rollup"""
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb",
+              "Private_Clean": "private_mb", "Private_Dirty": "private_mb"}
+    stats = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    stats[fields[key]] = stats.get(fields[key], 0.0) + int(rest.split()[0]) / 1024.0
+    except (OSError, ValueError, IndexError):
+        return None
+    return {k: round(v, 1) for k, v in stats.items()}
+
+
+def get_model_registry_stats():
+    with _lock:
+        models = {name: {**info, "shared_from_parent": info["loaded_pid"] != os.getpid()} for name, info in _info.items()}
+        errors = dict(_errors)
+    return {
+        "pid": os.getpid(),
+        "preloaded_by": _preloaded_pid,
+        "mmap": MODEL_MMAP,
+        "models": models,
+        "errors": errors,
+        "process_memory": _memory_rollup()
+    }
@@ -0,0 +1,144 @@
+"""
+📈 PITCH DTW - So khớp đường cao độ (numpy / numba, có Sakoe-Chiba band)
+=======================================================================
+_dtw_distance cũ trong app.py dựng bảng (n+1)×(m+1) bằng list-of-lists + 2 vòng
+for Python, _resample_curve nội suy từng điểm → chỉ chịu được ~40 điểm / curve.
+Ở đây:
+- resample_curve: np.interp (giữ đúng ngữ nghĩa cũ: bỏ None, 1 điểm → lặp lại)
+- dtw_distance / dtw_distances: 1 curve người dùng so với 1 hoặc nhiều curve mẫu
+  (nhiều voice / accent) trong 1 lần gọi, chuẩn hoá dp[n][m] / (n + m) như cũ
+- band: Sakoe-Chiba (tỉ lệ độ dài curve, 0/None = không giới hạn) → O(n·w) thay vì O(n·m)
+- Kernel numba nếu có (librosa đã kéo numba về), không thì numpy quét theo đường chéo
+"""
+
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PITCH_DTW_USE_NUMBA = os.getenv("PITCH_DTW_USE_NUMBA", "1").strip().lower() not in ("0", "false", "no", "off")
+# Số điểm curve overlay (trước đây cố định 40) và band mặc định (0 = DTW đầy đủ như cũ)
+PITCH_OVERLAY_POINTS = int(os.getenv("PITCH_OVERLAY_POINTS", "40"))
+PITCH_DTW_BAND = float(os.getenv("PITCH_DTW_BAND", "0"))
+
+_numba_kernel = None
+
+
+def resample_curve(values, target_len=40):
+    """Nội suy tuyến tính về target_len điểm (list float; rỗng nếu không có giá trị)"""
+    vals = np.asarray([float(v) for v in (values or []) if v is not None], dtype=np.float64)
+    if vals.size == 0:
+        return []
+    if vals.size == 1:
+        return [float(vals[0])] * target_len
+    positions = np.linspace(0.0, vals.size - 1, target_len) if target_len > 1 else np.zeros(1)
+    return np.interp(positions, np.arange(vals.size), vals).tolist()
+
+
+def _band_width(n, m, band):
+    """Nửa độ rộng band theo số ô (band là tỉ lệ của curve dài hơn); None = không band"""
+    if not band:
+        return None
+    # Band phải đủ rộng để đường chéo (n, m) lệch độ dài vẫn đi tới được góc cuối
+    return max(int(np.ceil(band * max(n, m))), abs(n - m), 1)
+
+
+def _load_numba_kernel():
+    global _numba_kernel
+    if _numba_kernel is not None or not PITCH_DTW_USE_NUMBA:
+        return _numba_kernel
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(cache=False, nogil=True)
+    def _kernel(a, refs, width):
+        k, m = refs.shape
+        n = a.shape[0]
+        out = np.empty(k)
+        prev = np.empty(m + 1)
+        curr = np.empty(m + 1)
+        for r in range(k):
+            prev[:] = np.inf
+            prev[0] = 0.0
+            for i in range(1, n + 1):
+                curr[:] = np.inf
+                lo, hi = 1, m
+                if width >= 0:
+                    center = (i * m) // n
+                    lo = max(1, center - width)
+                    hi = min(m, center + width)
+                for j in range(lo, hi + 1):
+                    best = prev[j]
+                    if curr[j - 1] < best:
+                        best = curr[j - 1]
+                    if prev[j - 1] < best:
+                        best = prev[j - 1]
+                    curr[j] = abs(a[i - 1] - refs[r, j - 1]) + best
+                prev, curr = curr, prev
+            out[r] = prev[m] / (n + m)
+        return out
+
+    _numba_kernel = _kernel
+    return _numba_kernel
+
+
+def _dtw_numpy(a, refs, width):
+    """Quét theo đường chéo i + j = d: mọi ô trên 1 đường chéo (× mọi curve mẫu) tính 1 lần"""
+    k, m = refs.shape
+    n = a.shape[0]
+    cost = np.abs(a[None, :, None] - refs[:, None, :])  # (k, n, m)
+    if width is not None:
+        i_idx = np.arange(1, n + 1)[:, None]
+        j_idx = np.arange(1, m + 1)[None, :]
+        cost[:, np.abs(j_idx - (i_idx * m) // n) > width] = np.inf
+    dp = np.full((k, n + 1, m + 1), np.inf)
+    dp[:, 0, 0] = 0.0
+    for d in range(2, n + m + 1):
+        i = np.arange(max(1, d - m), min(n, d - 1) + 1)
+        j = d - i
+        best = np.minimum(np.minimum(dp[:, i - 1, j], dp[:, i, j - 1]), dp[:, i - 1, j - 1])
+        dp[:, i, j] = cost[:, i - 1, j - 1] + best
+    return dp[:, n, m] / (n + m)
+
+
+def dtw_distances(curve, references, band=None):
+    """Khoảng cách DTW từ curve tới từng curve mẫu → np.ndarray (0.0 cho curve rỗng)"""
+    a = np.asarray(curve, dtype=np.float64)
+    out = np.zeros(len(references))
+    if a.size == 0:
+        return out
+
+    # Gom các curve mẫu cùng độ dài → mỗi nhóm 1 lần gọi kernel
+    groups = {}
+    for idx, ref in enumerate(references):
+        ref = np.asarray(ref, dtype=np.float64)
+        if ref.size:
+            groups.setdefault(ref.size, []).append((idx, ref))
+
+    kernel = _load_numba_kernel()
+    for m, items in groups.items():
+        refs = np.stack([ref for _, ref in items])
+        width = _band_width(a.size, m, band)
+        if kernel is not None:
+            dists = kernel(a, refs, -1 if width is None else width)
+        else:
+            dists = _dtw_numpy(a, refs, width)
+        out[[idx for idx, _ in items]] = dists
+    return out
+
+
+def dtw_distance(series_a, series_b, band=None):
+    """Khoảng cách DTW giữa 2 curve (cùng chuẩn hoá với _dtw_distance cũ)"""
+    if series_a is None or series_b is None or not len(series_a) or not len(series_b):
+        return 0.0
+    return float(dtw_distances(series_a, [series_b], band=band)[0])
+
+
+def warm_up():
+    """JIT kernel numba trước request đầu tiên"""
+    if _load_numba_kernel() is not None:
+        dtw_distance([1.0, 2.0, 3.0], [1.0, 3.0], band=0.5)
@@ -0,0 +1,363 @@
+"""
+🎼 PITCH SERVICE - 1 lần pYIN cho mọi consumer
+===============================================
+Trước đây pYIN chạy 2-3 lần / request (chart 8kHz, features 16kHz, hybrid service).
+Module này tính đường F0 một lần trên AudioBuffer, rồi suy ra:
+- Đường cong 50 điểm cho chart Frontend
+- pitch_mean, jitter cho XGBoost
+- Voiced mask cho các stage khác
+
+Engines (chọn theo deployment qua PITCH_ENGINE hoặc theo request):
+- pyin     : chuẩn (chậm nhất), dải 65-2093Hz như lúc train
+- yin      : YIN thuần + energy gate, dải giọng nói 65-500Hz
+- autocorr : autocorrelation vector hoá (FFT), dải giọng nói 65-500Hz (nhanh nhất)
+So sánh độ lệch/tốc độ: scripts/benchmark_pitch_engines.py
+PITCH_SPEECH_ONLY=1: tracker chỉ chạy trên các đoạn có tiếng của services/speech_vad.py,
+frame trong khoảng lặng = unvoiced. Mặc định TẮT: pitch_mean / pitch_std / jitter đổi
+so với lúc train XGBoost (pYIN trên cả bản ghi) → chỉ bật sau khi model đã được
+train lại / kiểm tra trên features speech-only.
+Bài dài: đoạn > 2 cửa sổ ANALYSIS_WINDOW_SECONDS được track theo cửa sổ (chồng lấn
+PITCH_WINDOW_OVERLAP_SECONDS mỗi bên, chỉ giữ frame giữa) → bộ nhớ pYIN (ma trận
+xác suất HMM theo số frame) không tăng theo độ dài bài.
+"""
+
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+from dotenv import load_dotenv
+
+from services.audio_process_pool import run_audio_stage
+
+load_dotenv()
+
+# --- CONFIG (mặc định khớp với lúc train XGBoost: 16kHz, hop 512, 65-2093Hz) ---
+PITCH_SR = int(os.getenv("PITCH_SR", "16000"))
+PITCH_HOP_LENGTH = int(os.getenv("PITCH_HOP_LENGTH", "512"))
+PITCH_FMIN = float(os.getenv("PITCH_FMIN", "65"))
+PITCH_FMAX = float(os.getenv("PITCH_FMAX", "2093"))
+PITCH_CHART_POINTS = 50
+
+PITCH_ENGINES = ("pyin", "yin", "autocorr")
+PITCH_ENGINE = os.getenv("PITCH_ENGINE", "pyin").strip().lower()
+# Dải tần giọng nói cho các engine nhanh (không cần quét tới C7)
+PITCH_SPEECH_FMIN = float(os.getenv("PITCH_SPEECH_FMIN", "65"))
+PITCH_SPEECH_FMAX = float(os.getenv("PITCH_SPEECH_FMAX", "500"))
+# Frame có năng lượng thấp hơn đỉnh quá top_db coi như unvoiced (yin/autocorr)
+PITCH_ENERGY_TOP_DB = 30.0
+AUTOCORR_VOICING_THRESHOLD = 0.45
+PITCH_WINDOW_OVERLAP_SECONDS = 1.0
+PITCH_SPEECH_ONLY = os.getenv("PITCH_SPEECH_ONLY", "0").strip().lower() not in ("0", "false", "no", "off")
+
+_stats_lock = threading.Lock()
+PITCH_STATS = {
+    "requests": 0,        # số lần consumer xin pitch track
+    "computed": 0,        # số lần thực sự chạy pitch tracker
+    "shared_hits": 0,     # số lần tracker được tiết kiệm nhờ dùng chung
+    "compute_seconds": 0.0,
+    "audio_seconds": 0.0,     # tổng độ dài audio đã xin pitch
+    "analyzed_seconds": 0.0,  # phần thực sự đưa vào tracker (chỉ đoạn có tiếng)
+    "by_engine": {}
+}
+
+
+class PitchTrack:
+    """Kết quả pYIN của 1 bản ghi + các đại lượng suy ra"""
+
+    def __init__(self, f0, voiced_flag, sr, hop_length, timings=None, engine="pyin"):
+        self.f0 = f0
+        self.voiced_flag = voiced_flag
+        self.sr = sr
+        self.hop_length = hop_length
+        self.timings = timings or {}
+        self.engine = engine
+
+    @property
+    def voiced_f0(self):
+        return self.f0[~np.isnan(self.f0)]
+
+    @property
+    def pitch_mean(self):
+        f0_clean = self.voiced_f0
+        return float(np.mean(f0_clean)) if len(f0_clean) > 0 else 0
+
+    @property
+    def jitter(self):
+        f0_clean = self.voiced_f0
+        if len(f0_clean) == 0 or np.mean(f0_clean) <= 0:
+            return 0
+        return float(np.std(f0_clean) / np.mean(f0_clean))
+
+    def chart_curve(self, points=PITCH_CHART_POINTS):
+        """Giảm xuống N điểm voiced cho chart Frontend"""
+        f0_clean = self.voiced_f0
+        if len(f0_clean) == 0:
+            return []
+        if len(f0_clean) > points:
+            indices = np.linspace(0, len(f0_clean) - 1, points).astype(int)
+            f0_clean = f0_clean[indices]
+        return [float(round(p, 2)) for p in f0_clean]
+
+
+def _frame_signal(y, frame_length, hop_length):
+    """Cắt frame kiểu center=True (pad 0) → cùng số frame với librosa.pyin/yin"""
+    import librosa
+    y_pad = np.pad(y, frame_length // 2, mode="constant")
+    return librosa.util.frame(y_pad, frame_length=frame_length, hop_length=hop_length)
+
+
+def _energy_gate(frames, top_db=PITCH_ENERGY_TOP_DB):
+    """Voiced candidate = frame có RMS trong khoảng top_db so với frame to nhất"""
+    rms = np.sqrt(np.mean(frames ** 2, axis=0))
+    peak = np.max(rms) if rms.size else 0.0
+    if peak <= 0:
+        return np.zeros(rms.shape, dtype=bool)
+    return rms > peak * (10.0 ** (-top_db / 20.0))
+
+
+def _run_pyin(y, sr, hop_length, fmin, fmax):
+    import librosa
+    f0, voiced_flag, _ = librosa.pyin(y, fmin=fmin, fmax=fmax, sr=sr, hop_length=hop_length)
+    return f0, voiced_flag
+
+
+def _run_yin(y, sr, hop_length, fmin, fmax, frame_length=2048):
+    import librosa
+    f0 = librosa.yin(y, fmin=fmin, fmax=fmax, sr=sr, frame_length=frame_length, hop_length=hop_length)
+    voiced_flag = _energy_gate(_frame_signal(y, frame_length, hop_length))[:len(f0)]
+    # YIN bám biên khi không tìm được chu kỳ → coi như unvoiced
+    voiced_flag &= (f0 > fmin * 1.01) & (f0 < fmax * 0.99)
+    f0 = np.where(voiced_flag, f0, np.nan)
+    return f0, voiced_flag
+
+
+def _run_autocorr(y, sr, hop_length, fmin, fmax, frame_length=1024):
+    """Autocorrelation qua FFT cho toàn bộ frame 1 lần (không vòng lặp Python)"""
+    frame_length = max(frame_length, int(np.ceil(2 * sr / fmin)))
+    frames = _frame_signal(y, frame_length, hop_length)
+    energy_ok = _energy_gate(frames)
+
+    frames = frames - frames.mean(axis=0, keepdims=True)
+    frames = frames * np.hanning(frame_length)[:, None]
+    n_fft = 1 << int(np.ceil(np.log2(2 * frame_length)))
+    spec = np.fft.rfft(frames, n=n_fft, axis=0)
+    acf = np.fft.irfft(np.abs(spec) ** 2, n=n_fft, axis=0)[:frame_length]
+
+    energy = acf[0]
+    safe_energy = np.where(energy > 0, energy, 1.0)
+    acf = acf / safe_energy
+
+    min_lag = max(int(np.floor(sr / fmax)), 1)
+    max_lag = min(int(np.ceil(sr / fmin)), frame_length - 2)
+    lag_window = acf[min_lag:max_lag + 1]
+    best = np.argmax(lag_window, axis=0)
+    peak = lag_window[best, np.arange(lag_window.shape[1])]
+    lag = best + min_lag
+
+    # Nội suy parabol quanh đỉnh để F0 mịn hơn độ phân giải 1 sample
+    cols = np.arange(acf.shape[1])
+    left = acf[np.clip(lag - 1, 0, frame_length - 1), cols]
+    right = acf[np.clip(lag + 1, 0, frame_length - 1), cols]
+    denom = left - 2 * peak + right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / denom, 0.0)
+    refined_lag = lag + np.clip(shift, -0.5, 0.5)
+
+    voiced_flag = energy_ok & (energy > 0) & (peak >= AUTOCORR_VOICING_THRESHOLD)
+    f0 = np.where(voiced_flag, sr / refined_lag, np.nan)
+    return _reject_outliers(f0, voiced_flag)
+
+
+def _reject_outliers(f0, voiced_flag, radius=5, max_cents=700.0):
+    """Bỏ frame lệch quá nửa quãng tám so với median lân cận (lỗi octave ở biên onset/offset)"""
+    if len(f0) < 3 or not np.any(voiced_flag):
+        return f0, voiced_flag
+    padded = np.pad(f0, radius, mode="constant", constant_values=np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1)
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN slice ở vùng unvoiced
+        local_median = np.nanmedian(windows, axis=1)
+        cents = 1200.0 * np.abs(np.log2(f0 / local_median))
+    outlier = voiced_flag & (cents > max_cents)
+    voiced_flag = voiced_flag & ~outlier
+    return np.where(voiced_flag, f0, np.nan), voiced_flag
+
+
+_ENGINE_RUNNERS = {
+    "pyin": _run_pyin,
+    "yin": _run_yin,
+    "autocorr": _run_autocorr
+}
+
+
+def resolve_engine(engine=None):
+    """Chuẩn hoá tên engine (request → env → pyin)"""
+    name = (engine or PITCH_ENGINE or "pyin").strip().lower()
+    if name not in _ENGINE_RUNNERS:
+        print(f"⚠️ [PITCH] Engine '{name}' không hợp lệ, dùng pyin")
+        name = "pyin"
+    return name
+
+
+def _default_range(engine):
+    if engine == "pyin":
+        return PITCH_FMIN, PITCH_FMAX
+    return PITCH_SPEECH_FMIN, PITCH_SPEECH_FMAX
+
+
+def _track_windowed(runner, y, sr, hop_length, fmin, fmax, window_seconds):
+    """
+    Chạy tracker theo cửa sổ ~window_seconds, mỗi bên thêm PITCH_WINDOW_OVERLAP_SECONDS
+    ngữ cảnh rồi chỉ giữ frame phần giữa. Cửa sổ bắt đầu đúng biên frame nên ghép lại
+    cùng lưới frame center=True với khi chạy 1 lần. Audio ngắn → chạy thẳng.
+    """
+    if not window_seconds or len(y) <= 2 * window_seconds * sr:
+        return runner(y, sr, hop_length, fmin, fmax)
+    n_frames = 1 + len(y) // hop_length
+    per_window = max(int(window_seconds * sr / hop_length), 1)
+    context = int(np.ceil(PITCH_WINDOW_OVERLAP_SECONDS * sr / hop_length))
+    f0 = np.full(n_frames, np.nan)
+    voiced_flag = np.zeros(n_frames, dtype=bool)
+    start = 0
+    while start < n_frames:
+        end = min(start + per_window, n_frames)
+        if n_frames - end < context:
+            end = n_frames  # gộp mẩu cuối quá ngắn vào cửa sổ hiện tại
+        lo, hi = max(0, start - context), min(n_frames, end + context)
+        win_f0, win_voiced = runner(y[lo * hop_length:hi * hop_length], sr, hop_length, fmin, fmax)
+        count = min(end - start, len(win_f0) - (start - lo))
+        f0[start:start + count] = win_f0[start - lo:start - lo + count]
+        voiced_flag[start:start + count] = win_voiced[start - lo:start - lo + count]
+        start = end
+    return f0, voiced_flag
+
+
+def _track_regions(runner, y, sr, hop_length, fmin, fmax, regions, min_samples=2048):
+    """
+    Chạy tracker trên từng đoạn [start, end) (sample), ghép lại thành track cả bài
+    cùng lưới frame center=True với khi chạy toàn bộ; frame ngoài đoạn = unvoiced.
+    """
+    n_frames = 1 + len(y) // hop_length
+    f0 = np.full(n_frames, np.nan)
+    voiced_flag = np.zeros(n_frames, dtype=bool)
+    for start, end in regions:
+        first = int(start) // hop_length  # bắt đầu đúng biên frame → frame k của đoạn = frame first + k
+        segment = y[first * hop_length:int(end)]
+        if len(segment) < min_samples:
+            continue
+        seg_f0, seg_voiced = runner(segment, sr, hop_length, fmin, fmax)
+        count = min(len(seg_f0), n_frames - first)
+        f0[first:first + count] = seg_f0[:count]
+        voiced_flag[first:first + count] = seg_voiced[:count]
+    return f0, voiced_flag
+
+
+def compute_pitch_track(y, sr, engine="pyin", hop_length=None, fmin=None, fmax=None, regions=None,
+                        max_seconds=None, window_seconds=None):
+    """
+    Chạy 1 engine trên mảng numpy (không cache) - dùng cho benchmark.
+    regions: [(start, end)] theo sample → chỉ track các đoạn đó (None = cả bài)
+    max_seconds: chỉ track phần đầu; window_seconds: đoạn dài track theo cửa sổ
+    """
+    from services.spectral_frontend import cap_samples
+    engine = resolve_engine(engine)
+    y = cap_samples(y, sr, max_seconds)
+    hop_length = int(hop_length or PITCH_HOP_LENGTH)
+    default_fmin, default_fmax = _default_range(engine)
+    fmin = float(fmin or default_fmin)
+    fmax = float(fmax or default_fmax)
+
+    def runner(segment, seg_sr, seg_hop, seg_fmin, seg_fmax):
+        return _track_windowed(_ENGINE_RUNNERS[engine], segment, seg_sr, seg_hop, seg_fmin, seg_fmax, window_seconds)
+
+    t0 = time.perf_counter()
+    if regions is None:
+        f0, voiced_flag = runner(y, sr, hop_length, fmin, fmax)
+    else:
+        f0, voiced_flag = _track_regions(runner, y, sr, hop_length, fmin, fmax, regions)
+    elapsed = time.perf_counter() - t0
+    return PitchTrack(f0, voiced_flag, sr, hop_length, timings={engine: round(elapsed, 4)}, engine=engine)
+
+
+def pitch_region_mode(speech_only=None, vad=None):
+    """"full" hoặc "speech:<vad>" - đưa vào key memo / artifact cache"""
+    speech_only = PITCH_SPEECH_ONLY if speech_only is None else speech_only
+    if not speech_only:
+        return "full"
+    from services.speech_vad import resolve_vad_method
+    return f"speech:{resolve_vad_method(vad)}"
+
+
+def analyze_pitch(audio, sr=None, hop_length=None, fmin=None, fmax=None, engine=None, speech_only=None, vad=None):
+    """
+    Lấy PitchTrack của AudioBuffer (tính 1 lần / buffer / cấu hình).
+    Các thread chạy song song (chart + features) sẽ đợi và dùng chung kết quả.
+    speech_only (mặc định PITCH_SPEECH_ONLY): chỉ track các đoạn có tiếng của speech_regions.
+    """
+    engine = resolve_engine(engine)
+    sr = int(sr or PITCH_SR)
+    hop_length = int(hop_length or PITCH_HOP_LENGTH)
+    default_fmin, default_fmax = _default_range(engine)
+    fmin = float(fmin or default_fmin)
+    fmax = float(fmax or default_fmax)
+    mode = pitch_region_mode(speech_only, vad)
+
+    computed = []
+
+    def _compute():
+        from services.spectral_frontend import ANALYSIS_WINDOW_SECONDS, MAX_ANALYSIS_SECONDS
+        t0 = time.perf_counter()
+        y = audio.resampled(sr)
+        t1 = time.perf_counter()
+        params = {
+            "engine": engine, "hop_length": hop_length, "fmin": fmin, "fmax": fmax,
+            "max_seconds": MAX_ANALYSIS_SECONDS, "window_seconds": ANALYSIS_WINDOW_SECONDS
+        }
+        n_samples = min(len(y), int(MAX_ANALYSIS_SECONDS * sr)) if MAX_ANALYSIS_SECONDS else len(y)
+        analyzed = n_samples
+        if mode != "full":
+            from services.speech_vad import SPEECH_VAD_PAD_MS, speech_regions
+            regions = speech_regions(audio, mode.split(":", 1)[1]).at(sr, pad_ms=SPEECH_VAD_PAD_MS, n_samples=n_samples)
+            params["regions"] = regions
+            analyzed = sum(end - start for start, end in regions)
+        # Process pool (AUDIO_PROCESS_POOL_WORKERS > 0) hoặc ngay trong thread hiện tại
+        track = run_audio_stage("pitch", audio, sr, params, lambda: compute_pitch_track(y, sr, **params))
+        computed.append((len(y) / float(sr), analyzed / float(sr)))
+        track.timings["resample"] = round(t1 - t0, 4)
+        print(f"🎼 [PITCH] {engine} ({mode}, {analyzed / max(len(y), 1):.0%} audio) {len(track.f0)} frames @ {sr}Hz/hop {hop_length}: "
+              f"{track.timings[engine]:.2f}s (dùng chung cho chart + features)")
+        return track
+
+    track = audio.memo(("pitch", engine, sr, hop_length, fmin, fmax, mode), _compute)
+
+    with _stats_lock:
+        PITCH_STATS["requests"] += 1
+        if computed:
+            PITCH_STATS["computed"] += 1
+            PITCH_STATS["compute_seconds"] += track.timings.get(engine, 0.0)
+            PITCH_STATS["audio_seconds"] += computed[0][0]
+            PITCH_STATS["analyzed_seconds"] += computed[0][1]
+            PITCH_STATS.setdefault("by_engine", {})
+            PITCH_STATS["by_engine"][engine] = PITCH_STATS["by_engine"].get(engine, 0) + 1
+        else:
+            PITCH_STATS["shared_hits"] += 1
+    return track
+
+
+def get_pitch_stats():
+    """Thống kê: số lần pYIN thực chạy vs số lần được dùng chung"""
+    with _stats_lock:
+        stats = dict(PITCH_STATS)
+        stats["by_engine"] = dict(PITCH_STATS.get("by_engine", {}))
+    stats["default_engine"] = resolve_engine()
+    computed = max(stats["computed"], 1)
+    stats["avg_compute_seconds"] = round(stats["compute_seconds"] / computed, 4)
+    stats["saved_seconds_estimate"] = round(stats["shared_hits"] * stats["avg_compute_seconds"], 2)
+    stats["compute_seconds"] = round(stats["compute_seconds"], 2)
+    stats["speech_only"] = pitch_region_mode() != "full"
+    stats["analyzed_ratio"] = round(stats["analyzed_seconds"] / stats["audio_seconds"], 3) if stats["audio_seconds"] else None
+    stats["audio_seconds"] = round(stats["audio_seconds"], 2)
+    stats["analyzed_seconds"] = round(stats["analyzed_seconds"], 2)
+    return stats
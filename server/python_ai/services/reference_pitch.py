@@ -0,0 +1,210 @@
+"""
+🎼 REFERENCE PITCH STORE - Đường cao độ mẫu (TTS) theo câu hỏi + giọng
+======================================================================
+_build_pitch_overlay (use_tts_reference=1) trước đây mỗi request đều gọi Edge TTS
+(mạng) đọc câu hỏi → mp3 → pYIN. Kết quả chỉ phụ thuộc câu hỏi + voice + pitch
+engine, nên:
+- Key = câu hỏi đã chuẩn hoá + voice + engine (+ sr / hop / region mode như pitch_curve)
+- L1: LRU trong process (REFERENCE_PITCH_CACHE_SIZE entry)
+- L2: analysis_cache (SQLite / Mongo) với TTL dài → dùng chung giữa worker & lần restart
+- scripts/precompute_reference_pitch.py: chạy offline qua toàn bộ ngân hàng câu hỏi ×
+  voice → request chỉ còn tra cache
+- Miss lúc request (REFERENCE_PITCH_ON_MISS): inline (build ngay, như cũ) | background
+  (build nền, request này dùng đường synthetic) | skip
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from services.artifact_cache import analysis_cache, make_cache_key
+from services.pitch_service import PITCH_HOP_LENGTH, PITCH_SR, pitch_region_mode, resolve_engine
+
+load_dotenv()
+
+DEFAULT_REFERENCE_VOICE = "en-GB-SoniaNeural"
+REFERENCE_PITCH_CACHE_SIZE = int(os.getenv("REFERENCE_PITCH_CACHE_SIZE", "1024"))
+REFERENCE_PITCH_TTL = int(os.getenv("REFERENCE_PITCH_TTL", str(365 * 24 * 3600)))
+REFERENCE_PITCH_ON_MISS = os.getenv("REFERENCE_PITCH_ON_MISS", "inline").strip().lower()  # inline | background | skip
+REFERENCE_VOICES = [
+    v.strip() for v in os.getenv("REFERENCE_VOICES", DEFAULT_REFERENCE_VOICE).split(",") if v.strip()
+]
+
+
+def normalize_question(question):
+    """Bỏ khác biệt khoảng trắng / hoa thường (dấu câu giữ lại vì ảnh hưởng ngữ điệu TTS)"""
+    return " ".join((question or "").split()).lower()
+
+
+def reference_key(question, voice, engine=None):
+    text_hash = hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()[:20]
+    return make_cache_key(
+        "ref_pitch", text_hash,
+        voice=voice, engine=resolve_engine(engine), sr=PITCH_SR, hop_length=PITCH_HOP_LENGTH,
+        regions=pitch_region_mode()
+    )
+
+
+def _synthesize_curve(question, voice, engine):
+    """Edge TTS đọc câu hỏi → pitch curve (mp3 tạm trong workspace, xoá ngay sau)"""
+    from services.audio_service import extract_pitch
+    from services.tts_service import run_tts_sync
+    from services.upload_io import workspace
+
+    tts_temp = workspace.new_path(".mp3")
+    try:
+        run_tts_sync(question, tts_temp, voice=voice)
+        return extract_pitch(tts_temp, engine=engine)
+    finally:
+        workspace.release(tts_temp)
+
+
+class ReferencePitchStore:
+    def __init__(self, capacity=REFERENCE_PITCH_CACHE_SIZE, persistent=analysis_cache, builder=_synthesize_curve,
+                 ttl=REFERENCE_PITCH_TTL, on_miss=REFERENCE_PITCH_ON_MISS):
+        self.capacity = max(1, capacity)
+        self.persistent = persistent
+        self.builder = builder
+        self.ttl = ttl
+        self.on_miss = on_miss if on_miss in ("inline", "background", "skip") else "inline"
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}  # key → Event: nhiều request cùng câu hỏi chỉ build 1 lần
+        self._background = None
+        self._stats = {
+            "memory_hits": 0, "persistent_hits": 0, "misses": 0, "builds": 0,
+            "build_errors": 0, "evictions": 0, "background_builds": 0, "build_seconds": 0.0
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _remember(self, key, curve):
+        with self._lock:
+            self._lru[key] = curve
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def lookup(self, question, voice=DEFAULT_REFERENCE_VOICE, engine=None):
+        """Curve đã có (L1 → L2) hoặc None - không bao giờ gọi TTS"""
+        key = reference_key(question, voice, engine)
+        with self._lock:
+            curve = self._lru.get(key)
+            if curve is not None:
+                self._lru.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return curve
+        curve = self.persistent.get(key) if self.persistent is not None else None
+        if curve:
+            self._count("persistent_hits")
+            self._remember(key, curve)
+            return curve
+        return None
+
+    def build(self, question, voice=DEFAULT_REFERENCE_VOICE, engine=None, force=False):
+        """TTS + pitch rồi lưu L1 + L2 (force: build lại kể cả khi đã có)"""
+        if not force:
+            curve = self.lookup(question, voice, engine)
+            if curve is not None:
+                return curve
+        key = reference_key(question, voice, engine)
+        with self._lock:
+            pending = self._building.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._building[key] = threading.Event()
+        if not owner:
+            pending.wait()
+            with self._lock:
+                return self._lru.get(key)
+
+        t0 = time.perf_counter()
+        try:
+            curve = self.builder(question, voice, resolve_engine(engine))
+            self._count("builds")
+            if curve:
+                self._remember(key, curve)
+                if self.persistent is not None:
+                    self.persistent.set(key, curve, ttl=self.ttl)
+            return curve or None
+        except Exception as e:
+            self._count("build_errors")
+            print(f"⚠️ [REF PITCH] Build curve lỗi ({voice}): {e}")
+            return None
+        finally:
+            self._count("build_seconds", time.perf_counter() - t0)
+            with self._lock:
+                self._building.pop(key, None)
+            pending.set()
+
+    def get(self, question, voice=DEFAULT_REFERENCE_VOICE, engine=None):
+        """Đường dùng trong request: cache hit → curve; miss → theo on_miss"""
+        if not question or not question.strip():
+            return None
+        curve = self.lookup(question, voice, engine)
+        if curve is not None:
+            return curve
+        self._count("misses")
+        if self.on_miss == "inline":
+            return self.build(question, voice, engine, force=True)
+        if self.on_miss == "background":
+            with self._lock:
+                if self._background is None:
+                    self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ref-pitch")
+                self._stats["background_builds"] += 1
+            self._background.submit(self.build, question, voice, engine)
+        return None
+
+    def precompute(self, questions, voices=None, engine=None, force=False, workers=4, progress=None):
+        """Build curve cho mọi (câu hỏi × voice) → {"built", "cached", "failed"}"""
+        jobs = []
+        seen = set()
+        for question in questions:
+            for voice in voices or REFERENCE_VOICES:
+                key = reference_key(question, voice, engine)
+                if question and question.strip() and key not in seen:
+                    seen.add(key)
+                    jobs.append((question, voice))
+
+        summary = {"built": 0, "cached": 0, "failed": 0}
+
+        def _one(job):
+            question, voice = job
+            if not force and self.lookup(question, voice, engine) is not None:
+                return "cached"
+            return "built" if self.build(question, voice, engine, force=True) else "failed"
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for i, outcome in enumerate(executor.map(_one, jobs), 1):
+                summary[outcome] += 1
+                if progress:
+                    progress(i, len(jobs), summary)
+        if self.persistent is not None:
+            self.persistent.flush(timeout=30)
+        return summary
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._lru)
+        lookups = stats["memory_hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["persistent_hits"]) / lookups, 3) if lookups else 0.0
+        stats["build_seconds"] = round(stats["build_seconds"], 2)
+        stats["capacity"] = self.capacity
+        stats["on_miss"] = self.on_miss
+        return stats
+
+
+reference_pitch_store = ReferencePitchStore()
+
+
+def get_reference_pitch_stats():
+    return reference_pitch_store.stats()
@@ -0,0 +1,97 @@
+"""
+✂️ SILENCE TRIM - Cắt im lặng đầu/cuối bằng numpy (thay pydub detect_nonsilent)
+===============================================================================
+pydub.silence.detect_nonsilent duyệt audio theo từng lát 1ms bằng Python thuần,
+mỗi lát tính lại RMS của cả cửa sổ min_silence_len → O(n * min_silence_len), rất chậm
+với bài nói 1-2 phút. Ở đây giữ nguyên ngữ nghĩa (seek 1ms, cửa sổ min_silence_len,
+ngưỡng dBFS, RMS làm tròn xuống như audioop) nhưng dùng cumsum bình phương
+→ O(n), chạy thẳng trên mảng float32 của AudioBuffer.
+Trả về offset (ms) để map timestamp của Whisper về timeline gốc.
+"""
+
+import numpy as np
+
+# Thang int16 của AudioBuffer.from_segment (samples = pcm / 32768)
+_FULL_SCALE = 32768.0
+
+
+def _segment_len_ms(n_samples, sr):
+    """Độ dài (ms) giống len(AudioSegment)"""
+    return int(round(1000.0 * n_samples / sr))
+
+
+def _ms_bounds(seg_len, sr):
+    """Chỉ số sample bắt đầu của từng ms (giống AudioSegment._parse_position)"""
+    return (np.arange(seg_len + 1, dtype=np.int64) * sr) // 1000
+
+
+def detect_silence_ms(samples, sr, min_silence_len=1000, silence_thresh=-16):
+    """Các đoạn im lặng [start_ms, end_ms] - kết quả trùng pydub.silence.detect_silence (seek_step=1)"""
+    seg_len = _segment_len_ms(len(samples), sr)
+    if seg_len < min_silence_len or min_silence_len <= 0:
+        return []
+
+    # Cumsum bình phương (int64, thang int16 → chính xác tuyệt đối như audioop.rms)
+    bounds = _ms_bounds(seg_len, sr)
+    pcm = np.rint(np.asarray(samples, dtype=np.float64) * _FULL_SCALE).astype(np.int64)
+    if len(pcm) < bounds[-1]:
+        pcm = np.pad(pcm, (0, int(bounds[-1]) - len(pcm)))  # pydub cũng pad 0 phần thiếu ở ms cuối
+    csum = np.concatenate(([0], np.cumsum(pcm * pcm)))
+
+    # Năng lượng cửa sổ [i, i + min_silence_len) cho mọi i (thay vì cắt lại từng lát 1ms)
+    lo, hi = bounds[:-min_silence_len], bounds[min_silence_len:]
+    window = csum[hi] - csum[lo]
+    rms = np.floor(np.sqrt(window / np.maximum(hi - lo, 1)))
+    threshold = (10 ** (silence_thresh / 20.0)) * _FULL_SCALE
+
+    starts = np.flatnonzero(rms <= threshold)
+    if starts.size == 0:
+        return []
+
+    # Gộp như pydub: lát sau cách lát trước > min_silence_len mới mở đoạn mới
+    breaks = np.flatnonzero(np.diff(starts) > min_silence_len)
+    firsts = np.concatenate(([starts[0]], starts[breaks + 1]))
+    lasts = np.concatenate((starts[breaks], [starts[-1]]))
+    return [[int(a), int(b) + min_silence_len] for a, b in zip(firsts, lasts)]
+
+
+def detect_nonsilent_ms(samples, sr, min_silence_len=1000, silence_thresh=-16):
+    """Các đoạn có tiếng [start_ms, end_ms] - trùng pydub.silence.detect_nonsilent"""
+    seg_len = _segment_len_ms(len(samples), sr)
+    silent = detect_silence_ms(samples, sr, min_silence_len, silence_thresh)
+    if not silent:
+        return [[0, seg_len]]
+    if silent[0][0] == 0 and silent[0][1] == seg_len:
+        return []
+
+    ranges, prev_end = [], 0
+    for start, end in silent:
+        ranges.append([prev_end, start])
+        prev_end = end
+    if silent[-1][1] != seg_len:
+        ranges.append([prev_end, seg_len])
+    if ranges[0] == [0, 0]:
+        ranges.pop(0)
+    return ranges
+
+
+def trim_offsets_ms(samples, sr, silence_thresh=-40, min_silence_len=500):
+    """(start_ms, end_ms) sau khi cắt im lặng đầu/cuối (toàn bộ nếu không tìm thấy tiếng)"""
+    ranges = detect_nonsilent_ms(samples, sr, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
+    if ranges:
+        return ranges[0][0], ranges[-1][1]
+    return 0, _segment_len_ms(len(samples), sr)
+
+
+def trim_buffer(audio, sr=16000, silence_thresh=-40, min_silence_len=500):
+    """
+    Cắt im lặng trên AudioBuffer (memo theo buffer) → (samples đã cắt, offset giây).
+    Cộng offset vào timestamp của ASR để quay về timeline của file gốc.
+    """
+    def _compute():
+        y = audio.resampled(sr)
+        start_ms, end_ms = trim_offsets_ms(y, sr, silence_thresh=silence_thresh, min_silence_len=min_silence_len)
+        bounds = _ms_bounds(end_ms, sr)
+        return y[int(bounds[start_ms]):int(bounds[end_ms])], start_ms / 1000.0
+
+    return audio.memo(("trim_silence", sr, silence_thresh, min_silence_len), _compute)
@@ -12,13 +12,15 @@ Features:
 
 import os
 import json
-import joblib
-import librosa
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
 import re
+from services.audio_buffer import AudioBuffer
+from services.model_registry import get_model
+from services.spectral_frontend import extract_speaking_features_cached
+from services.speaking_model_runner import SpeakingModelRunner
 
 load_dotenv()
 
@@ -29,19 +31,23 @@ MODEL_DIR = Path(__file__).parent.parent / "Random_forest"
 SPEAKING_MODEL_PATH = MODEL_DIR / "alex_speaking_brain_pro.joblib"
 
 try:
-    speaking_model = joblib.load(str(SPEAKING_MODEL_PATH))
+    speaking_model = get_model("speaking")  # cùng object với app.py (không load lần 2)
+    if speaking_model is None:
+        raise FileNotFoundError(str(SPEAKING_MODEL_PATH))
+    speaking_runner = SpeakingModelRunner(speaking_model)
     print(f"✅ [HYBRID] XGBoost Speaking Model loaded from: {SPEAKING_MODEL_PATH}")
     HAS_SPEAKING_MODEL = True
 except Exception as e:
     print(f"⚠️ [HYBRID] Failed to load XGBoost model: {e}")
     speaking_model = None
+    speaking_runner = None
     HAS_SPEAKING_MODEL = False
 
 
 # ==========================================
 # 2. ACOUSTIC FEATURES EXTRACTION (44 features)
 # ==========================================
-def extract_acoustic_features(audio_path):
+def extract_acoustic_features(audio_path, audio=None, pitch_engine=None):
     """
     Trích xuất 44 đặc trưng âm học cho XGBoost
     
@@ -54,48 +60,16 @@ def extract_acoustic_features(audio_path):
     Total: 44 features
     """
     try:
-        if not os.path.exists(audio_path):
+        if audio is None and not os.path.exists(audio_path):
             return None
 
-        # Load audio (16kHz mono)
-        y, sr = librosa.load(audio_path, sr=16000)
-
-        # 1. MFCC Analysis (13 chiều)
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        mfcc_delta = librosa.feature.delta(mfccs)
-        mfcc_delta2 = librosa.feature.delta(mfccs, order=2)
-
-        # 2. Pitch Analysis (F0 + Jitter)
-        f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=65, fmax=2093, sr=sr)
-        f0_clean = f0[~np.isnan(f0)]
-        pitch_mean = np.mean(f0_clean) if len(f0_clean) > 0 else 0
-        jitter = (np.std(f0_clean) / np.mean(f0_clean)) if len(f0_clean) > 0 and np.mean(f0_clean) > 0 else 0
-
-        # 3. Energy Analysis (RMS + Shimmer)
-        rms = librosa.feature.rms(y=y)[0]
-        energy_mean = np.mean(rms)
-        shimmer = (np.std(rms) / np.mean(rms)) if np.mean(rms) > 0 else 0
-
-        # 4. Fluency Analysis (Silence Ratio)
-        non_silent = librosa.effects.split(y, top_db=30)
-        total_dur = len(y) / sr
-        speech_dur = sum([(e - s) / sr for s, e in non_silent])
-        silence_ratio = (total_dur - speech_dur) / total_dur if total_dur > 0 else 0
-
-        # Build feature dictionary
-        features = {
-            "pitch_mean": pitch_mean,
-            "jitter": jitter,
-            "energy_mean": energy_mean,
-            "shimmer": shimmer,
-            "silence_ratio": silence_ratio
-        }
+        # Load audio (16kHz mono) - dùng buffer đã decode nếu có
+        if audio is None:
+            audio = AudioBuffer.from_file(audio_path)
 
-        # Add 13 MFCCs + Deltas
-        for i in range(13):
-            features[f"mfcc_{i}"] = np.mean(mfccs[i])
-            features[f"delta_{i}"] = np.mean(mfcc_delta[i])
-            features[f"delta2_{i}"] = np.mean(mfcc_delta2[i])
+        # MFCC/Delta/Delta², RMS + Shimmer, Silence Ratio từ 1 lần STFT;
+        # Pitch + Jitter từ pitch track dùng chung với các stage khác
+        features = extract_speaking_features_cached(audio, pitch_engine=pitch_engine)
 
         return features
 
@@ -123,11 +97,8 @@ def score_with_xgboost(features_dict):
         }
 
     try:
-        # Convert to DataFrame
-        df = pd.DataFrame([features_dict])
-
-        # Predict
-        prediction = speaking_model.predict(df)[0]
+        # Predict (vector float32 theo thứ tự feature của model, không dựng DataFrame)
+        prediction = speaking_runner.predict(features_dict)
 
         # Normalize to 0-10 scale (nếu model trả về scale khác)
         score = float(np.clip(prediction, 0, 10))
@@ -302,7 +273,8 @@ IMPORTANT:
 # ==========================================
 # 6. MAIN HYBRID EVALUATION FUNCTION
 # ==========================================
-def evaluate_speaking_hybrid(audio_path, transcript, target_question="", gemini_service=None):
+def evaluate_speaking_hybrid(audio_path, transcript, target_question="", gemini_service=None, audio=None, pitch_engine=None,
+                             features=None):
     """
     Main function: Evaluate speaking with hybrid XGBoost + Gemini
     
@@ -311,6 +283,9 @@ def evaluate_speaking_hybrid(audio_path, transcript, target_question="", gemini_
         transcript: Transcribed text
         target_question: The speaking prompt
         gemini_service: Gemini service instance (optional)
+        audio: AudioBuffer đã decode sẵn (optional)
+        pitch_engine: pyin / yin / autocorr (optional, mặc định theo PITCH_ENGINE)
+        features: 44 features đã trích xuất sẵn (optional, vd. từ speaking pipeline)
     
     Returns:
         {
@@ -329,7 +304,8 @@ def evaluate_speaking_hybrid(audio_path, transcript, target_question="", gemini_
     }
 
     # ===== STEP 1: Extract Features =====
-    features = extract_acoustic_features(audio_path)
+    if features is None:
+        features = extract_acoustic_features(audio_path, audio=audio, pitch_engine=pitch_engine)
     if not features:
         return {
             **result,
@@ -0,0 +1,111 @@
+"""
+⚡ SPEAKING MODEL RUNNER - Suy luận XGBoost không qua DataFrame
+===============================================================
+Trước đây mỗi request gọi speaking_model.predict(pd.DataFrame([features])): dựng
+DataFrame 1 dòng, sklearn API kiểm tra tên cột, tạo DMatrix... tốn nhiều hơn cả
+việc duyệt cây. Runner này:
+- Lấy thứ tự feature 1 lần từ model đã train (feature_names_in_ / booster.feature_names)
+- Dựng vector float32 liền mạch thẳng từ dict feature
+- Gọi Booster.inplace_predict (không DMatrix, không DataFrame)
+- predict_batch: nhiều bản ghi trong 1 lần gọi
+- Chỉ nhận booster 1 output (hồi quy điểm): multi-output / multi-class → ValueError
+  thay vì lặng lẽ lấy cột đầu
+Model không phải XGBoost → fallback DataFrame như cũ.
+So sánh độ trễ: scripts/benchmark_speaking_model.py
+"""
+
+import json
+
+import numpy as np
+
+from services.spectral_frontend import N_MFCC
+
+
+def default_feature_order():
+    """Thứ tự key của SpectralAnalysis.speaking_features (= thứ tự cột lúc train)"""
+    order = ["pitch_mean", "jitter", "energy_mean", "shimmer", "silence_ratio"]
+    for i in range(N_MFCC):
+        order += [f"mfcc_{i}", f"delta_{i}", f"delta2_{i}"]
+    return order
+
+
+def _booster_outputs(booster):
+    """Số output / bản ghi theo config booster (None nếu không đọc được config)"""
+    try:
+        param = json.loads(booster.save_config())["learner"]["learner_model_param"]
+        return max(int(param.get("num_target", 1) or 1), int(param.get("num_class", 0) or 0), 1)
+    except Exception:
+        return None
+
+
+class SpeakingModelRunner:
+    def __init__(self, model):
+        self.model = model
+        self.booster = None
+        self.missing = np.nan
+        self.iteration_range = None
+        try:
+            # sklearn API (XGBRegressor) hoặc Booster thuần
+            self.booster = model.get_booster() if hasattr(model, "get_booster") else None
+            if self.booster is None and type(model).__name__ == "Booster":
+                self.booster = model
+        except Exception as e:
+            print(f"⚠️ [SPEAKING MODEL] Không lấy được booster, dùng DataFrame: {e}")
+
+        if self.booster is not None:
+            outputs = _booster_outputs(self.booster)
+            if outputs is not None and outputs != 1:
+                raise ValueError(f"Speaking model phải có 1 output (điểm), booster có {outputs}")
+
+        names = getattr(model, "feature_names_in_", None)
+        if names is None and self.booster is not None:
+            names = self.booster.feature_names
+        self.feature_names = [str(n) for n in names] if names is not None else default_feature_order()
+
+        if self.booster is not None and self.booster is not model:
+            missing = getattr(model, "missing", None)
+            self.missing = np.nan if missing is None else missing
+            # Giống XGBRegressor.predict: dừng ở best_iteration nếu train có early stopping
+            try:
+                best = model.best_iteration
+                self.iteration_range = (0, int(best) + 1) if best is not None else None
+            except AttributeError:
+                self.iteration_range = None
+
+    @property
+    def dtype(self):
+        # XGBoost vốn ép float32 (DMatrix) → đưa float32 sẵn; model khác giữ float64 như DataFrame
+        return np.float32 if self.booster is not None else np.float64
+
+    @property
+    def mode(self):
+        return "inplace" if self.booster is not None else "dataframe"
+
+    def vector(self, features):
+        """dict → mảng (1, n_features) đúng thứ tự lúc train (thiếu key → KeyError như DataFrame)"""
+        return np.array([[features[name] for name in self.feature_names]], dtype=self.dtype)
+
+    def matrix(self, rows):
+        return np.array([[row[name] for name in self.feature_names] for row in rows], dtype=self.dtype)
+
+    def _predict(self, X):
+        if self.booster is None:
+            import pandas as pd
+            return np.asarray(self.model.predict(pd.DataFrame(X, columns=self.feature_names)))
+        options = {"missing": self.missing}
+        if self.iteration_range:
+            options["iteration_range"] = self.iteration_range
+        pred = np.asarray(self.booster.inplace_predict(X, **options)).reshape(len(X), -1)
+        if pred.shape[1] != 1:
+            raise ValueError(f"Speaking model trả {pred.shape[1]} giá trị / bản ghi, cần đúng 1")
+        return pred[:, 0]
+
+    def predict(self, features):
+        """Điểm (float) của 1 bản ghi từ dict 44 feature"""
+        return float(self._predict(self.vector(features))[0])
+
+    def predict_batch(self, rows):
+        """Điểm của nhiều bản ghi trong 1 lần gọi booster → np.ndarray"""
+        if not rows:
+            return np.zeros(0, dtype=np.float32)
+        return self._predict(self.matrix(rows))
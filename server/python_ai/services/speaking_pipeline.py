@@ -0,0 +1,209 @@
+"""
+🧩 SPEAKING PIPELINE - Chạy các stage chấm điểm theo DAG phụ thuộc
+=================================================================
+/api/speaking/check, check-stream, speaking-practice/evaluate, live/end và
+evaluate-hybrid trước đây mỗi endpoint tự viết lại chuỗi decode → STT → pitch →
+features → XGBoost → language quality → Gemini assist → heatmap → overlay → BKT
+với mức song song khác nhau (check-stream chạy tuần tự hết). Ở đây:
+- Stage(name, fn, deps): fn(ctx) nhận dict gồm input + kết quả các stage trước
+- Stage chạy ngay khi đủ input (vd. LanguageTool bắt đầu ngay khi có
+  transcript, trong lúc pYIN còn chạy); inline=True → chạy ngay trên thread điều phối
+  (stage rẻ, không chiếm executor)
+- Input trùng tên stage = kết quả có sẵn (vd. live/end đã có transcript) → stage bị bỏ qua
+- targets: chỉ chạy các stage cần cho output được xin
+- Thời gian từng stage ghi vào PipelineRun.timings + thống kê gộp (perf-stats)
+- stream(): yield từng stage ngay khi xong (check-stream đẩy SSE theo từng artifact)
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class Stage:
+    def __init__(self, name, fn, deps=(), inline=False):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.inline = inline
+
+
+class PipelineRun:
+    """Kết quả 1 lần chạy: run["stt"], run.timings (giây / stage), run.elapsed"""
+
+    def __init__(self, results, timings, elapsed):
+        self.results = results
+        self.timings = timings
+        self.elapsed = elapsed
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+    def timings_ms(self):
+        return {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+
+
+class Pipeline:
+    def __init__(self, stages, executor=None, name="pipeline"):
+        self.name = name
+        self.executor = executor
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Stage '{stage.name}' bị khai báo 2 lần")
+            self.stages[stage.name] = stage
+        self.order = self._topological_order()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"runs": 0, "errors": 0, "wall_seconds": 0.0, "stages": {}}
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline có vòng phụ thuộc: {' → '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                if dep not in self.stages:
+                    continue  # dep là input của request, không phải stage
+                visit(dep, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def required(self, targets=None, provided=()):
+        """Tập stage cần chạy để có targets (bỏ qua stage đã có sẵn trong input)"""
+        if targets is None:
+            targets = list(self.stages)
+        needed, stack = set(), [t for t in targets if t in self.stages]
+        while stack:
+            name = stack.pop()
+            if name in needed or name in provided:
+                continue
+            needed.add(name)
+            stack.extend(dep for dep in self.stages[name].deps if dep in self.stages)
+        return needed
+
+    def _record(self, name, seconds, failed=False):
+        with self._stats_lock:
+            entry = self._stats["stages"].setdefault(name, {"runs": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0})
+            entry["runs"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            if failed:
+                entry["errors"] += 1
+
+    def _execute(self, stage, ctx):
+        t0 = time.perf_counter()
+        try:
+            value = stage.fn(ctx)
+        except Exception:
+            self._record(stage.name, time.perf_counter() - t0, failed=True)
+            raise
+        seconds = time.perf_counter() - t0
+        self._record(stage.name, seconds)
+        return value, seconds
+
+    def run(self, inputs, targets=None, on_stage=None):
+        """Chạy DAG → PipelineRun. on_stage(name, value, ctx): gọi trên thread điều phối mỗi khi 1 stage xong"""
+        stages = self.stream(inputs, targets=targets)
+        while True:
+            try:
+                name, value, ctx = next(stages)
+            except StopIteration as stop:
+                return stop.value
+            if on_stage is not None:
+                on_stage(name, value, ctx)
+
+    def stream(self, inputs, targets=None):
+        """Generator: yield (name, value, ctx) ngay khi từng stage xong, return PipelineRun (StopIteration.value).
+        Đóng generator giữa chừng (client SSE ngắt) → huỷ các stage chưa bắt đầu"""
+        t_start = time.perf_counter()
+        ctx = dict(inputs)
+        needed = self.required(targets, provided=ctx)
+        missing = {
+            dep for name in needed for dep in self.stages[name].deps
+            if dep not in self.stages and dep not in ctx
+        }
+        if missing:
+            raise KeyError(f"Thiếu input cho pipeline '{self.name}': {sorted(missing)}")
+
+        timings, running, started = {}, {}, set()
+        completed = False
+
+        try:
+            while True:
+                finished = []
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in self.order:
+                        if name not in needed or name in started:
+                            continue
+                        stage = self.stages[name]
+                        if not all(dep in ctx for dep in stage.deps):
+                            continue
+                        started.add(name)
+                        if stage.inline or self.executor is None:
+                            value, timings[name] = self._execute(stage, ctx)
+                            ctx[name] = value
+                            finished.append(name)
+                            progressed = True  # có thể mở khoá stage khác ngay
+                        else:
+                            running[self.executor.submit(self._execute, stage, ctx)] = name
+
+                # Stage executor đã submit hết rồi mới trả kết quả inline → consumer không làm chậm DAG
+                for name in finished:
+                    yield name, ctx[name], ctx
+
+                if not running:
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    ctx[name], timings[name] = future.result()
+                    yield name, ctx[name], ctx
+            completed = True
+        except Exception:
+            with self._stats_lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            if not completed:
+                for future in running:
+                    future.cancel()
+
+        elapsed = time.perf_counter() - t_start
+        with self._stats_lock:
+            self._stats["runs"] += 1
+            self._stats["wall_seconds"] += elapsed
+        return PipelineRun(ctx, timings, elapsed)
+
+    def stats(self):
+        with self._stats_lock:
+            runs = self._stats["runs"]
+            stages = {
+                name: {
+                    "runs": s["runs"],
+                    "errors": s["errors"],
+                    "avg_ms": round(s["seconds"] / s["runs"] * 1000, 1) if s["runs"] else 0.0,
+                    "max_ms": round(s["max_seconds"] * 1000, 1)
+                }
+                for name, s in self._stats["stages"].items()
+            }
+            return {
+                "name": self.name,
+                "runs": runs,
+                "errors": self._stats["errors"],
+                "avg_wall_ms": round(self._stats["wall_seconds"] / runs * 1000, 1) if runs else 0.0,
+                "stages": stages
+            }
@@ -0,0 +1,254 @@
+"""
+🌈 SPECTRAL FRONT-END - 1 lần framing/STFT cho MFCC, RMS và silence split
+==========================================================================
+Trước đây mỗi extractor tự làm: melspectrogram (STFT) cho MFCC, rồi
+librosa.feature.rms và librosa.effects.split mỗi cái 1 lần framing riêng,
+AnalyticService còn load lại file ở 22050Hz để split thêm lần nữa.
+
+Ở đây tín hiệu được cắt frame 1 lần (center=True, pad 0 như librosa):
+- RMS lấy trực tiếp từ frame (= librosa.feature.rms)
+- STFT = rfft(frame * hann) (= librosa.stft) → Mel → MFCC → delta, delta²
+- Khoảng non-silent suy ra từ chính RMS đó (= librosa.effects.split, top_db=30)
+Kết quả memo trên AudioBuffer nên mọi consumer trong request dùng chung.
+
+Bài dài (Part 2, mock test vài phút): framing cả bài 1 lần tạo ma trận frame/STFT
+hàng trăm MB. Khi audio > 2 cửa sổ ANALYSIS_WINDOW_SECONDS, front-end chạy theo từng
+cửa sổ (± vài frame ngữ cảnh cho delta) và cộng dồn tổng MFCC/delta → bộ nhớ đỉnh
+chỉ phụ thuộc độ dài cửa sổ. MAX_ANALYSIS_SECONDS giới hạn phần audio được phân tích.
+"""
+
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from services.artifact_cache import analysis_cache, make_cache_key
+from services.audio_process_pool import run_audio_stage
+from services.pitch_service import PITCH_HOP_LENGTH, PITCH_SR, analyze_pitch, pitch_region_mode, resolve_engine
+
+FEATURE_SR = 16000
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 13
+SILENCE_TOP_DB = 30
+POWER_TOP_DB = 80.0  # như librosa.power_to_db mặc định
+DELTA_WIDTH = 9
+DELTA_CONTEXT = DELTA_WIDTH // 2
+
+load_dotenv()
+
+ANALYSIS_WINDOW_SECONDS = float(os.getenv("ANALYSIS_WINDOW_SECONDS", "30"))
+MAX_ANALYSIS_SECONDS = float(os.getenv("MAX_ANALYSIS_SECONDS", "360"))
+
+_mel_basis_cache = {}
+
+
+def _mel_basis(sr, n_fft=N_FFT, n_mels=N_MELS):
+    key = (sr, n_fft, n_mels)
+    if key not in _mel_basis_cache:
+        import librosa
+        _mel_basis_cache[key] = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    return _mel_basis_cache[key]
+
+
+def _frames_to_intervals(non_silent, hop_length, n_samples):
+    """Giống librosa.effects.split: mask frame → [start, end] theo sample"""
+    if non_silent.size == 0:
+        return np.zeros((0, 2), dtype=int)
+    edges = [np.flatnonzero(np.diff(non_silent.astype(int))) + 1]
+    if non_silent[0]:
+        edges.insert(0, np.array([0]))
+    if non_silent[-1]:
+        edges.append(np.array([len(non_silent)]))
+    edges = np.concatenate(edges) * hop_length
+    edges = np.minimum(edges, n_samples)
+    return edges.reshape((-1, 2))
+
+
+class SpectralAnalysis:
+    """Kết quả front-end: RMS, MFCC(+delta) means, khoảng non-silent"""
+
+    def __init__(self, rms, coeff_means, intervals, n_samples, sr):
+        self.rms = rms
+        self.coeff_means = coeff_means  # (3, N_MFCC): mfcc, delta, delta2
+        self.intervals = intervals
+        self.n_samples = n_samples
+        self.sr = sr
+
+    @property
+    def total_duration(self):
+        return self.n_samples / float(self.sr) if self.sr else 0.0
+
+    @property
+    def speech_duration(self):
+        return float(np.sum(self.intervals[:, 1] - self.intervals[:, 0])) / self.sr if len(self.intervals) else 0.0
+
+    @property
+    def silence_ratio(self):
+        total = self.total_duration
+        return (total - self.speech_duration) / total if total > 0 else 0
+
+    @property
+    def energy_mean(self):
+        return float(np.mean(self.rms)) if self.rms.size else 0.0
+
+    @property
+    def shimmer(self):
+        mean = self.energy_mean
+        return float(np.std(self.rms) / mean) if mean > 0 else 0
+
+    def speaking_features(self, pitch_track, regions=None):
+        """Đúng 44 key (cùng thứ tự) mà speaking_model XGBoost được train (regions: SpeechRegions dùng chung)"""
+        feat = {
+            "pitch_mean": pitch_track.pitch_mean,
+            "jitter": pitch_track.jitter,
+            "energy_mean": self.energy_mean,
+            "shimmer": self.shimmer,
+            "silence_ratio": regions.silence_ratio if regions is not None else self.silence_ratio
+        }
+        mfcc_means, delta_means, delta2_means = self.coeff_means
+        for i in range(N_MFCC):
+            feat[f"mfcc_{i}"] = float(mfcc_means[i])
+            feat[f"delta_{i}"] = float(delta_means[i])
+            feat[f"delta2_{i}"] = float(delta2_means[i])
+        return feat
+
+    def fluency_stats(self, regions=None):
+        """Cùng format với AnalyticService.extract_fluency_features (regions: SpeechRegions dùng chung)"""
+        source = regions if regions is not None else self
+        total_duration = source.total_duration
+        speech_duration = source.speech_duration
+        silence_duration = total_duration - speech_duration
+        num_pauses = len(source.intervals) - 1 if len(source.intervals) > 0 else 0
+        return {
+            "total_duration": round(total_duration, 2),
+            "speech_duration": round(speech_duration, 2),
+            "silence_duration": round(silence_duration, 2),
+            "num_pauses": num_pauses,
+            "silence_ratio": round(silence_duration / total_duration if total_duration > 0 else 0, 2)
+        }
+
+
+def cap_samples(y, sr, max_seconds=MAX_ANALYSIS_SECONDS):
+    """Chỉ giữ MAX_ANALYSIS_SECONDS giây đầu (0 / None = không giới hạn)"""
+    if max_seconds and len(y) > int(max_seconds * sr):
+        print(f"✂️ [ANALYSIS] Audio {len(y) / float(sr):.0f}s > {max_seconds:.0f}s, chỉ phân tích {max_seconds:.0f}s đầu")
+        return y[:int(max_seconds * sr)]
+    return y
+
+
+def _log_mel_window(y_pad, first, last, n_fft, hop_length, window, mel_basis):
+    """RMS + log-mel (chưa clip top_db) cho các frame [first, last) của tín hiệu đã pad"""
+    import librosa
+    chunk = y_pad[first * hop_length:(last - 1) * hop_length + n_fft]
+    frames = librosa.util.frame(chunk, frame_length=n_fft, hop_length=hop_length)
+    rms = np.sqrt(np.mean(frames ** 2, axis=0))
+    power = np.abs(np.fft.rfft(frames * window[:, None], axis=0)) ** 2
+    log_mel = 10.0 * np.log10(np.maximum(1e-10, mel_basis @ power))
+    return rms, log_mel
+
+
+def _windowed_spectral_analysis(y, sr, n_fft, hop_length, top_db, window_seconds):
+    """
+    Như compute_spectral_analysis nhưng theo cửa sổ: chỉ giữ RMS (1 số / frame) và
+    tổng MFCC/delta/delta² cộng dồn. Delta tính trên cửa sổ ± DELTA_CONTEXT frame rồi
+    bỏ phần ngữ cảnh → khớp bản toàn cục; clip top_db của power_to_db dùng max tới hiện tại.
+    """
+    import librosa
+
+    y_pad = np.pad(y, n_fft // 2, mode="constant")
+    n_frames = 1 + len(y) // hop_length
+    per_window = max(int(window_seconds * sr / hop_length), DELTA_WIDTH)
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    mel_basis = _mel_basis(sr, n_fft)
+
+    rms = np.empty(n_frames, dtype=np.float32)
+    sums = np.zeros((3, N_MFCC))
+    running_max = -np.inf
+    start = 0
+    while start < n_frames:
+        end = min(start + per_window, n_frames)
+        if n_frames - end < DELTA_WIDTH:
+            end = n_frames  # gộp mẩu cuối quá ngắn vào cửa sổ hiện tại
+        lo, hi = max(0, start - DELTA_CONTEXT), min(n_frames, end + DELTA_CONTEXT)
+        win_rms, log_mel = _log_mel_window(y_pad, lo, hi, n_fft, hop_length, window, mel_basis)
+        rms[start:end] = win_rms[start - lo:end - lo]
+
+        running_max = max(running_max, float(log_mel.max()))
+        mfccs = librosa.feature.mfcc(S=np.maximum(log_mel, running_max - POWER_TOP_DB), n_mfcc=N_MFCC)
+        keep = slice(start - lo, end - lo)
+        sums[0] += mfccs[:, keep].sum(axis=1)
+        sums[1] += librosa.feature.delta(mfccs, width=DELTA_WIDTH)[:, keep].sum(axis=1)
+        sums[2] += librosa.feature.delta(mfccs, width=DELTA_WIDTH, order=2)[:, keep].sum(axis=1)
+        start = end
+
+    db = librosa.amplitude_to_db(rms, ref=np.max, top_db=None) if rms.size else rms
+    intervals = _frames_to_intervals(db > -top_db, hop_length, len(y))
+    return SpectralAnalysis(rms, sums / n_frames, intervals, len(y), sr)
+
+
+def compute_spectral_analysis(y, sr=FEATURE_SR, n_fft=N_FFT, hop_length=HOP_LENGTH, top_db=SILENCE_TOP_DB,
+                              max_seconds=None, window_seconds=None):
+    """
+    Framing 1 lần → RMS + STFT → MFCC/delta/delta² + silence split.
+    max_seconds: cắt bớt audio quá dài; window_seconds: audio > 2 cửa sổ thì chạy theo cửa sổ.
+    """
+    import librosa
+
+    y = cap_samples(np.asarray(y, dtype=np.float32), sr, max_seconds)
+    if window_seconds and len(y) > 2 * window_seconds * sr:
+        return _windowed_spectral_analysis(y, sr, n_fft, hop_length, top_db, window_seconds)
+
+    y_pad = np.pad(y, n_fft // 2, mode="constant")
+    frames = librosa.util.frame(y_pad, frame_length=n_fft, hop_length=hop_length)
+
+    # 1. RMS (Energy/Shimmer) ngay trên frame
+    rms = np.sqrt(np.mean(frames ** 2, axis=0))
+
+    # 2. STFT từ cùng frame → Mel power → MFCC
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames * window[:, None], axis=0)) ** 2
+    mel = _mel_basis(sr, n_fft) @ power
+    mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+    mfcc_delta = librosa.feature.delta(mfccs)
+    mfcc_delta2 = librosa.feature.delta(mfccs, order=2)
+
+    # 3. 39 trung bình theo hệ số trong 1 lần reduce
+    coeff_means = np.stack([mfccs, mfcc_delta, mfcc_delta2]).mean(axis=2)
+
+    # 4. Silence split từ chính RMS ở trên (top_db so với frame to nhất)
+    db = librosa.amplitude_to_db(rms, ref=np.max, top_db=None) if rms.size else rms
+    intervals = _frames_to_intervals(db > -top_db, hop_length, len(y))
+
+    return SpectralAnalysis(rms, coeff_means, intervals, len(y), sr)
+
+
+def analyze_spectrum(audio, sr=FEATURE_SR):
+    """SpectralAnalysis của AudioBuffer (memo: tính 1 lần / request)"""
+    def _compute():
+        params = {"max_seconds": MAX_ANALYSIS_SECONDS, "window_seconds": ANALYSIS_WINDOW_SECONDS}
+        return run_audio_stage(
+            "spectrum", audio, sr, params, lambda: compute_spectral_analysis(audio.resampled(sr), sr=sr, **params)
+        )
+
+    return audio.memo(("spectrum", sr), _compute)
+
+
+def extract_speaking_features(audio, pitch_engine=None):
+    """44 đặc trưng XGBoost từ pitch track + spectral front-end + VAD dùng chung"""
+    from services.speech_vad import speech_regions
+    return analyze_spectrum(audio).speaking_features(analyze_pitch(audio, engine=pitch_engine), regions=speech_regions(audio))
+
+
+def extract_speaking_features_cached(audio, pitch_engine=None):
+    """extract_speaking_features qua artifact cache (key = hash nội dung + engine/sr/hop/VAD)"""
+    from services.speech_vad import resolve_vad_method
+    engine = resolve_engine(pitch_engine)
+    cache_key = make_cache_key(
+        "speaking_features", audio.content_hash,
+        pitch_engine=engine, pitch_sr=PITCH_SR, pitch_hop=PITCH_HOP_LENGTH, pitch_regions=pitch_region_mode(),
+        vad=resolve_vad_method(), sr=FEATURE_SR, n_fft=N_FFT, hop_length=HOP_LENGTH,
+        max_seconds=MAX_ANALYSIS_SECONDS
+    )
+    return analysis_cache.get_or_compute(cache_key, lambda: extract_speaking_features(audio, pitch_engine=engine))
@@ -0,0 +1,118 @@
+"""
+🗣️ SPEECH VAD - 1 kết quả VAD dùng chung cho pitch, features và fluency
+=======================================================================
+Trước đây pYIN / autocorr chạy trên cả bản ghi (kể cả 30-50% im lặng), còn
+silence_ratio lại tính bằng 1 phép split riêng. Ở đây các đoạn có tiếng được tính
+1 lần / AudioBuffer rồi publish cho mọi stage:
+- energy (mặc định): chính khoảng non-silent của spectral front-end (top_db=30)
+  → silence_ratio giữ nguyên như lúc train XGBoost, không tốn thêm lần framing nào
+- silero: VAD Silero của faster-whisper (chính xác hơn với nhiễu nền, cần faster-whisper).
+  silence_ratio là feature của XGBoost → đổi sang silero làm điểm lệch so với lúc train
+Với PITCH_SPEECH_ONLY=1 (mặc định tắt, xem pitch_service) pitch tracker chỉ chạy trên
+các đoạn này (có pad thêm ngữ cảnh), frame ngoài đoạn = unvoiced.
+"""
+
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SPEECH_VAD = os.getenv("SPEECH_VAD", "energy").strip().lower()
+SPEECH_VAD_METHODS = ("energy", "silero")
+# Pad mỗi đoạn khi chạy pitch (pYIN cần ngữ cảnh ở biên) + gộp đoạn gần nhau
+SPEECH_VAD_PAD_MS = int(os.getenv("SPEECH_VAD_PAD_MS", "100"))
+SPEECH_VAD_MIN_SILENCE_MS = 300
+SILERO_SR = 16000
+
+
+class SpeechRegions:
+    """Các đoạn có tiếng [start, end) theo sample ở sr của VAD"""
+
+    def __init__(self, intervals, sr, n_samples, method):
+        self.intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+        self.sr = sr
+        self.n_samples = n_samples
+        self.method = method
+
+    @property
+    def total_duration(self):
+        return self.n_samples / float(self.sr) if self.sr else 0.0
+
+    @property
+    def speech_duration(self):
+        if not len(self.intervals):
+            return 0.0
+        return float(np.sum(self.intervals[:, 1] - self.intervals[:, 0])) / self.sr
+
+    @property
+    def silence_ratio(self):
+        total = self.total_duration
+        return (total - self.speech_duration) / total if total > 0 else 0
+
+    def at(self, sr, pad_ms=0, n_samples=None):
+        """Đổi sang sample của sr khác, pad 2 đầu và gộp các đoạn chồng nhau → [(start, end)]"""
+        if not len(self.intervals):
+            return []
+        n_samples = n_samples if n_samples is not None else int(round(self.n_samples * sr / float(self.sr)))
+        pad = int(sr * pad_ms / 1000)
+        scaled = np.round(self.intervals * (sr / float(self.sr))).astype(np.int64)
+        merged = []
+        for start, end in scaled:
+            start, end = max(0, int(start) - pad), min(n_samples, int(end) + pad)
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(s, e) for s, e in merged]
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "speech_duration": round(self.speech_duration, 2),
+            "silence_ratio": round(self.silence_ratio, 3),
+            "segments": [
+                {"start": round(s / self.sr, 3), "end": round(e / self.sr, 3)} for s, e in self.intervals
+            ]
+        }
+
+
+def resolve_vad_method(method=None):
+    name = (method or SPEECH_VAD or "energy").strip().lower()
+    if name not in SPEECH_VAD_METHODS:
+        print(f"⚠️ [VAD] Method '{name}' không hợp lệ, dùng energy")
+        name = "energy"
+    return name
+
+
+def _energy_regions(audio):
+    from services.spectral_frontend import analyze_spectrum
+    spectrum = analyze_spectrum(audio)
+    return SpeechRegions(spectrum.intervals, spectrum.sr, spectrum.n_samples, "energy")
+
+
+def _silero_regions(audio):
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    y = audio.resampled(SILERO_SR)
+    options = VadOptions(min_silence_duration_ms=SPEECH_VAD_MIN_SILENCE_MS, speech_pad_ms=0)
+    clips = get_speech_timestamps(y, options, sampling_rate=SILERO_SR)
+    intervals = [(int(c["start"]), int(c["end"])) for c in clips]
+    return SpeechRegions(intervals, SILERO_SR, len(y), "silero")
+
+
+def speech_regions(audio, method=None):
+    """SpeechRegions của AudioBuffer (memo: tính 1 lần / buffer / method). Silero lỗi → energy"""
+    method = resolve_vad_method(method)
+
+    def _compute():
+        if method == "silero":
+            try:
+                return _silero_regions(audio)
+            except Exception as e:
+                print(f"⚠️ [VAD] Silero lỗi, dùng energy VAD: {e}")
+        return _energy_regions(audio)
+
+    return audio.memo(("speech_regions", method), _compute)
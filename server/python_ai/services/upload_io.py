@@ -0,0 +1,157 @@
+"""
+📥 UPLOAD I/O - Nhận file audio upload không qua ổ đĩa
+=====================================================
+AUDIO_IO_MODE:
+- memory   (mặc định): đọc bytes upload → AudioBuffer.from_bytes → numpy, decode ngay
+             trong process (services/audio_decoder: soundfile / PyAV, ffmpeg pipe chỉ là
+             fallback cuối); Whisper/pitch/features dùng thẳng mảng, không có file tạm nào
+- tempfile : hành vi cũ (lưu upload ra file rồi decode) - dùng khi cần debug
+Nếu vẫn phải có file (decode in-memory lỗi, hoặc mode tempfile) thì file nằm trong
+ScratchWorkspace (tmpfs /dev/shm nếu có) và luôn được xoá qua upload.close() / with.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from services.audio_buffer import AudioBuffer
+
+load_dotenv()
+
+AUDIO_IO_MODE = os.getenv("AUDIO_IO_MODE", "memory").strip().lower()
+
+
+def _default_scratch_dir():
+    # tmpfs: không đụng đĩa thật, không bị fsync dưới tải cao
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return os.path.join("/dev/shm", "speaking_scratch")
+    return os.path.join(tempfile.gettempdir(), "speaking_scratch")
+
+
+AUDIO_SCRATCH_DIR = os.getenv("AUDIO_SCRATCH_DIR") or _default_scratch_dir()
+# File sót lại (worker bị kill giữa chừng) quá tuổi này sẽ bị dọn lúc khởi động
+SCRATCH_MAX_AGE_SECONDS = 3600
+
+
+class ScratchWorkspace:
+    """Thư mục làm việc tạm có quản lý: theo dõi file đang dùng, xoá chắc chắn"""
+
+    def __init__(self, root=AUDIO_SCRATCH_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._active = set()
+        self._lock = threading.Lock()
+        self.sweep()
+
+    def new_path(self, suffix=""):
+        path = os.path.join(self.root, f"{uuid.uuid4().hex}{suffix}")
+        with self._lock:
+            self._active.add(path)
+        return path
+
+    def release(self, path):
+        if not path:
+            return
+        with self._lock:
+            self._active.discard(path)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"⚠️ Lỗi khi xóa file {path}: {e}")
+
+    def sweep(self, max_age=SCRATCH_MAX_AGE_SECONDS):
+        """Dọn file cũ không còn ai dùng"""
+        now = time.time()
+        try:
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if path in self._active:
+                    continue
+                try:
+                    if now - os.path.getmtime(path) > max_age:
+                        os.remove(path)
+                except OSError:
+                    pass
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {"root": self.root, "active_files": len(self._active)}
+
+
+workspace = ScratchWorkspace()
+
+_stats_lock = threading.Lock()
+_io_stats = {"memory_decodes": 0, "scratch_fallbacks": 0, "tempfile_decodes": 0, "decode_errors": 0}
+
+
+def _count(key):
+    with _stats_lock:
+        _io_stats[key] += 1
+
+
+class SpeakingUpload:
+    """Audio đã decode (+ đường dẫn file scratch nếu có). close() idempotent."""
+
+    def __init__(self, audio, path=None):
+        self.audio = audio
+        self.path = path
+
+    def close(self):
+        if self.path:
+            workspace.release(self.path)
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def receive_upload(file_storage, suffix=".webm"):
+    """FileStorage của Flask → SpeakingUpload (theo AUDIO_IO_MODE)"""
+    data = None
+    if AUDIO_IO_MODE == "memory":
+        data = file_storage.read()
+        try:
+            audio = AudioBuffer.from_bytes(data)
+            _count("memory_decodes")
+            return SpeakingUpload(audio)
+        except Exception as e:
+            print(f"⚠️ Decode in-memory lỗi, chuyển sang file scratch: {e}")
+            _count("scratch_fallbacks")
+
+    path = workspace.new_path(suffix)
+    try:
+        if data is not None:
+            with open(path, "wb") as f:
+                f.write(data)
+        else:
+            file_storage.save(path)
+        try:
+            audio = AudioBuffer.from_file(path)
+            if data is None:
+                _count("tempfile_decodes")
+        except Exception as e:
+            print(f"⚠️ Lỗi decode audio: {e}")
+            _count("decode_errors")
+            audio = None
+    except Exception:
+        workspace.release(path)
+        raise
+    return SpeakingUpload(audio, path)
+
+
+def get_upload_io_stats():
+    with _stats_lock:
+        stats = dict(_io_stats)
+    stats.update({"mode": AUDIO_IO_MODE, **workspace.stats()})
+    return stats
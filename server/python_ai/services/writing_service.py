@@ -3,10 +3,10 @@ import pysbd
 from lexical_diversity import lex_div as ld
 import os
 import re
-import joblib
 import pandas as pd
 import language_tool_python
 from spellchecker import SpellChecker
+from services.model_registry import get_model
 from services.nlp_service import analyze_deep_tech
 
 # --- SINGLETON NLP ENGINES ---
@@ -140,7 +140,7 @@ class WritingService:
         if os.path.exists(RF_MODEL_PATH):
             try:
                 print(f"🧠 Loading Alex's Random Forest Brain from {RF_MODEL_PATH}...")
-                self.rf_model = joblib.load(RF_MODEL_PATH)
+                self.rf_model = get_model("writing", RF_MODEL_PATH)
             except Exception as e:
                 print(f"⚠️ Error loading RF Brain: {e}")
         else:
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import time
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.artifact_cache import ArtifactCache, SQLiteBackend, make_cache_key
+
+
+def _cache(tmp_path, **kwargs):
+    return ArtifactCache(SQLiteBackend(str(tmp_path / "cache.db")), **kwargs)
+
+
+def test_key_depends_on_content_and_params():
+    key = make_cache_key("transcript", "abc", model="base", beam_size=2)
+    assert key == make_cache_key("transcript", "abc", beam_size=2, model="base")
+    assert key != make_cache_key("transcript", "abc", model="base", beam_size=5)
+    assert key != make_cache_key("transcript", "xyz", model="base", beam_size=2)
+
+
+def test_memory_hit_then_backend_hit_after_eviction(tmp_path):
+    cache = _cache(tmp_path, max_bytes=100)
+    cache.set("a", {"text": "hello world"})
+    assert cache.get("a") == {"text": "hello world"}
+    assert cache.stats()["memory_hits"] == 1
+
+    # Đẩy "a" ra khỏi LRU → vẫn đọc được từ SQLite sau khi write-behind xong
+    cache.set("b", {"text": "x" * 80})
+    assert cache.flush(timeout=5)
+    assert cache.stats()["evictions"] >= 1
+    assert cache.get("a") == {"text": "hello world"}
+    assert cache.stats()["backend_hits"] == 1
+
+    # Dữ liệu bền vững qua instance mới
+    assert _cache(tmp_path).get("b") == {"text": "x" * 80}
+
+
+def test_ttl_expiry_and_returned_copy(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("pitch", [1.0, 2.0], ttl=0.05)
+    value = cache.get("pitch")
+    value.append(3.0)
+    assert cache.get("pitch") == [1.0, 2.0]
+
+    time.sleep(0.1)
+    assert cache.flush(timeout=5)
+    assert cache.get("pitch") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_get_or_compute_skips_empty_results(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {}
+
+    cache.get_or_compute("empty", compute)
+    cache.get_or_compute("empty", compute)
+    assert len(calls) == 2
+
+    assert cache.get_or_compute("feat", lambda: {"pitch_mean": 120.0}) == {"pitch_mean": 120.0}
+    assert cache.get_or_compute("feat", lambda: None) == {"pitch_mean": 120.0}
+
+
+def test_write_behind_queue_is_bounded_when_backend_stalls(tmp_path):
+    class _StuckBackend:
+        name = "stuck"
+
+        def __init__(self):
+            self.release = threading.Event()
+
+        def get(self, key):
+            return None
+
+        def set(self, key, value, expires_at):
+            self.release.wait(5)
+
+    backend = _StuckBackend()
+    cache = ArtifactCache(backend, write_queue_max=2)
+    for i in range(10):
+        cache.set(f"k{i}", {"i": i})
+
+    stats = cache.stats()
+    assert stats["pending_writes"] <= 2 and stats["dropped_writes"] >= 7
+    assert cache.get("k9") == {"i": 9}  # L1 vẫn giữ
+    backend.release.set()
+    assert cache.flush(timeout=5)
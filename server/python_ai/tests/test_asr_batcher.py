@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.asr_batcher import ASRBatcher, merge_clips
+
+SR = 16000
+
+
+class _FakePipeline:
+    """Giả lập BatchedInferencePipeline: mỗi clip → 1 segment (timeline audio đã nối)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, clip_timestamps=None, batch_size=None, **options):
+        self.calls.append((len(audio), clip_timestamps, options))
+        segments = []
+        for i, clip in enumerate(clip_timestamps):
+            start, end = clip["start"], clip["end"]
+            segments.append(SimpleNamespace(
+                text=f" clip{i}", start=start, end=end, avg_logprob=-0.2, no_speech_prob=0.01,
+                words=[SimpleNamespace(word="w", start=start + 0.1, end=end, probability=0.9)]
+            ))
+        return iter(segments), None
+
+
+def _energy_vad(samples, sr):
+    """VAD đơn giản cho test: đoạn có biên độ > 0"""
+    mask = np.abs(samples) > 0
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype(int), [0]])))
+    return [{"start": int(s), "end": int(e)} for s, e in edges.reshape(-1, 2)]
+
+
+def test_merge_clips_caps_chunk_length():
+    clips = [{"start": 0, "end": 10 * SR}, {"start": 12 * SR, "end": 25 * SR}, {"start": 26 * SR, "end": 40 * SR}]
+    assert merge_clips(clips, sr=SR) == [(0, 25 * SR), (26 * SR, 40 * SR)]
+
+
+def test_concurrent_requests_share_one_decode_and_keep_own_timeline():
+    pipeline = _FakePipeline()
+    batcher = ASRBatcher(pipeline, window_ms=200, max_batch=4, vad_fn=_energy_vad, sr=SR)
+
+    # Mỗi request: 1s im lặng rồi 1s "tiếng nói"
+    audio = np.concatenate([np.zeros(SR), np.ones(SR) * 0.5]).astype(np.float32)
+    results = [None] * 3
+
+    def worker(i):
+        results[i] = batcher.transcribe(audio, language="en", beam_size=2)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert len(pipeline.calls) == 1
+    assert len(pipeline.calls[0][1]) == 3
+    for segments in results:
+        assert len(segments) == 1
+        assert segments[0].start == 1.0 and segments[0].end == 2.0
+        assert segments[0].words[0].start == 1.1
+
+    stats = batcher.stats()
+    assert stats["batch_size_histogram"] == {3: 1}
+    assert stats["requests"] == 3
+
+
+def test_silent_request_skips_decode():
+    pipeline = _FakePipeline()
+    batcher = ASRBatcher(pipeline, window_ms=1, vad_fn=_energy_vad, sr=SR)
+    assert batcher.transcribe(np.zeros(SR, dtype=np.float32), beam_size=2) == []
+    assert pipeline.calls == []
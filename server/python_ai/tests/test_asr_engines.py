@@ -0,0 +1,44 @@
+import os
+import sys
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.asr_engines import ASREngineRegistry
+
+
+def test_engines_load_lazily_and_fallback_only_on_failure():
+    loaded = []
+
+    def broken():
+        loaded.append("fast")
+        raise RuntimeError("no model")
+
+    def torch_whisper():
+        loaded.append("torch")
+        return object()
+
+    registry = ASREngineRegistry()
+    registry.register("faster-whisper", broken)
+    registry.register("whisper", torch_whisper)
+    assert loaded == []
+    assert not registry.status()["engines"]["whisper"]["resident"]
+
+    name, engine = registry.first_available(["faster-whisper", "whisper"])
+    assert name == "whisper" and engine is not None
+    # Engine lỗi không bị load lại, engine đã load được dùng lại
+    registry.first_available(["faster-whisper", "whisper"])
+    assert loaded == ["fast", "torch"]
+
+    status = registry.status()["engines"]
+    assert status["whisper"]["resident"] and "load_seconds" in status["whisper"]
+    assert status["faster-whisper"]["error"] == "no model"
+
+
+def test_preferred_engine_never_loads_fallback():
+    registry = ASREngineRegistry()
+    registry.register("faster-whisper", lambda: "fast")
+    registry.register("whisper", lambda: (_ for _ in ()).throw(AssertionError("torch loaded")))
+    registry.warm_up(["faster-whisper", "whisper"], background=False)
+    assert registry.is_loaded("faster-whisper")
+    assert not registry.is_loaded("whisper")
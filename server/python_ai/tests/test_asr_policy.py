@@ -0,0 +1,34 @@
+import os
+import sys
+import time
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.asr_policy import ASRPolicy
+
+TIERS = ["fast", "balanced", "precise", "accurate"]
+
+
+def test_degrades_one_tier_per_threshold_multiple():
+    policy = ASRPolicy(tiers=TIERS, threshold_ms=1000, alpha=1.0, half_life=0)
+    assert policy.select("precise") == ("precise", "precise")
+
+    policy.observe_wait("base", 1.2)  # precise / balanced đều chạy model base
+    assert policy.select("precise") == ("precise", "balanced")
+    policy.observe_wait("base", 2.5)
+    assert policy.select("precise") == ("precise", "fast")
+    assert policy.select("balanced") == ("balanced", "fast")
+    # Hàng đợi của small không dài → accurate giữ nguyên
+    assert policy.select("accurate") == ("accurate", "accurate")
+    assert policy.stats()["degraded"] == 3
+
+
+def test_wait_decays_and_tier_recovers():
+    policy = ASRPolicy(tiers=TIERS, threshold_ms=1000, alpha=1.0, half_life=0.05)
+    policy.observe_wait("base", 1.5)
+    assert policy.select("balanced")[1] == "fast"
+    with policy.slot("tiny"):
+        pass
+    time.sleep(0.2)  # 4 half-life → ~0.1s < ngưỡng
+    assert policy.select("balanced")[1] == "balanced"
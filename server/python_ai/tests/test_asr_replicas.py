@@ -0,0 +1,50 @@
+import os
+import sys
+import threading
+import time
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.asr_replicas import WhisperReplicaPool, parse_core_sets
+
+
+class _FakeModel:
+    """Giả lập WhisperModel: ghi lại core được ghim lúc load, transcribe chậm 1 chút"""
+
+    def __init__(self, model_size, **options):
+        self.options = options
+        self.affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+        self.active = 0
+
+    def transcribe(self, audio, **options):
+        self.active += 1
+        peak = self.active
+        time.sleep(0.05)
+        self.active -= 1
+        return iter([peak]), None
+
+
+def test_parse_core_sets():
+    assert parse_core_sets("0-3;4-5,8") == [{0, 1, 2, 3}, {4, 5, 8}]
+    assert parse_core_sets("") == []
+
+
+def test_least_loaded_dispatch_and_pinning():
+    core = min(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 0
+    pool = WhisperReplicaPool("tiny", replicas=2, core_sets=[{core}], model_factory=_FakeModel)
+    assert pool.replicas[0].model.options["cpu_threads"] == 1
+    if hasattr(os, "sched_getaffinity"):
+        assert pool.replicas[0].model.affinity == {core}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.transcribe(None)[0])) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = pool.stats()
+    # 2 request đồng thời → mỗi replica 1 request, không replica nào chạy 2 request cùng lúc
+    assert [r["requests"] for r in stats["replicas"]] == [1, 1]
+    assert all(segments == [1] for segments in results)
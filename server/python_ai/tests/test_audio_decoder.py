@@ -0,0 +1,37 @@
+import os
+import sys
+
+import numpy as np
+import soundfile as sf
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.audio_decoder import decode_audio, merge_mp3_files
+
+
+def _tone(seconds, sr):
+    t = np.arange(int(sr * seconds)) / sr
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_decode_wav_path_and_bytes_resampled(tmp_path):
+    path = str(tmp_path / "a.wav")
+    sf.write(path, np.stack([_tone(1.0, 22050)] * 2, axis=1), 22050)  # stereo → mono
+    samples, sr = decode_audio(path, sr=16000, backends=["soundfile"])
+    assert sr == 16000 and abs(len(samples) - 16000) <= 2
+    with open(path, "rb") as f:
+        from_bytes, _ = decode_audio(f.read(), sr=16000, backends=["soundfile"])
+    assert np.allclose(samples, from_bytes)
+
+
+def test_merge_mp3_files_concatenates_frames(tmp_path):
+    paths = []
+    for i, seconds in enumerate((1.0, 2.0)):
+        path = str(tmp_path / f"chunk_{i}.mp3")
+        sf.write(path, _tone(seconds, 24000), 24000, format="MP3")
+        paths.append(path)
+    out = str(tmp_path / "merged.mp3")
+    assert merge_mp3_files(paths + [str(tmp_path / "missing.mp3")], out) == 2
+    samples, sr = decode_audio(out, sr=24000, backends=["pyav"])
+    assert abs(len(samples) / sr - 3.0) < 0.2
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import numpy as np
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.audio_buffer import AudioBuffer
+from services.audio_quality_gate import check_audio_quality, get_quality_gate_stats
+
+SR = 16000
+
+
+def _voice(seconds, amplitude=0.3):
+    t = np.arange(int(SR * seconds)) / SR
+    return (amplitude * np.sin(2 * np.pi * 150 * t)).astype(np.float32)
+
+
+def test_reason_codes():
+    rng = np.random.default_rng(0)
+    cases = {
+        "too_short": _voice(0.5),
+        "silent": np.zeros(SR * 3, dtype=np.float32),
+        "no_speech": (rng.normal(0, 0.003, SR * 3)).astype(np.float32),
+        "clipped": np.clip(_voice(3, amplitude=4.0), -1.0, 1.0),
+        None: _voice(3)
+    }
+    for reason, samples in cases.items():
+        report = check_audio_quality(AudioBuffer(samples, SR))
+        assert report.reason == reason
+        assert report.ok == (reason is None)
+    stats = get_quality_gate_stats()
+    assert stats["rejected"] >= 4 and stats["by_reason"]["clipped"] >= 1
+
+
+def test_gate_is_cheap_on_long_recording():
+    audio = AudioBuffer(_voice(120), SR)
+    report = check_audio_quality(audio)
+    assert report.ok
+    assert report.elapsed_ms < 10
+    assert check_audio_quality(audio) is report  # memo theo buffer
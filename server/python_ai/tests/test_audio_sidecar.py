@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.audio_buffer import AudioBuffer
+from services.audio_sidecar import SidecarClient, SidecarError, SidecarUnavailable, serve
+
+SR = 16000
+
+
+def _start_sidecar(ops):
+    path = os.path.join(tempfile.mkdtemp(), "audio.sock")
+    ready = threading.Event()
+    threading.Thread(target=serve, args=(path,), kwargs={"authkey": b"test", "ops": ops, "ready": ready},
+                     daemon=True).start()
+    assert ready.wait(5)
+    return path
+
+
+def test_roundtrip_through_shared_memory_reuses_buffer():
+    seen = []
+
+    def _pitch(audio, engine=None):
+        seen.append(audio)
+        return {"n": len(audio.samples), "sum": float(audio.samples.sum()), "engine": engine}
+
+    client = SidecarClient(_start_sidecar({"pitch": _pitch, "fail": lambda audio: 1 / 0}), authkey=b"test")
+    samples = np.linspace(-0.5, 0.5, SR, dtype=np.float32)
+    audio = AudioBuffer(samples, SR)
+
+    result = client.call("pitch", audio, engine="yin")
+    assert result == {"n": SR, "sum": pytest.approx(float(samples.sum())), "engine": "yin"}
+    client.call("pitch", audio)
+    # Cùng content_hash → sidecar dùng lại 1 AudioBuffer (memo pitch / features dùng chung)
+    assert seen[0] is seen[1]
+
+    with pytest.raises(SidecarError):
+        client.call("fail")
+    assert client.stats()["calls"] == {"pitch": 2, "fail": 1}
+
+
+def test_unreachable_sidecar_raises_unavailable():
+    client = SidecarClient(os.path.join(tempfile.mkdtemp(), "missing.sock"), authkey=b"test")
+    with pytest.raises(SidecarUnavailable):
+        client.call("ping")
+
+
+def test_socket_requires_authkey_and_is_private():
+    with pytest.raises(ValueError):
+        serve(os.path.join(tempfile.mkdtemp(), "open.sock"), authkey=None, ops={})
+
+    path = _start_sidecar({"ping": lambda audio: "pong"})
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    with pytest.raises(SidecarUnavailable):
+        SidecarClient(path, authkey=b"wrong").call("ping")
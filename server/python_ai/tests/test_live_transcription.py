@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.live_transcription import LIVE_SR, LiveSession, LiveSessionManager
+
+
+def _pcm16(seconds, amplitude):
+    t = np.arange(int(LIVE_SR * seconds)) / LIVE_SR
+    return (amplitude * np.sin(2 * np.pi * 200 * t) * 32767).astype("<i2").tobytes()
+
+
+def _fake_transcribe(samples):
+    secs = round(len(samples) / LIVE_SR, 1)
+    return {
+        "text": f"seg{secs}",
+        "segments": [{"start": 0.0, "end": secs, "text": f"seg{secs}"}],
+        "words": [{"word": "w", "start": 0.25, "end": 0.5, "confidence": 0.9}]
+    }
+
+
+def test_segments_commit_on_silence_and_finish_offsets():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        session = LiveSession("s1", _fake_transcribe, executor)
+
+        # 1s nói + 1s lặng → đoạn đầu được commit ngay trong lúc "đang nói"
+        session.append_pcm16(_pcm16(1.0, 0.3))
+        status = session.append_pcm16(_pcm16(1.0, 0.0))
+        assert status["segments_done"] + status["segments_pending"] == 1
+
+        # Đoạn thứ 2 chưa kết thúc → chỉ được commit khi finish()
+        session.append_pcm16(_pcm16(0.5, 0.3))
+        transcript, samples = session.finish()
+
+    assert len(samples) == int(LIVE_SR * 2.5)
+    assert len(transcript["segments"]) == 2
+    first, second = transcript["words"]
+    assert first["start"] == 0.25
+    # Đoạn 2 bắt đầu ở ~2.0s (độ phân giải 1 frame 30ms), lùi padding 0.2s
+    assert abs(second["start"] - (1.8 + 0.25)) <= 0.03
+    assert transcript["text"].startswith("seg")
+
+
+def test_chunk_split_in_odd_bytes_is_tolerated():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        session = LiveSession("s2", _fake_transcribe, executor)
+        data = _pcm16(0.5, 0.3)
+        session.append_pcm16(data[:1001])
+        status = session.append_pcm16(data[1001:])
+        assert status["duration"] == 0.5
+        _, samples = session.finish()
+    np.testing.assert_allclose(samples, np.frombuffer(data, dtype="<i2") / 32768.0, atol=1e-7)
+
+
+def _owner_worker(route_dir, conn, stop):
+    """Worker "a": mở phiên rồi chỉ phục vụ qua socket định tuyến"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        manager = LiveSessionManager(_fake_transcribe, executor, route_dir=route_dir, authkey=b"k", owner="a")
+        conn.send(manager.create(meta={"question": "q"}).session_id)
+        stop.wait(20)
+        manager.close()
+
+
+def test_chunk_and_end_on_another_worker_are_routed_to_owner(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe()
+    stop = ctx.Event()
+    owner = ctx.Process(target=_owner_worker, args=(str(tmp_path), child_conn, stop), daemon=True)
+    owner.start()
+    try:
+        assert parent_conn.poll(10)
+        session_id = parent_conn.recv()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other = LiveSessionManager(_fake_transcribe, executor, route_dir=str(tmp_path), authkey=b"k", owner="b")
+            session = other.get(session_id)
+            assert session.meta == {"question": "q"}
+
+            session.append_pcm16(_pcm16(1.0, 0.3))
+            session.append_pcm16(_pcm16(1.0, 0.0))
+            transcript, samples = other.pop(session_id).finish()
+            assert len(samples) == int(LIVE_SR * 2.0)
+            assert len(transcript["segments"]) == 1
+
+            # finish() đã gỡ phiên ở worker sở hữu; id không rõ chủ → không tìm thấy
+            assert other.get(session_id) is None
+            assert other.get("deadbeef") is None
+            other.close()
+    finally:
+        stop.set()
+        owner.join(5)
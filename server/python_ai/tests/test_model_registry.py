@@ -0,0 +1,43 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.model_registry as model_registry
+
+
+@pytest.fixture(autouse=True)
+def _clean_registry():
+    yield
+    for name in ("test_forest", "test_missing"):
+        model_registry._models.pop(name, None)
+        model_registry._info.pop(name, None)
+        model_registry._errors.pop(name, None)
+
+
+def test_model_loaded_once_and_sized(tmp_path):
+    joblib = pytest.importorskip("joblib")
+    ensemble = pytest.importorskip("sklearn.ensemble")
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((200, 5))
+    forest = ensemble.RandomForestRegressor(n_estimators=10, random_state=0).fit(X, X[:, 0])
+    path = str(tmp_path / "forest.joblib")
+    joblib.dump(forest, path)
+
+    model = model_registry.get_model("test_forest", path)
+    assert model is model_registry.get_model("test_forest", path)
+    np.testing.assert_allclose(model.predict(X[:20]), forest.predict(X[:20]))
+
+    info = model_registry.get_model_registry_stats()["models"]["test_forest"]
+    assert info["type"] == "RandomForestRegressor"
+    assert info["data_mb"] > 0
+    assert info["shared_from_parent"] is False
+
+
+def test_missing_model_returns_none(tmp_path):
+    assert model_registry.get_model("test_missing", str(tmp_path / "none.joblib")) is None
+    assert "test_missing" in model_registry.get_model_registry_stats()["errors"]
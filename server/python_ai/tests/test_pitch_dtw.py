@@ -0,0 +1,57 @@
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.pitch_dtw as pitch_dtw
+from services.pitch_dtw import dtw_distance, dtw_distances, resample_curve
+
+
+def _reference_dtw(a, b):
+    """Bản list-of-lists cũ trong app.py"""
+    n, m = len(a), len(b)
+    dp = [[math.inf] * (m + 1) for _ in range(n + 1)]
+    dp[0][0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            dp[i][j] = abs(a[i - 1] - b[j - 1]) + min(dp[i - 1][j], dp[i][j - 1], dp[i - 1][j - 1])
+    return dp[n][m] / (n + m)
+
+
+@pytest.fixture(params=["numba", "numpy"])
+def engine(request, monkeypatch):
+    if request.param == "numpy":
+        monkeypatch.setattr(pitch_dtw, "PITCH_DTW_USE_NUMBA", False)
+        monkeypatch.setattr(pitch_dtw, "_numba_kernel", None)
+    elif pitch_dtw._load_numba_kernel() is None:
+        pytest.skip("numba không có")
+    return request.param
+
+
+def test_matches_reference_and_batches(engine):
+    rng = np.random.default_rng(0)
+    user = rng.normal(200, 20, 40).tolist()
+    refs = [rng.normal(200, 20, 40).tolist(), rng.normal(180, 15, 25).tolist(), [], rng.normal(220, 10, 40).tolist()]
+
+    batch = dtw_distances(user, refs)
+    for ref, dist in zip(refs, batch):
+        expected = _reference_dtw(user, ref) if ref else 0.0
+        assert dist == pytest.approx(expected)
+    assert dtw_distance(user, []) == 0.0
+
+    # Band chỉ cắt bớt đường đi → khoảng cách không nhỏ hơn bản đầy đủ, band rộng = đầy đủ
+    banded = dtw_distances(user, refs, band=0.1)
+    assert np.all(banded >= batch - 1e-9)
+    assert dtw_distances(user, refs, band=1.0) == pytest.approx(batch)
+
+
+def test_resample_curve_interpolates_like_before():
+    assert resample_curve([]) == []
+    assert resample_curve([None, 7.0], target_len=3) == [7.0, 7.0, 7.0]
+    assert resample_curve([0.0, None, 10.0, 20.0], target_len=5) == pytest.approx([0.0, 5.0, 10.0, 15.0, 20.0])
+    assert len(resample_curve(list(range(50)), target_len=200)) == 200
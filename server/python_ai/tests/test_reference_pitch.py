@@ -0,0 +1,58 @@
+import os
+import sys
+import threading
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.artifact_cache import ArtifactCache, SQLiteBackend
+from services.reference_pitch import ReferencePitchStore
+
+
+class _FakeBuilder:
+    """Thay TTS + pYIN: curve phụ thuộc câu hỏi + voice, đếm số lần build"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, question, voice, engine):
+        with self.lock:
+            self.calls.append((question, voice, engine))
+        return [100.0 + len(question), 120.0 + len(voice), 110.0]
+
+
+def test_store_hits_memory_then_persistent(tmp_path):
+    persistent = ArtifactCache(SQLiteBackend(str(tmp_path / "ref.db")))
+    builder = _FakeBuilder()
+    store = ReferencePitchStore(capacity=1, persistent=persistent, builder=builder)
+
+    curve = store.get("Describe your  hometown.", voice="en-GB-SoniaNeural")
+    assert curve == store.get("describe your hometown.", voice="en-GB-SoniaNeural")
+    assert len(builder.calls) == 1
+
+    store.get("Describe your hometown.", voice="en-US-JennyNeural")  # voice khác → build riêng, đẩy curve đầu khỏi LRU
+    assert len(builder.calls) == 2
+    assert store.stats()["evictions"] == 1
+
+    persistent.flush(timeout=5)
+    fresh = ReferencePitchStore(persistent=ArtifactCache(SQLiteBackend(str(tmp_path / "ref.db"))),
+                                builder=builder, on_miss="skip")
+    assert fresh.get("Describe your hometown.", voice="en-GB-SoniaNeural") == curve
+    assert fresh.stats()["persistent_hits"] == 1
+    assert len(builder.calls) == 2
+
+
+def test_precompute_then_request_never_builds(tmp_path):
+    builder = _FakeBuilder()
+    store = ReferencePitchStore(persistent=ArtifactCache(SQLiteBackend(str(tmp_path / "ref.db"))), builder=builder)
+    questions = ["Do you like music?", "do you like  music?", "What is your job?", ""]
+
+    summary = store.precompute(questions, voices=["a", "b"], workers=3)
+    assert summary == {"built": 4, "cached": 0, "failed": 0}
+    assert store.precompute(questions, voices=["a", "b"])["cached"] == 4
+
+    store.on_miss = "skip"
+    assert store.get("What is your job?", voice="b") is not None
+    assert store.get("Unseen question?", voice="a") is None
+    assert len(builder.calls) == 4
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.audio_buffer import AudioBuffer
+from services.silence_trim import detect_nonsilent_ms, trim_buffer
+
+
+def _speech_like(sr, seed):
+    """Xen kẽ đoạn nói (sin + nhiễu) và im lặng có nhiễu nền nhỏ"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for _ in range(6):
+        n_sil = int(sr * rng.uniform(0.1, 0.9))
+        n_voice = int(sr * rng.uniform(0.2, 0.8))
+        t = np.arange(n_voice) / sr
+        parts.append(rng.normal(0, 0.002, n_sil))
+        parts.append(0.3 * np.sin(2 * np.pi * 180 * t) + rng.normal(0, 0.02, n_voice))
+    parts.append(rng.normal(0, 0.002, int(sr * 0.7)))
+    return (np.clip(np.concatenate(parts), -1, 1) * 32767).astype(np.int16)
+
+
+def test_matches_pydub_detect_nonsilent():
+    for sr in (16000, 22050):
+        for seed in range(3):
+            pcm = _speech_like(sr, seed)
+            segment = AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=sr, channels=1)
+            samples = pcm.astype(np.float32) / 32768.0
+            for min_len, thresh in ((500, -40), (200, -35)):
+                expected = detect_nonsilent(segment, min_silence_len=min_len, silence_thresh=thresh)
+                assert detect_nonsilent_ms(samples, sr, min_silence_len=min_len, silence_thresh=thresh) == expected
+
+
+def test_trim_buffer_returns_offset():
+    sr = 16000
+    t = np.arange(sr) / sr
+    samples = np.concatenate([np.zeros(sr), 0.3 * np.sin(2 * np.pi * 200 * t), np.zeros(sr)]).astype(np.float32)
+    trimmed, offset = trim_buffer(AudioBuffer(samples, sr), sr=sr)
+    assert abs(offset - 1.0) < 0.01
+    assert abs(len(trimmed) / sr - 1.0) < 0.01
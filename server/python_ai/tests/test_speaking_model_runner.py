@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.speaking_model_runner import SpeakingModelRunner, default_feature_order
+
+FEATURES = default_feature_order()
+
+
+def _training_data(rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((rows, len(FEATURES))).astype(np.float32)
+    y = 5 + X[:, 0] - 0.5 * X[:, 10] + 0.1 * rng.standard_normal(rows)
+    return X, y
+
+
+def _as_dict(x):
+    """Dict feature khác thứ tự cột lúc train → runner phải tự sắp lại"""
+    return {name: float(x[i]) for i, name in reversed(list(enumerate(FEATURES)))}
+
+
+def test_inplace_predict_matches_model_predict():
+    xgboost = pytest.importorskip("xgboost")
+    X, y = _training_data()
+    model = xgboost.XGBRegressor(n_estimators=50, max_depth=4).fit(X, y)
+    runner = SpeakingModelRunner(model)
+    assert runner.mode == "inplace"
+
+    rows = [_as_dict(x) for x in X[:5]]
+    expected = model.predict(X[:5])
+    np.testing.assert_allclose([runner.predict(r) for r in rows], expected, rtol=1e-6)
+    np.testing.assert_allclose(runner.predict_batch(rows), expected, rtol=1e-6)
+
+
+def test_feature_order_and_missing_key():
+    class _Linear:
+        """Model không phải XGBoost, chỉ có feature_names_in_ (như sklearn)"""
+        feature_names_in_ = np.array(FEATURES[::-1])
+
+    runner = SpeakingModelRunner(_Linear())
+    assert runner.mode == "dataframe"
+    X, _ = _training_data(rows=1)
+    row = _as_dict(X[0])
+    np.testing.assert_array_equal(runner.vector(row)[0], X[0][::-1])
+    with pytest.raises(KeyError):
+        runner.vector({k: v for k, v in row.items() if k != "jitter"})
+
+
+def test_multi_output_booster_is_rejected():
+    class Booster:
+        """Booster giả: config khai báo num_class, predict trả width cột"""
+        feature_names = FEATURES
+
+        def __init__(self, num_class, width, config=True):
+            self.num_class, self.width, self.config = num_class, width, config
+
+        def save_config(self):
+            if not self.config:
+                raise RuntimeError("config không có")
+            return json.dumps({"learner": {"learner_model_param": {"num_class": str(self.num_class), "num_target": "1"}}})
+
+        def inplace_predict(self, X, **options):
+            return np.zeros((len(X), self.width), dtype=np.float32)
+
+    row = _as_dict(_training_data(rows=1)[0][0])
+    with pytest.raises(ValueError):
+        SpeakingModelRunner(Booster(num_class=3, width=3))
+
+    assert SpeakingModelRunner(Booster(num_class=0, width=1)).predict(row) == 0.0
+    with pytest.raises(ValueError):
+        SpeakingModelRunner(Booster(num_class=0, width=2, config=False)).predict(row)
@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.speaking_pipeline import Pipeline, Stage
+
+
+def _pipeline(events, executor):
+    """stt nhanh, pitch chậm: lang_quality phải bắt đầu trước khi pitch xong"""
+    pitch_done = threading.Event()
+
+    def stt(ctx):
+        return {"text": ctx["audio"]}
+
+    def pitch(ctx):
+        time.sleep(0.2)
+        pitch_done.set()
+        return [1.0, 2.0]
+
+    def lang_quality(ctx):
+        events.append(("lang_quality", pitch_done.is_set()))
+        return len(ctx["stt"]["text"])
+
+    def scores(ctx):
+        return ctx["lang_quality"] + len(ctx["pitch"])
+
+    return Pipeline([
+        Stage("stt", stt, deps=("audio",)),
+        Stage("pitch", pitch, deps=("audio",)),
+        Stage("lang_quality", lang_quality, deps=("stt",)),
+        Stage("scores", scores, deps=("lang_quality", "pitch"), inline=True),
+        Stage("overlay", lambda ctx: ctx["pitch"][::-1], deps=("pitch",))
+    ], executor=executor, name="test")
+
+
+def test_independent_stages_overlap_and_timings_recorded():
+    events = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pipeline = _pipeline(events, executor)
+        run = pipeline.run({"audio": "hello"}, targets=("scores",))
+
+    assert run["scores"] == 7
+    assert events == [("lang_quality", False)]  # chạy ngay khi có transcript, không chờ pitch
+    assert "overlay" not in run.results  # không nằm trong targets → không chạy
+    assert set(run.timings) == {"stt", "pitch", "lang_quality", "scores"}
+    assert run.timings["pitch"] >= 0.2
+    stats = pipeline.stats()
+    assert stats["runs"] == 1 and stats["stages"]["pitch"]["runs"] == 1
+
+
+def test_provided_results_skip_stage_and_errors_propagate():
+    calls = []
+    pipeline = Pipeline([
+        Stage("stt", lambda ctx: calls.append("stt") or {"text": "x"}, deps=("audio",)),
+        Stage("words", lambda ctx: ctx["stt"]["text"].split(), deps=("stt",)),
+        Stage("boom", lambda ctx: 1 / 0, deps=("words",))
+    ])
+    run = pipeline.run({"audio": None, "stt": {"text": "a b"}}, targets=("words",))
+    assert run["words"] == ["a", "b"] and calls == []
+
+    with pytest.raises(ZeroDivisionError):
+        pipeline.run({"audio": None})
+    with pytest.raises(KeyError):
+        pipeline.run({}, targets=("stt",))
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", len, deps=("b",)), Stage("b", len, deps=("a",))])
+
+
+def test_required_is_minimal_closure_of_targets():
+    pipeline = Pipeline([
+        Stage("stt", len, deps=("audio",)),
+        Stage("features", len, deps=("audio",)),
+        Stage("lang_quality", len, deps=("stt",)),
+        Stage("scores", len, deps=("features", "lang_quality")),
+        Stage("pitch", len, deps=("audio",)),
+        Stage("pitch_overlay", len, deps=("pitch",)),
+        Stage("heatmap", len, deps=("scores", "stt"))
+    ])
+    assert pipeline.required(("scores",)) == {"stt", "features", "lang_quality", "scores"}
+    assert pipeline.required(("scores",), provided={"stt": None}) == {"features", "lang_quality", "scores"}
+    assert pipeline.required(("pitch_overlay",)) == {"pitch", "pitch_overlay"}
+
+
+def test_stream_yields_each_stage_as_soon_as_it_finishes():
+    events = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pipeline = _pipeline(events, executor)
+        stages = pipeline.stream({"audio": "hello"}, targets=("scores", "overlay"))
+        t0 = time.perf_counter()
+        first_name, first_value, _ = next(stages)
+        first_at = time.perf_counter() - t0
+        order = [first_name] + [name for name, _, _ in stages]
+
+    assert first_name == "stt" and first_value == {"text": "hello"}
+    assert first_at < 0.15  # transcript có ngay, không chờ pitch (0.2s)
+    assert order.index("lang_quality") < order.index("pitch") < order.index("scores")
+    assert set(order) == {"stt", "pitch", "lang_quality", "scores", "overlay"}
+
+    # Đóng generator giữa chừng (client ngắt) → không tính là lỗi, không tính là 1 run
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pipeline = _pipeline([], executor)
+        stages = pipeline.stream({"audio": "hi"})
+        next(stages)
+        stages.close()
+    assert pipeline.stats()["runs"] == 0 and pipeline.stats()["errors"] == 0
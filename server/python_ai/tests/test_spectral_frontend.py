@@ -0,0 +1,66 @@
+import os
+import sys
+
+import librosa
+import numpy as np
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.spectral_frontend import compute_spectral_analysis
+
+SR = 16000
+
+
+def _speech_like_signal(seconds=4.0):
+    """Tone 150Hz bật/tắt (giả lập câu nói có khoảng lặng) + nhiễu nền nhỏ"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SR * seconds)) / SR
+    voiced = np.sin(2 * np.pi * 0.7 * t) > 0
+    y = 0.3 * np.sin(2 * np.pi * 150 * t) * voiced + 0.001 * rng.standard_normal(len(t))
+    return y.astype(np.float32)
+
+
+def test_frontend_matches_librosa_pipeline():
+    y = _speech_like_signal()
+    analysis = compute_spectral_analysis(y, SR)
+
+    mfccs = librosa.feature.mfcc(y=y, sr=SR, n_mfcc=13)
+    expected = np.stack([
+        mfccs.mean(axis=1),
+        librosa.feature.delta(mfccs).mean(axis=1),
+        librosa.feature.delta(mfccs, order=2).mean(axis=1)
+    ])
+    np.testing.assert_allclose(analysis.coeff_means, expected, atol=1e-3)
+    np.testing.assert_allclose(analysis.rms, librosa.feature.rms(y=y)[0], atol=1e-6)
+    np.testing.assert_array_equal(analysis.intervals, librosa.effects.split(y, top_db=30))
+
+
+def test_speaking_features_keys_and_fluency_stats():
+    class _Track:
+        pitch_mean = 150.0
+        jitter = 0.01
+
+    analysis = compute_spectral_analysis(_speech_like_signal(), SR)
+    feats = analysis.speaking_features(_Track())
+
+    assert len(feats) == 44
+    assert list(feats)[:5] == ["pitch_mean", "jitter", "energy_mean", "shimmer", "silence_ratio"]
+    assert list(feats)[5:8] == ["mfcc_0", "delta_0", "delta2_0"]
+
+    stats = analysis.fluency_stats()
+    assert stats["num_pauses"] == len(analysis.intervals) - 1
+    assert 0.0 < stats["silence_ratio"] < 1.0
+    assert stats["total_duration"] == 4.0
+
+
+def test_windowed_analysis_matches_single_pass():
+    y = _speech_like_signal(seconds=12.0)
+    direct = compute_spectral_analysis(y, SR)
+    windowed = compute_spectral_analysis(y, SR, window_seconds=2.0)
+    np.testing.assert_allclose(windowed.coeff_means, direct.coeff_means, atol=1e-3)
+    np.testing.assert_allclose(windowed.rms, direct.rms, rtol=1e-5)
+    assert np.array_equal(windowed.intervals, direct.intervals)
+
+    capped = compute_spectral_analysis(y, SR, max_seconds=5.0, window_seconds=2.0)
+    assert capped.n_samples == 5 * SR
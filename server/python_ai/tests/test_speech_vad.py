@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.audio_buffer import AudioBuffer
+from services.pitch_service import analyze_pitch, compute_pitch_track
+from services.spectral_frontend import analyze_spectrum
+from services.speech_vad import speech_regions
+
+SR = 16000
+
+
+def _speech_with_pauses():
+    t = np.arange(SR) / SR
+    voice = 0.3 * np.sin(2 * np.pi * 150 * t)
+    pause = np.zeros(SR // 2)
+    return np.concatenate([pause, voice, pause, voice, pause]).astype(np.float32)
+
+
+def test_energy_regions_match_spectral_silence_ratio():
+    audio = AudioBuffer(_speech_with_pauses(), SR)
+    regions = speech_regions(audio, "energy")
+    assert len(regions.intervals) == 2
+    assert abs(regions.silence_ratio - analyze_spectrum(audio).silence_ratio) < 1e-9
+    assert 0.3 < regions.silence_ratio < 1.5 / 3.5 + 0.01  # split theo frame 2048 nên biên nới ra một chút
+
+
+def test_pitch_only_on_speech_regions():
+    y = _speech_with_pauses()
+    audio = AudioBuffer(y, SR)
+    track = analyze_pitch(audio, engine="autocorr", speech_only=True)
+    full = compute_pitch_track(y, SR, engine="autocorr")
+    assert len(track.f0) == len(full.f0)
+    # Frame giữa khoảng lặng đầu tiên không được track, F0 trong đoạn nói giữ nguyên
+    assert not track.voiced_flag[:8].any()
+    assert abs(track.pitch_mean - 150) < 3
+    assert abs(track.pitch_mean - full.pitch_mean) < 1
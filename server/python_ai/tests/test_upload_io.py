@@ -0,0 +1,60 @@
+import io
+import os
+import sys
+import wave
+
+import numpy as np
+
+# Thêm đường dẫn để import services
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.upload_io import ScratchWorkspace, receive_upload, workspace
+
+
+class _FakeUpload:
+    """Giả lập werkzeug FileStorage (read + save)"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+
+def _wav_bytes(seconds=1.0, sr=16000):
+    t = np.arange(int(sr * seconds)) / sr
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes((0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def test_receive_upload_decodes_and_leaves_no_files():
+    with receive_upload(_FakeUpload(_wav_bytes()), suffix=".wav") as upload:
+        assert upload.audio is not None
+        assert abs(upload.audio.duration - 1.0) < 0.01
+        path = upload.path
+    assert path is None or not os.path.exists(path)
+    assert workspace.stats()["active_files"] == 0
+
+
+def test_workspace_sweep_removes_stale_files(tmp_path):
+    ws = ScratchWorkspace(root=str(tmp_path))
+    stale = tmp_path / "old.webm"
+    stale.write_bytes(b"x")
+    os.utime(stale, (0, 0))
+    fresh = ws.new_path(".webm")
+    with open(fresh, "wb") as f:
+        f.write(b"y")
+    ws.sweep()
+    assert not stale.exists()
+    assert os.path.exists(fresh)
+    ws.release(fresh)
+    assert not os.path.exists(fresh)
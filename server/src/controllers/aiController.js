@@ -283,7 +283,7 @@ exports.checkSpeaking = async (req, res) => {
                 const lines = chunkStr.split('\n');
                 let itIsDeepAnalysis = false;
                 for (let line of lines) {
-                    if (line.startsWith('event: deep_analysis') || line.startsWith('event: quick_score')) {
+                    if (line.startsWith('event: deep_analysis') || line.startsWith('event: quick_score') || line.startsWith('event: final_score')) {
                         itIsDeepAnalysis = true;
                     }
                     if (itIsDeepAnalysis && line.startsWith('data: ')) {